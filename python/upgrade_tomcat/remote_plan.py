@@ -0,0 +1,118 @@
+# Batches the remote commands of upgrade_tomcat_configure_files.py into single round trips.
+import uuid
+
+
+class RemotePlan:
+    """
+    A series of remote commands sent to a server as one shell script in a single exec.
+    Each step's output and exit status are delimited by markers in the script's output, so the
+    results (and errors) are reported per step just like separate run_ssh_command calls.
+    The script stops at the first failing step unless that step was added with a warning.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.steps = []
+        self._marker = f"__REMOTE_PLAN_{uuid.uuid4().hex}__"
+
+    def add(self, command, sudo=False, message=None, warning=None):
+        """
+        Add a command to the plan, optionally with sudo.
+        `message` is printed when the step's result is reported. If `warning` is given, a
+        failure of the step prints the warning and the plan carries on.
+        """
+        if sudo:
+            command = f"sudo {command}"
+        self.steps.append(
+            {"command": command, "message": message, "warning": warning}
+        )
+        return self
+
+    def script(self):
+        """
+        Compile the steps into a shell script printing a begin and end marker per step.
+        The script is read by bash from stdin, so each step runs in a subshell with its stdin
+        on /dev/null: a command that reads its input or calls exit must not consume or end the
+        rest of the script.
+        """
+        lines = ["exec 2>&1"]
+        for index, step in enumerate(self.steps):
+            lines.append(f"printf '\\n%s begin {index}\\n' '{self._marker}'")
+            lines.append(f"( {step['command']}\n) < /dev/null")
+            lines.append("rc=$?")
+            lines.append(f"printf '\\n%s end {index} %d\\n' '{self._marker}' \"$rc\"")
+            if step["warning"] is None:
+                lines.append('[ "$rc" -eq 0 ] || exit "$rc"')
+        return "\n".join(lines) + "\n"
+
+    def parse(self, output):
+        """Split the script's output into one result per step; steps never run have no exit status."""
+        results = [
+            {"command": step["command"], "exit_status": None, "output": ""}
+            for step in self.steps
+        ]
+        current = None
+        lines = []
+        for line in output.split("\n"):
+            if not line.startswith(self._marker):
+                if current is not None:
+                    lines.append(line)
+                continue
+            fields = line[len(self._marker) :].split()
+            if fields[0] == "begin":
+                current = int(fields[1])
+                lines = []
+            elif fields[0] == "end" and current is not None:
+                # Drop the newline printed before the marker
+                if lines and not lines[-1]:
+                    lines.pop()
+                results[current]["output"] = "\n".join(lines)
+                results[current]["exit_status"] = int(fields[2])
+                current = None
+        if current is not None:
+            # The script was cut short inside a step
+            results[current]["output"] = "\n".join(lines)
+        return results
+
+    def execute(self, ssh):
+        """
+        Run the plan in one exec and return the results. The output is read as it arrives, so
+        each step's message is printed when the step starts and its warning when it fails.
+        Raises RuntimeError for the first failing step that has no warning.
+        """
+        stdin, stdout, _ = ssh.exec_command("bash -s")
+        stdin.write(self.script())
+        stdin.flush()
+        stdin.channel.shutdown_write()
+        lines = []
+        for line in iter(stdout.readline, ""):
+            lines.append(line)
+            self._report_progress(line)
+        output = "".join(lines)
+        exit_status = stdout.channel.recv_exit_status()
+
+        results = self.parse(output)
+        for step, result in zip(self.steps, results):
+            if result["exit_status"] is None:
+                break
+            if result["exit_status"] != 0 and step["warning"] is None:
+                raise RuntimeError(
+                    f"Command '{step['command']}' failed: {result['output']}"
+                )
+        if exit_status != 0 or any(r["exit_status"] is None for r in results):
+            raise RuntimeError(
+                f"[{self.server}] Remote plan stopped before all steps ran "
+                f"(exit status {exit_status}): {output}"
+            )
+        return results
+
+    def _report_progress(self, line):
+        """Print a step's message at its begin marker, and its warning at a failing end marker."""
+        if not line.startswith(self._marker):
+            return
+        fields = line[len(self._marker) :].split()
+        step = self.steps[int(fields[1])]
+        if fields[0] == "begin" and step["message"]:
+            print(step["message"], flush=True)
+        elif fields[0] == "end" and int(fields[2]) != 0 and step["warning"] is not None:
+            print(step["warning"], flush=True)
@@ -0,0 +1,58 @@
+# Edits the XML files of upgrade_tomcat_configure_files.py in memory, without local temp files.
+import os
+import uuid
+from io import BytesIO
+
+from lxml import etree
+
+from remote_plan import RemotePlan
+
+
+class RemoteXmlFile:
+    """
+    An XML file on a server, read over SFTP into memory, parsed once and written back atomically.
+    The upload goes to a temp name unique to the server and run, and is renamed over the file
+    from within its own directory, so concurrent runs never clobber each other.
+    """
+
+    def __init__(self, ssh, server, path, owner, keep_backup=False):
+        self.ssh = ssh
+        self.server = server
+        self.path = path
+        self.owner = owner
+        self.keep_backup = keep_backup
+        self.tree = None
+
+    def load(self):
+        """Back up the file on the server and parse it, preserving whitespace and comments."""
+        RemotePlan(self.server).add(
+            f"cp {self.path} {self.path}.bak", sudo=True
+        ).execute(self.ssh)
+
+        buffer = BytesIO()
+        self.ssh.sftp().getfo(self.path, buffer)
+        buffer.seek(0)
+        parser = etree.XMLParser(remove_blank_text=False)
+        self.tree = etree.parse(buffer, parser)
+        return self.tree
+
+    def save(self, pretty_print=False):
+        """Upload the tree from memory and move it into place with the file's owner."""
+        data = etree.tostring(
+            self.tree, encoding="utf-8", xml_declaration=True, pretty_print=pretty_print
+        )
+        unique = f"{self.server}.{uuid.uuid4().hex}"
+        name = os.path.basename(self.path)
+        temp_remote_file = f"/tmp/{name}.{unique}"
+        staged_file = f"{os.path.dirname(self.path)}/.{name}.{unique}"
+
+        self.ssh.sftp().putfo(BytesIO(data), temp_remote_file)
+
+        # Stage next to the file so the final rename is atomic, then clean up
+        plan = RemotePlan(self.server)
+        plan.add(f"mv {temp_remote_file} {staged_file}", sudo=True)
+        plan.add(f"chown {self.owner} {staged_file}", sudo=True)
+        plan.add(f"mv -f {staged_file} {self.path}", sudo=True)
+        if not self.keep_backup:
+            plan.add(f"rm -f {self.path}.bak", sudo=True)
+        plan.execute(self.ssh)
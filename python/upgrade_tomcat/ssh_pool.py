@@ -0,0 +1,139 @@
+# Shared by upgrade_tomcat_configure_files.py and upgrade_tomcat_deploy.py.
+# Requires paramiko (see the virtual environment notes at the top of either script).
+import getpass
+import os
+import threading
+
+import paramiko
+
+SSH_KEY_PATH = "~/.ssh/id_rsa"  # Path to your SSH private key
+SSH_CONFIG_PATH = "~/.ssh/config"
+KEEPALIVE_SECONDS = 30
+
+
+class HostSession:
+    """
+    One authenticated SSH transport to a server.
+    Commands run on channels multiplexed over the transport and a single SFTP channel is
+    opened on first use and reused for every transfer.
+    """
+
+    def __init__(self, server, client):
+        self.server = server
+        self.client = client
+        self._sftp = None
+        self._sftp_lock = threading.Lock()
+
+    @property
+    def is_active(self):
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def exec_command(self, command):
+        """Run a command on a new channel of the existing transport."""
+        return self.client.exec_command(command)
+
+    def sftp(self):
+        """Return the session's SFTP client, opening it on first use."""
+        with self._sftp_lock:
+            if self._sftp is None or self._sftp.get_channel().closed:
+                self._sftp = self.client.open_sftp()
+            return self._sftp
+
+    def close(self):
+        if self._sftp is not None:
+            self._sftp.close()
+            self._sftp = None
+        self.client.close()
+
+
+class SSHSessionPool:
+    """
+    Keep one HostSession per server for the life of the pool.
+    ~/.ssh/config is parsed once, and sessions are reconnected only if their transport dropped.
+    """
+
+    def __init__(
+        self,
+        key_path=SSH_KEY_PATH,
+        config_path=SSH_CONFIG_PATH,
+        keepalive=KEEPALIVE_SECONDS,
+        timeout=10,
+    ):
+        self.key_path = os.path.expanduser(key_path)
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.connects = 0
+        self.ssh_config = paramiko.SSHConfig()
+        user_config_file = os.path.expanduser(config_path)
+        if os.path.exists(user_config_file):
+            with open(user_config_file) as f:
+                self.ssh_config.parse(f)
+        self._sessions = {}
+        self._host_locks = {}
+        self._lock = threading.Lock()
+
+    def connect(self, server):
+        """Return the server's session, connecting on first use or after a dropped connection."""
+        with self._lock:
+            host_lock = self._host_locks.setdefault(server, threading.Lock())
+        with host_lock:
+            session = self._sessions.get(server)
+            if session is not None and session.is_active:
+                return session
+            if session is not None:
+                session.close()
+            session = HostSession(server, self._open_client(server))
+            self._sessions[server] = session
+            return session
+
+    def _open_client(self, server):
+        """Establish an SSH connection using SSH config for hostname resolution."""
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+        # Get hostname configuration from SSH config
+        host_config = self.ssh_config.lookup(server)
+
+        try:
+            # Use config-provided hostname if available, otherwise use server name
+            hostname = host_config.get("hostname", server)
+            username = host_config.get("user", getpass.getuser())
+            key_filename = host_config.get("identityfile", [self.key_path])
+            if isinstance(key_filename, list) and key_filename:
+                key_filename = key_filename[0]
+
+            print(f"Connecting to {hostname} as {username}...")
+            ssh.connect(
+                hostname=hostname,
+                username=username,
+                key_filename=key_filename,
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            ssh.close()
+            raise RuntimeError(f"Failed to connect to {server}: {e}")
+
+        # Keep idle connections open between phases
+        if self.keepalive:
+            ssh.get_transport().set_keepalive(self.keepalive)
+        self.connects += 1
+        return ssh
+
+    def close(self, server=None):
+        """Close one server's session, or every session if no server is given."""
+        with self._lock:
+            if server is None:
+                sessions = list(self._sessions.values())
+                self._sessions.clear()
+            else:
+                session = self._sessions.pop(server, None)
+                sessions = [session] if session is not None else []
+        for session in sessions:
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
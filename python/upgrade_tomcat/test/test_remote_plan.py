@@ -0,0 +1,143 @@
+import os
+import queue
+import subprocess
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from remote_plan import RemotePlan
+
+
+class _Channel:
+    def __init__(self, process):
+        self.process = process
+
+    def shutdown_write(self):
+        self.process.stdin.close()
+
+    def recv_exit_status(self):
+        return self.process.wait()
+
+
+class _Stream:
+    def __init__(self, process, file):
+        self.file = file
+        self.channel = _Channel(process)
+
+    def write(self, data):
+        self.file.write(data.encode())
+
+    def flush(self):
+        self.file.flush()
+
+    def read(self):
+        return self.file.read()
+
+    def readline(self):
+        return self.file.readline().decode()
+
+
+class LocalShell:
+    """Runs commands under local bash in place of an SSH session."""
+
+    def exec_command(self, command):
+        process = subprocess.Popen(
+            ["bash", "-c", command],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        return (
+            _Stream(process, process.stdin),
+            _Stream(process, process.stdout),
+            _Stream(process, process.stderr),
+        )
+
+
+def test_steps_run_in_one_script(capsys):
+    plan = RemotePlan("host1")
+    plan.add("echo one", message="[host1] First step...")
+    plan.add("echo two; echo three >&2")
+
+    results = plan.execute(LocalShell())
+
+    assert [(r["exit_status"], r["output"]) for r in results] == [
+        (0, "one"),
+        (0, "two\nthree"),
+    ]
+    assert capsys.readouterr().out == "[host1] First step...\n"
+
+
+def test_steps_do_not_read_the_script_from_stdin():
+    plan = RemotePlan("host1")
+    plan.add("cat")
+    plan.add("echo after")
+
+    results = plan.execute(LocalShell())
+
+    assert [(r["exit_status"], r["output"]) for r in results] == [(0, ""), (0, "after")]
+
+
+def test_failed_step_with_warning_continues(capsys):
+    plan = RemotePlan("host1")
+    plan.add("echo missing; exit 3", warning="[host1] Warning: file not copied")
+    plan.add("echo after")
+
+    results = plan.execute(LocalShell())
+
+    assert [(r["exit_status"], r["output"]) for r in results] == [
+        (3, "missing"),
+        (0, "after"),
+    ]
+    assert "[host1] Warning: file not copied" in capsys.readouterr().out
+
+
+def test_failed_required_step_stops_the_plan(tmp_path):
+    marker = tmp_path / "ran"
+    plan = RemotePlan("host1")
+    plan.add("echo broken >&2; false")
+    plan.add(f"touch {marker}")
+
+    with pytest.raises(RuntimeError, match="Command 'echo broken >&2; false' failed: broken"):
+        plan.execute(LocalShell())
+    assert not marker.exists()
+
+
+def test_script_cut_short_is_an_error():
+    plan = RemotePlan("host1")
+    plan.add("echo started; kill -9 $$")
+    plan.add("echo never")
+
+    with pytest.raises(RuntimeError, match="stopped before all steps ran"):
+        plan.execute(LocalShell())
+
+
+def test_parse_truncated_output():
+    plan = RemotePlan("host1").add("echo one").add("echo two")
+    marker = plan._marker
+    output = f"\n{marker} begin 0\none\n\n{marker} end 0 0\n\n{marker} begin 1\npartial"
+
+    results = plan.parse(output)
+
+    assert [(r["exit_status"], r["output"]) for r in results] == [(0, "one"), (None, "partial")]
+
+
+def test_messages_are_printed_as_steps_begin(tmp_path):
+    release = tmp_path / "release"
+    os.mkfifo(release)
+    plan = RemotePlan("host1")
+    plan.add(f"read line < {release}", message="[host1] Extracting...")
+    printed = queue.Queue()
+
+    with patch("builtins.print", side_effect=lambda text, **kwargs: printed.put(text)):
+        thread = threading.Thread(target=plan.execute, args=(LocalShell(),))
+        thread.start()
+        try:
+            assert printed.get(timeout=5) == "[host1] Extracting..."
+            # The step is still blocked when its message is printed
+            assert thread.is_alive()
+        finally:
+            release.write_text("go\n")
+            thread.join(timeout=5)
+    assert not thread.is_alive()
@@ -0,0 +1,92 @@
+import getpass
+import glob
+import os
+import shutil
+
+import pytest
+
+from remote_xml import RemoteXmlFile
+from test.test_remote_plan import LocalShell
+
+SERVER_XML = b"""<?xml version='1.0' encoding='utf-8'?>
+<Server port="8005">
+  <!-- keep this comment -->
+  <Service name="Catalina"/>
+</Server>
+"""
+
+
+class LocalSFTP:
+    def getfo(self, path, fo):
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, fo)
+
+    def putfo(self, fo, path):
+        with open(path, "wb") as f:
+            shutil.copyfileobj(fo, f)
+
+
+class LocalSession(LocalShell):
+    """A LocalShell with an SFTP client on the local filesystem."""
+
+    def sftp(self):
+        return LocalSFTP()
+
+
+@pytest.fixture
+def sudo_log(tmp_path, monkeypatch):
+    """Put a sudo on PATH that logs each command and runs it as the current user."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    log = tmp_path / "sudo.log"
+    sudo = bin_dir / "sudo"
+    sudo.write_text(f'#!/bin/sh\necho "$*" >> {log}\nexec "$@"\n')
+    sudo.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return log
+
+
+@pytest.fixture
+def server_xml(tmp_path):
+    conf = tmp_path / "conf"
+    conf.mkdir()
+    path = conf / f"server-{os.getpid()}.xml"
+    path.write_bytes(SERVER_XML)
+    return path
+
+
+def test_save_replaces_the_file_from_a_staged_copy(server_xml, sudo_log):
+    owner = getpass.getuser()
+    xml_file = RemoteXmlFile(LocalSession(), "host1", str(server_xml), owner)
+    root = xml_file.load().getroot()
+    root.find("Service").set("name", "Tomcat")
+
+    xml_file.save()
+
+    content = server_xml.read_bytes()
+    assert b'<Service name="Tomcat"/>' in content
+    assert b"<!-- keep this comment -->" in content
+    commands = sudo_log.read_text().splitlines()
+    chown = next(command for command in commands if command.startswith("chown"))
+    staged = chown.split()[-1]
+    assert chown == f"chown {owner} {staged}"
+    assert os.path.dirname(staged) == str(server_xml.parent)
+    assert commands[-2:] == [f"mv -f {staged} {server_xml}", f"rm -f {server_xml}.bak"]
+    # Neither the backup nor the staged or uploaded copies are left behind
+    assert os.listdir(server_xml.parent) == [server_xml.name]
+    assert glob.glob(f"/tmp/{server_xml.name}.host1.*") == []
+
+
+def test_save_can_keep_the_backup(server_xml, sudo_log):
+    xml_file = RemoteXmlFile(
+        LocalSession(), "host1", str(server_xml), getpass.getuser(), keep_backup=True
+    )
+    xml_file.load()
+
+    xml_file.save()
+
+    assert sorted(os.listdir(server_xml.parent)) == [
+        server_xml.name,
+        f"{server_xml.name}.bak",
+    ]
+    assert (server_xml.parent / f"{server_xml.name}.bak").read_bytes() == SERVER_XML
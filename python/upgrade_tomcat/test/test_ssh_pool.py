@@ -0,0 +1,149 @@
+import pytest
+
+import ssh_pool
+import upgrade_tomcat_configure_files
+import upgrade_tomcat_deploy
+from ssh_pool import SSHSessionPool
+from test.test_upgrade_tomcat_configure_files import STEPS
+
+
+class FakeChannel:
+    def __init__(self):
+        self.closed = False
+
+
+class FakeSFTP:
+    def __init__(self):
+        self.channel = FakeChannel()
+
+    def get_channel(self):
+        return self.channel
+
+    def close(self):
+        self.channel.closed = True
+
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+        self.keepalive = None
+
+    def is_active(self):
+        return self.active
+
+    def set_keepalive(self, interval):
+        self.keepalive = interval
+
+
+class FakeSSHClient:
+    """Stands in for paramiko.SSHClient, recording every client created."""
+
+    instances = []
+    unreachable = set()
+
+    def __init__(self):
+        self.transport = None
+        self.sftps = []
+        self.closed = False
+        FakeSSHClient.instances.append(self)
+
+    def set_missing_host_key_policy(self, policy):
+        pass
+
+    def connect(self, hostname, username, key_filename, timeout):
+        if hostname in self.unreachable:
+            raise OSError("timed out")
+        self.hostname = hostname
+        self.transport = FakeTransport()
+
+    def get_transport(self):
+        return self.transport
+
+    def open_sftp(self):
+        self.sftps.append(FakeSFTP())
+        return self.sftps[-1]
+
+    def close(self):
+        self.closed = True
+        if self.transport is not None:
+            self.transport.active = False
+
+
+@pytest.fixture
+def pool(monkeypatch, tmp_path):
+    FakeSSHClient.instances = []
+    FakeSSHClient.unreachable = set()
+    monkeypatch.setattr(ssh_pool.paramiko, "SSHClient", FakeSSHClient)
+    with SSHSessionPool(config_path=str(tmp_path / "ssh_config")) as session_pool:
+        yield session_pool
+
+
+def test_connect_reuses_a_live_session(pool):
+    first = pool.connect("web1")
+
+    assert pool.connect("web1") is first
+    assert pool.connects == 1
+    assert first.client.transport.keepalive == ssh_pool.KEEPALIVE_SECONDS
+
+
+def test_connect_replaces_a_dropped_session(pool):
+    first = pool.connect("web1")
+    first.client.transport.active = False
+
+    second = pool.connect("web1")
+
+    assert second is not first
+    assert first.client.closed
+    assert pool.connects == 2
+
+
+def test_sftp_is_opened_once_and_reopened_when_closed(pool):
+    session = pool.connect("web1")
+    sftp = session.sftp()
+
+    assert session.sftp() is sftp
+    sftp.get_channel().closed = True
+    assert session.sftp() is not sftp
+    assert len(session.client.sftps) == 2
+
+
+def test_failed_connection_is_closed(pool):
+    FakeSSHClient.unreachable.add("web1")
+
+    with pytest.raises(RuntimeError, match="Failed to connect to web1"):
+        pool.connect("web1")
+    assert FakeSSHClient.instances[0].closed
+    assert pool.connects == 0
+
+
+def test_close_closes_every_session(pool):
+    sessions = [pool.connect(server) for server in ("web1", "web2")]
+    sftp = sessions[0].sftp()
+
+    pool.close()
+
+    assert all(session.client.closed for session in sessions)
+    assert sftp.channel.closed
+
+
+def test_configure_and_deploy_share_one_connection_per_server(pool, monkeypatch):
+    servers = ["yhr-umich-test", "yhr-itm-test", "yhr-uic-test"]
+    for step in STEPS:
+        monkeypatch.setattr(upgrade_tomcat_configure_files, step, lambda *args: None)
+    deployed = []
+    monkeypatch.setattr(
+        upgrade_tomcat_deploy,
+        "deploy_new_tomcat",
+        lambda ssh, server: deployed.append((server, ssh)),
+    )
+
+    results = upgrade_tomcat_configure_files.configure_servers(
+        servers, "archive", pool, workers=3
+    )
+    deploy_results = upgrade_tomcat_deploy.deploy_servers(servers, pool)
+
+    assert [result["status"] for result in results] == ["SUCCESS"] * 3
+    assert deploy_results == [(server, "SUCCESS") for server in servers]
+    assert pool.connects == len(servers)
+    assert sorted(client.hostname for client in FakeSSHClient.instances) == sorted(servers)
+    assert [session.client.hostname for _, session in deployed] == servers
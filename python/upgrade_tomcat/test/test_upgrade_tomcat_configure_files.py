@@ -0,0 +1,266 @@
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import upgrade_tomcat_configure_files
+from upgrade_tomcat_configure_files import (CHECKSUM_INDEX, HostPrefixedOutput,
+                                            configure_servers, fetch_archive,
+                                            print_summary)
+
+ARCHIVE = b"apache-tomcat archive contents"
+SHA512 = hashlib.sha512(ARCHIVE).hexdigest()
+
+
+class RecordingHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    """Serve an archive and its published SHA-512 the way the Apache mirrors do."""
+    root = tmp_path / "mirror"
+    root.mkdir()
+    (root / "apache-tomcat.tar.gz").write_bytes(ARCHIVE)
+    (root / "apache-tomcat.tar.gz.sha512").write_text(f"{SHA512} *apache-tomcat.tar.gz\n")
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(RecordingHandler, directory=str(root))
+    )
+    server.requests = []
+    server.root = root
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/apache-tomcat.tar.gz"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_is_verified_and_cached(mirror, tmp_path):
+    cache_dir = tmp_path / "cache"
+
+    path, checksum = fetch_archive(mirror.url, str(cache_dir))
+
+    assert checksum == SHA512
+    assert path == str(cache_dir / f"{SHA512}.tar.gz")
+    with open(path, "rb") as f:
+        assert f.read() == ARCHIVE
+    with open(cache_dir / CHECKSUM_INDEX) as f:
+        assert json.load(f) == {mirror.url: SHA512}
+    assert sorted(os.listdir(cache_dir)) == sorted([f"{SHA512}.tar.gz", CHECKSUM_INDEX])
+
+
+def test_cache_hit_skips_the_download(mirror, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    fetch_archive(mirror.url, cache_dir)
+    mirror.requests.clear()
+
+    assert fetch_archive(mirror.url, cache_dir)[1] == SHA512
+    assert mirror.requests == ["/apache-tomcat.tar.gz.sha512"]
+
+
+def test_checksum_mismatch_is_not_cached(mirror, tmp_path):
+    cache_dir = tmp_path / "cache"
+    (mirror.root / "apache-tomcat.tar.gz").write_bytes(b"tampered")
+
+    with pytest.raises(RuntimeError, match="Checksum mismatch"):
+        fetch_archive(mirror.url, str(cache_dir))
+    assert os.listdir(cache_dir) == []
+
+
+def test_recorded_checksum_is_used_when_it_cannot_be_fetched(mirror, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    fetch_archive(mirror.url, cache_dir)
+    (mirror.root / "apache-tomcat.tar.gz.sha512").unlink()
+    mirror.requests.clear()
+
+    assert fetch_archive(mirror.url, cache_dir) == (
+        os.path.join(cache_dir, f"{SHA512}.tar.gz"),
+        SHA512,
+    )
+    assert mirror.requests == ["/apache-tomcat.tar.gz.sha512"]
+
+
+def test_missing_checksum_without_a_recorded_one_fails(mirror, tmp_path):
+    (mirror.root / "apache-tomcat.tar.gz.sha512").unlink()
+
+    with pytest.raises(RuntimeError, match="none is recorded"):
+        fetch_archive(mirror.url, str(tmp_path / "cache"))
+
+
+STEPS = [
+    "download_and_extract",
+    "configure_files",
+    "update_server_xml",
+    "update_context_xml",
+    "update_manager_web_xml",
+    "update_host_manager_web_xml",
+]
+
+
+class FakePool:
+    """Hands out a placeholder session, refusing to connect to the `down` servers."""
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.connected = []
+
+    def connect(self, server):
+        if server in self.down:
+            raise RuntimeError(f"Failed to connect to {server}: timed out")
+        self.connected.append(server)
+        return object()
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    """Replace the remote configuration steps, recording the servers each one ran on."""
+    calls = []
+    for step in STEPS:
+        monkeypatch.setattr(
+            upgrade_tomcat_configure_files,
+            step,
+            lambda ssh, server, *args, step=step: calls.append((step, server)),
+        )
+    return calls
+
+
+def test_host_prefixed_output_writes_whole_lines_per_thread():
+    stream = io.StringIO()
+    output = HostPrefixedOutput(stream)
+    halfway = threading.Barrier(2, timeout=5)
+
+    def run(server, parts):
+        output.set_host(server)
+        output.write(parts[0])
+        halfway.wait()
+        output.write(parts[1])
+        output.flush()
+
+    threads = [
+        threading.Thread(target=run, args=("web1", ["[web1] Copying ", "files...\nDone"])),
+        threading.Thread(target=run, args=("web2", ["Extracting ", "archive...\n"])),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    output.write("Not from a worker\n")
+
+    assert sorted(stream.getvalue().splitlines()[:3]) == [
+        "[web1] Copying files...",
+        "[web1] Done",
+        "[web2] Extracting archive...",
+    ]
+    assert stream.getvalue().splitlines()[3] == "Not from a worker"
+
+
+def test_configure_servers_prefixes_output_and_keeps_server_order(monkeypatch, capsys):
+    def configure_server(server, archive, pool, cancelled):
+        print(f"Configuring with {archive}")
+        return {"server": server, "status": "SUCCESS", "step": None, "seconds": 0.0, "error": None}
+
+    monkeypatch.setattr(upgrade_tomcat_configure_files, "configure_server", configure_server)
+    stdout = sys.stdout
+
+    results = configure_servers(["web1", "web2", "web3"], "archive", FakePool(), workers=3)
+
+    assert [result["server"] for result in results] == ["web1", "web2", "web3"]
+    assert sys.stdout is stdout
+    assert sorted(capsys.readouterr().out.splitlines()) == [
+        "[web1] Configuring with archive",
+        "[web2] Configuring with archive",
+        "[web3] Configuring with archive",
+    ]
+
+
+def test_failed_server_does_not_stop_the_others(steps):
+    servers = ["yhr-umich-test", "yhr-itm-test", "yhr-uic-test"]
+
+    results = configure_servers(servers, "archive", FakePool(down=["yhr-umich-test"]), workers=1)
+
+    assert [result["status"] for result in results] == ["FAILED", "SUCCESS", "SUCCESS"]
+    assert results[0]["step"] == "connect"
+    assert {server for _, server in steps} == {"yhr-itm-test", "yhr-uic-test"}
+
+
+def test_fail_fast_skips_the_servers_not_started(steps):
+    servers = ["yhr-umich-test", "yhr-itm-test", "yhr-uic-test"]
+
+    results = configure_servers(
+        servers, "archive", FakePool(down=["yhr-umich-test"]), workers=1, fail_fast=True
+    )
+
+    assert [result["status"] for result in results] == ["FAILED", "SKIPPED", "SKIPPED"]
+    assert results[1]["error"] == "Cancelled after another server failed"
+    assert steps == []
+
+
+def test_summary_shows_the_failing_step(monkeypatch, steps, capsys):
+    def fail(ssh, server, cert_host):
+        raise RuntimeError("Command 'sudo xmllint' failed")
+
+    monkeypatch.setattr(upgrade_tomcat_configure_files, "update_server_xml", fail)
+    results = configure_servers(["yhr-umich-test"], "archive", FakePool(), workers=1)
+    capsys.readouterr()
+
+    assert print_summary(results) == 0
+    summary = capsys.readouterr().out
+    assert "update_server_xml: Command 'sudo xmllint' failed" in summary
+    assert "Failed or skipped configurations: 1" in summary
+
+
+@pytest.fixture
+def run_main(monkeypatch):
+    """Run main() up to the configuration summary, with configure_servers returning `statuses`."""
+
+    class Pool:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+    def run(statuses):
+        def configure_servers(servers, archive, pool, workers, fail_fast=False):
+            return [
+                {"server": server, "status": status, "step": "connect", "seconds": 0.0, "error": None}
+                for server, status in zip(servers, statuses)
+            ]
+
+        module = upgrade_tomcat_configure_files
+        monkeypatch.setattr(sys, "argv", ["upgrade_tomcat_configure_files.py"])
+        monkeypatch.setattr(module, "get_confirmation", lambda: True)
+        monkeypatch.setattr(module, "fetch_archive", lambda url, cache_dir: ("archive", "sha"))
+        monkeypatch.setattr(module, "SSHSessionPool", Pool)
+        monkeypatch.setattr(module, "configure_servers", configure_servers)
+        module.main()
+
+    return run
+
+
+def test_main_exits_with_failure_when_a_server_fails(run_main, capsys):
+    statuses = ["SUCCESS"] * (len(upgrade_tomcat_configure_files.SERVERS) - 1) + ["FAILED"]
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_main(statuses)
+
+    assert exit_info.value.code == 1
+    assert "Not all configurations were successful" in capsys.readouterr().out
+
+
+def test_main_succeeds_when_every_server_is_configured(run_main, capsys):
+    run_main(["SUCCESS"] * len(upgrade_tomcat_configure_files.SERVERS))
+
+    assert "Not all configurations were successful" not in capsys.readouterr().out
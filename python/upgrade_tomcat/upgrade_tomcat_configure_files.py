@@ -15,13 +15,20 @@
 
 # Configure vscode to use virtual environment
 # in vscode, cmd+shift+p -> Python: Select Interpretor -> ~/development/scripts/tomcat_venv
-from io import StringIO
+import argparse
+import hashlib
+import json
 import sys
+import threading
 import time
-import paramiko
+from concurrent.futures import ThreadPoolExecutor
 import os
 from lxml import etree
-import getpass
+import urllib.request
+from remote_plan import RemotePlan
+from remote_xml import RemoteXmlFile
+from ssh_pool import SSHSessionPool
+import upgrade_tomcat_deploy
 
 # Configuration
 NEW_VERSION = "11.0.7"
@@ -31,7 +38,15 @@ DOWNLOAD_URL = f"https://dlcdn.apache.org/tomcat/tomcat-11/v{NEW_VERSION}/bin/ap
 TOMCAT_INSTALL_DIR = "/app/apps/rhel8/apache-tomcat"
 NEW_TOMCAT_FOLDER = f"{TOMCAT_INSTALL_DIR}/{NEW_VERSION}"
 TEMP_TOMCAT_FOLDER = f"{TOMCAT_INSTALL_DIR}/apache-tomcat-{NEW_VERSION}"
-TOMCAT_ARCHIVE_FILE = f"{TEMP_TOMCAT_FOLDER}/apache-tomcat.tar.gz"
+# The archive is downloaded once to a local cache and copied to each server,
+# where it is kept so later runs can skip the transfer
+ARCHIVE_CACHE_DIR = "~/.cache/upgrade_tomcat"
+# The published checksum of each downloaded archive, used when it cannot be fetched
+CHECKSUM_INDEX = "checksums.json"
+# Staged under the deploy user's home directory (not /tmp), in a folder only that user
+# and root can write, so the archive cannot be swapped before it is extracted as root
+REMOTE_ARCHIVE_DIR = ".cache/upgrade_tomcat"
+REMOTE_ARCHIVE_NAME = f"apache-tomcat-{NEW_VERSION}.tar.gz"
 USER_GROUP = "tomcat:michr-developers"
 SERVER_XML = f"{TOMCAT_INSTALL_DIR}/{NEW_VERSION}/conf/server.xml"
 CONTEXT_XML = f"{TOMCAT_INSTALL_DIR}/{NEW_VERSION}/conf/context.xml"
@@ -48,7 +63,8 @@ SERVERS = [
     "yhr-demo-test",
 ]
 
-SSH_KEY_PATH = "~/.ssh/id_rsa"  # Path to your SSH private key
+# Number of servers configured at the same time
+DEFAULT_WORKERS = 4
 
 # Server-specific certificate hostnames
 CERT_HOSTS = {
@@ -97,7 +113,7 @@ def get_confirmation():
         print(f"  {idx}. {server}")
 
     print("\nThis operation will:")
-    print(f" 1. Download tomcat {NEW_VERSION}")
+    print(f" 1. Download tomcat {NEW_VERSION} once and copy it to each server")
     print(
         f" 2. Copy ojdbc{OJDBC_VERSION}.jar, oraclepki.jar, ucp{OJDBC_VERSION}.jar and war file from {PREVIOUS_VERSION} if available"
     )
@@ -146,146 +162,221 @@ def run_ssh_command(ssh, command, sudo=False):
     return output
 
 
-def ssh_connect(server):
-    """Establish an SSH connection using SSH config for hostname resolution."""
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+def sha512_of_file(path):
+    """Return the hex SHA-512 of a local file."""
+    digest = hashlib.sha512()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    # Load SSH config to use the same hostname resolution as your terminal
-    ssh_config = paramiko.SSHConfig()
-    user_config_file = os.path.expanduser("~/.ssh/config")
-    if os.path.exists(user_config_file):
-        with open(user_config_file) as f:
-            ssh_config.parse(f)
 
-    # Get hostname configuration from SSH config
-    host_config = ssh_config.lookup(server)
+def fetch_published_sha512(url):
+    """Fetch the SHA-512 Apache publishes next to the archive, as '<hash> *<file name>'."""
+    with urllib.request.urlopen(f"{url}.sha512", timeout=30) as response:
+        fields = response.read().decode().split()
+    checksum = fields[0].lower() if fields else ""
+    if len(checksum) != 128 or any(c not in "0123456789abcdef" for c in checksum):
+        raise RuntimeError(f"Invalid SHA-512 published for {url}: {' '.join(fields)}")
+    return checksum
 
-    try:
-        # Use config-provided hostname if available, otherwise use server name
-        hostname = host_config.get("hostname", server)
-        username = host_config.get("user", getpass.getuser())
-        key_filename = host_config.get(
-            "identityfile", [os.path.expanduser(SSH_KEY_PATH)]
-        )
-        if isinstance(key_filename, list) and key_filename:
-            key_filename = key_filename[0]
 
-        print(f"Connecting to {hostname} as {username}...")
-        ssh.connect(
-            hostname=hostname, username=username, key_filename=key_filename, timeout=10
-        )
-        return ssh
-    except Exception as e:
-        raise RuntimeError(f"Failed to connect to {server}: {e}")
+def read_checksum_index(index_path):
+    """Return the recorded checksums by archive URL, or an empty dict if there are none."""
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path) as f:
+        return json.load(f)
 
 
-def download_and_extract(ssh, server):
-    """Download and extract the Tomcat archive."""
-    print(f"[{server}] Downloading and configuring necessary files...")
+def record_checksum(index_path, url, checksum):
+    """Record the archive's published checksum so later runs can verify it offline."""
+    index = read_checksum_index(index_path)
+    if index.get(url) == checksum:
+        return
+    index[url] = checksum
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(temp_path, index_path)
 
-    # Check if temp folder exists and handle accordingly
-    print(f"[{server}] Preparing temp folder {TEMP_TOMCAT_FOLDER}...")
+
+def fetch_archive(url, cache_dir=ARCHIVE_CACHE_DIR):
+    """
+    Download the Tomcat archive once into a local cache addressed by its SHA-512.
+    Returns the cached file's path and checksum; the download is skipped if the cache has it.
+    If the published checksum cannot be fetched, the one recorded on an earlier run is used.
+    """
+    cache_dir = os.path.expanduser(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, CHECKSUM_INDEX)
     try:
-        # Use test -d to check if the directory exists
-        run_ssh_command(ssh, f"test -d {TEMP_TOMCAT_FOLDER}")
-        # If no exception, folder exists, so empty it
-        print(f"[{server}] Emptying existing folder {TEMP_TOMCAT_FOLDER}...")
-        run_ssh_command(ssh, f"rm -rf {TEMP_TOMCAT_FOLDER}/*", sudo=True)
-    except RuntimeError:
-        # If test -d fails, folder doesn't exist, so create it
-        print(f"[{server}] Creating temp folder {TEMP_TOMCAT_FOLDER}...")
-        run_ssh_command(ssh, f"mkdir -p {TEMP_TOMCAT_FOLDER}", sudo=True)
-
-    # Download archive
-    print(f"[{server}] Downloading Apache Tomcat archive...")
-    run_ssh_command(ssh, f"wget -O {TOMCAT_ARCHIVE_FILE} {DOWNLOAD_URL}", sudo=True)
-
-    # Validate archive
-    output = run_ssh_command(ssh, f"file -b {TOMCAT_ARCHIVE_FILE}")
-    if "gzip" not in output.lower():
-        raise RuntimeError(f"[{server}] Downloaded file is not a valid gzip archive")
-
-    # Extract archive
-    print(f"[{server}] Extracting Apache Tomcat archive...")
-    run_ssh_command(
-        ssh, f"tar -xzvf {TOMCAT_ARCHIVE_FILE} -C {TEMP_TOMCAT_FOLDER}", sudo=True
-    )
-    run_ssh_command(ssh, f"rm -f {TOMCAT_ARCHIVE_FILE}", sudo=True)
+        checksum = fetch_published_sha512(url)
+    except OSError as e:
+        checksum = read_checksum_index(index_path).get(url)
+        if checksum is None:
+            raise RuntimeError(
+                f"Could not fetch the SHA-512 of {url} and none is recorded in {index_path}: {e}"
+            )
+        print(f"Could not fetch the SHA-512 of {url} ({e}), using the one recorded in {index_path}")
+    archive_path = os.path.join(cache_dir, f"{checksum}.tar.gz")
 
-    # Move extracted files
-    print(f"[{server}] Preparing new folder {NEW_TOMCAT_FOLDER}...")
+    if os.path.exists(archive_path) and sha512_of_file(archive_path) == checksum:
+        print(f"Using cached archive {archive_path}")
+        record_checksum(index_path, url, checksum)
+        return archive_path, checksum
+
+    print(f"Downloading {url}...")
+    temp_path = f"{archive_path}.{os.getpid()}.part"
+    digest = hashlib.sha512()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response, open(temp_path, "wb") as f:
+            for chunk in iter(lambda: response.read(1 << 20), b""):
+                digest.update(chunk)
+                f.write(chunk)
+        if digest.hexdigest() != checksum:
+            raise RuntimeError(
+                f"Checksum mismatch for {url}: expected {checksum}, got {digest.hexdigest()}"
+            )
+        os.replace(temp_path, archive_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    record_checksum(index_path, url, checksum)
+    print(f"Verified SHA-512 and cached archive as {archive_path}")
+    return archive_path, checksum
+
+
+def remote_sha512(ssh, path):
+    """Return the SHA-512 of a file on the server, or None if it does not exist."""
     try:
-        # Check if NEW_TOMCAT_FOLDER exists
-        run_ssh_command(ssh, f"test -d {NEW_TOMCAT_FOLDER}")
-        # If it exists, remove the entire folder
-        print(f"[{server}] Removing existing folder {NEW_TOMCAT_FOLDER}...")
-        run_ssh_command(ssh, f"rm -rf {NEW_TOMCAT_FOLDER}", sudo=True)
+        output = run_ssh_command(ssh, f"sha512sum {path}")
     except RuntimeError:
-        # If it doesn't exist, no action needed before creating
-        print(
-            f"[{server}] Folder {NEW_TOMCAT_FOLDER} does not exist, will create it..."
-        )
+        return None
+    return output.split()[0] if output.strip() else None
+
+
+def stage_archive(ssh, server, archive):
+    """
+    Copy the cached archive to the server over SFTP unless it already has an identical copy.
+    Returns the archive's path on the server.
+    """
+    local_path, checksum = archive
+    sftp = ssh.sftp()
+    remote_dir = f"{sftp.normalize('.')}/{REMOTE_ARCHIVE_DIR}"
+    remote_file = f"{remote_dir}/{REMOTE_ARCHIVE_NAME}"
+
+    # Refuse to stage into a folder another user could write to
+    RemotePlan(server).add(
+        f"mkdir -p {remote_dir} && [ -O {remote_dir} ] && chmod 700 {remote_dir}",
+    ).execute(ssh)
+
+    if remote_sha512(ssh, remote_file) == checksum:
+        print(f"[{server}] Archive already staged at {remote_file}, skipping transfer")
+        return remote_file
+
+    print(f"[{server}] Copying Apache Tomcat archive to {remote_file}...")
+    temp_remote_file = f"{remote_file}.part"
+    sftp.put(local_path, temp_remote_file)
+    sftp.posix_rename(temp_remote_file, remote_file)
 
-    # Create the folder (needed after removal or if it didn't exist)
-    print(f"[{server}] Creating new folder {NEW_TOMCAT_FOLDER}...")
-    run_ssh_command(ssh, f"mkdir -p {NEW_TOMCAT_FOLDER}", sudo=True)
+    if remote_sha512(ssh, remote_file) != checksum:
+        raise RuntimeError(f"[{server}] Checksum mismatch after copying the archive")
+    return remote_file
+
+
+def download_and_extract(ssh, server, archive):
+    """Stage the downloaded Tomcat archive on the server and extract it."""
+    print(f"[{server}] Downloading and configuring necessary files...")
+
+    # Copy the verified archive; the servers need no outbound internet access
+    remote_file = stage_archive(ssh, server, archive)
+    checksum = archive[1]
+
+    # Prepare the folders, extract the archive and move the files in one round trip
+    plan = RemotePlan(server)
+
+    # Empty the temp folder if it exists, otherwise create it
+    plan.add(
+        f"if [ -d {TEMP_TOMCAT_FOLDER} ]; then sudo rm -rf {TEMP_TOMCAT_FOLDER}/*; "
+        f"else sudo mkdir -p {TEMP_TOMCAT_FOLDER}; fi",
+        message=f"[{server}] Preparing temp folder {TEMP_TOMCAT_FOLDER}...",
+    )
+    # Verify the archive again as root in the same step that extracts it
+    plan.add(
+        f"sh -c \"echo '{checksum}  {remote_file}' | sha512sum -c --quiet - "
+        f"&& tar -xzvf {remote_file} -C {TEMP_TOMCAT_FOLDER}\"",
+        sudo=True,
+        message=f"[{server}] Extracting Apache Tomcat archive...",
+    )
+
+    # Remove the new folder if it exists, then create it
+    plan.add(
+        f"rm -rf {NEW_TOMCAT_FOLDER}",
+        sudo=True,
+        message=f"[{server}] Preparing new folder {NEW_TOMCAT_FOLDER}...",
+    )
+    plan.add(
+        f"mkdir -p {NEW_TOMCAT_FOLDER}",
+        sudo=True,
+        message=f"[{server}] Creating new folder {NEW_TOMCAT_FOLDER}...",
+    )
 
     # Move extracted files
-    print(f"[{server}] Moving extracted files...")
-    run_ssh_command(
-        ssh,
+    plan.add(
         f"mv {TEMP_TOMCAT_FOLDER}/apache-tomcat-{NEW_VERSION}/* {NEW_TOMCAT_FOLDER}",
         sudo=True,
+        message=f"[{server}] Moving extracted files...",
     )
     # Delete temp folder
-    print(f"[{server}] Deleting {TEMP_TOMCAT_FOLDER}...")
-    run_ssh_command(
-        ssh,
+    plan.add(
         f"rm -rf {TEMP_TOMCAT_FOLDER}",
         sudo=True,
+        message=f"[{server}] Deleting {TEMP_TOMCAT_FOLDER}...",
     )
+    plan.execute(ssh)
 
 
 def configure_files(ssh, server):
     """Configure ownership, permissions, and copy files from previous version."""
-    print(f"[{server}] Updating ownership and permissions...")
-    run_ssh_command(ssh, f"chown -R {USER_GROUP} {NEW_TOMCAT_FOLDER}", sudo=True)
-    run_ssh_command(ssh, f"chmod -R g+rw {NEW_TOMCAT_FOLDER}/conf", sudo=True)
-    run_ssh_command(ssh, f"chmod g+x {NEW_TOMCAT_FOLDER}/conf", sudo=True)
+    plan = RemotePlan(server)
+    plan.add(
+        f"chown -R {USER_GROUP} {NEW_TOMCAT_FOLDER}",
+        sudo=True,
+        message=f"[{server}] Updating ownership and permissions...",
+    )
+    plan.add(f"chmod -R g+rw {NEW_TOMCAT_FOLDER}/conf", sudo=True)
+    plan.add(f"chmod g+x {NEW_TOMCAT_FOLDER}/conf", sudo=True)
 
     # Copy configuration files
-    print(f"[{server}] Copying configuration files from version {PREVIOUS_VERSION}...")
-    try:
-        run_ssh_command(
-            ssh,
-            f"cp -rp {TOMCAT_INSTALL_DIR}/{PREVIOUS_VERSION}/conf/Catalina/ {NEW_TOMCAT_FOLDER}/conf/",
-            sudo=True,
-        )
-    except RuntimeError:
-        print(
-            f"[{server}] Warning: Previous version configuration directory not found, skipping"
-        )
+    plan.add(
+        f"cp -rp {TOMCAT_INSTALL_DIR}/{PREVIOUS_VERSION}/conf/Catalina/ {NEW_TOMCAT_FOLDER}/conf/",
+        sudo=True,
+        message=f"[{server}] Copying configuration files from version {PREVIOUS_VERSION}...",
+        warning=f"[{server}] Warning: Previous version configuration directory not found, skipping",
+    )
 
     # Remove logs directory from new version so that later we can add symlink
-    print(f"[{server}] Deleting logs folder from new version...")
-    run_ssh_command(ssh, f"rm -rf {NEW_TOMCAT_FOLDER}/logs/", sudo=True)
+    plan.add(
+        f"rm -rf {NEW_TOMCAT_FOLDER}/logs/",
+        sudo=True,
+        message=f"[{server}] Deleting logs folder from new version...",
+    )
 
     # Copy libraries and web applications
-    print(f"[{server}] Copying libraries and web applications...")
+    message = f"[{server}] Copying libraries and web applications..."
     for lib in [
         f"ojdbc{OJDBC_VERSION}.jar",
         "oraclepki.jar",
         f"ucp{OJDBC_VERSION}.jar",
     ]:
-        try:
-            run_ssh_command(
-                ssh,
-                f"cp -p {TOMCAT_INSTALL_DIR}/{PREVIOUS_VERSION}/lib/{lib} {NEW_TOMCAT_FOLDER}/lib/.",
-                sudo=True,
-            )
-        except RuntimeError:
-            print(f"[{server}] Warning: Library {lib} not found, skipping")
+        plan.add(
+            f"cp -p {TOMCAT_INSTALL_DIR}/{PREVIOUS_VERSION}/lib/{lib} {NEW_TOMCAT_FOLDER}/lib/.",
+            sudo=True,
+            message=message,
+            warning=f"[{server}] Warning: Library {lib} not found, skipping",
+        )
+        message = None
 
     # Check which WAR file to copy based on server name
     if server in ["nabu-test", "nabu-prod"]:
@@ -293,33 +384,23 @@ def configure_files(ssh, server):
     else:
         war_file = "backend.war"
 
-    try:
-        run_ssh_command(
-            ssh,
-            f"cp -p {TOMCAT_INSTALL_DIR}/{PREVIOUS_VERSION}/webapps/{war_file} {NEW_TOMCAT_FOLDER}/webapps/.",
-            sudo=True,
-        )
-    except RuntimeError:
-        print(f"[{server}] Warning: {war_file} not found, skipping")
+    plan.add(
+        f"cp -p {TOMCAT_INSTALL_DIR}/{PREVIOUS_VERSION}/webapps/{war_file} {NEW_TOMCAT_FOLDER}/webapps/.",
+        sudo=True,
+        warning=f"[{server}] Warning: {war_file} not found, skipping",
+    )
+
+    # Run every step in one round trip
+    plan.execute(ssh)
 
 
 def update_server_xml(ssh, server, cert_host):
     """Update server.xml by replacing Realm and placing all Connectors at the start of Service."""
     print(f"[{server}] Updating server.xml configurations...")
 
-    # Backup server.xml
-    run_ssh_command(ssh, f"cp {SERVER_XML} {SERVER_XML}.bak", sudo=True)
-
-    # Download server.xml locally for modification
-    sftp = ssh.open_sftp()
-    temp_local_file = "server.xml.temp"
-    sftp.get(SERVER_XML, temp_local_file)
-    sftp.close()
-
-    # Parse XML
-    parser = etree.XMLParser(remove_blank_text=False)
-    tree = etree.parse(temp_local_file, parser)
-    root = tree.getroot()
+    # Backup server.xml and read it into memory for modification
+    xml_file = RemoteXmlFile(ssh, server, SERVER_XML, USER_GROUP)
+    root = xml_file.load().getroot()
 
     # Remove comments
     for comment in root.xpath("//comment()"):
@@ -463,46 +544,33 @@ def update_server_xml(ssh, server, cert_host):
             valve.set("rotatable", "false")
             valve.set("requestAttributesEnabled", "true")
 
-    # Write the modified XML to temp file
-    tree.write(
-        temp_local_file, encoding="utf-8", xml_declaration=True, pretty_print=True
-    )
-
-    # Perform string-based validation for key elements
-    with open(temp_local_file, "r", encoding="utf-8") as f:
-        content = f.read()
-
-    # Basic string validation - check for required elements
+    # Validate the key elements on the modified tree
     validation_errors = []
-
-    if 'port="8080"' not in content:
-        validation_errors.append("Missing HTTP Connector (port 8080)")
-
-    if 'port="8443"' not in content:
-        validation_errors.append("Missing SSL Connector (port 8443)")
-
-    if f"/app/certificates/public/{cert_host}.med.umich.edu.crt" not in content:
-        validation_errors.append(f"Missing certificate path for {cert_host}")
-
-    if 'protocol="AJP/1.3"' not in content:
-        validation_errors.append("Missing AJP Connector")
-
-    if 'className="org.apache.catalina.realm.JNDIRealm"' not in content:
-        validation_errors.append("Missing JNDI Realm")
-
-    if 'algorithm="PBKDF2WithHmacSHA512"' not in content:
-        validation_errors.append(
-            "Missing CredentialHandler with PBKDF2WithHmacSHA512 algorithm"
-        )
-
-    if 'autoDeploy="false"' not in content:
-        validation_errors.append("Host autoDeploy not set to false")
-
-    if (
-        'rotatable="false"' not in content
-        or 'requestAttributesEnabled="true"' not in content
-    ):
-        validation_errors.append("AccessLogValve missing required attributes")
+    checks = [
+        ("//Connector[@port='8080']", "Missing HTTP Connector (port 8080)"),
+        ("//Connector[@port='8443']", "Missing SSL Connector (port 8443)"),
+        (
+            f"//Certificate[@certificateFile='/app/certificates/public/{cert_host}.med.umich.edu.crt']",
+            f"Missing certificate path for {cert_host}",
+        ),
+        ("//Connector[@protocol='AJP/1.3']", "Missing AJP Connector"),
+        (
+            "//Realm[@className='org.apache.catalina.realm.JNDIRealm']",
+            "Missing JNDI Realm",
+        ),
+        (
+            "//CredentialHandler[@algorithm='PBKDF2WithHmacSHA512']",
+            "Missing CredentialHandler with PBKDF2WithHmacSHA512 algorithm",
+        ),
+        ("//Host[@autoDeploy='false']", "Host autoDeploy not set to false"),
+        (
+            "//Valve[@rotatable='false' and @requestAttributesEnabled='true']",
+            "AccessLogValve missing required attributes",
+        ),
+    ]
+    for xpath, error in checks:
+        if not root.xpath(xpath):
+            validation_errors.append(error)
 
     # Raise error if any validation failed
     if validation_errors:
@@ -511,19 +579,8 @@ def update_server_xml(ssh, server, cert_host):
         )
         raise RuntimeError(error_message)
 
-    # Upload the file to the server
-    temp_remote_file = f"/tmp/server.xml.working"
-    sftp = ssh.open_sftp()
-    sftp.put(temp_local_file, temp_remote_file)
-    sftp.close()
-
-    # move the new file to the correct location and set file permission
-    run_ssh_command(ssh, f"mv {temp_remote_file} {SERVER_XML}", sudo=True)
-    run_ssh_command(ssh, f"chown {USER_GROUP} {SERVER_XML}", sudo=True)
-
-    # Clean up
-    run_ssh_command(ssh, f"rm {SERVER_XML}.bak", sudo=True)
-    os.remove(temp_local_file)
+    # Upload the file to the server, set file permission and remove the backup
+    xml_file.save(pretty_print=True)
     print(f"[{server}] server.xml configurations updated successfully")
 
 
@@ -553,47 +610,24 @@ def update_context_xml(ssh, server, tns_name):
 
 def modify_context_xml(ssh, server, create_resources_fn):
     """Common helper to modify context.xml with a specific resource creation function."""
-    # Backup context.xml
-    run_ssh_command(ssh, f"cp {CONTEXT_XML} {CONTEXT_XML}.bak", sudo=True)
-
-    # Download context.xml locally for modification
-    sftp = ssh.open_sftp()
-    temp_local_file = "context.xml"
-    sftp.get(CONTEXT_XML, temp_local_file)
-    sftp.close()
-
-    # Parse XML while preserving whitespace
-    parser = etree.XMLParser(remove_blank_text=False)
-    tree = etree.parse(temp_local_file, parser)
-    root = tree.getroot()
+    # Backup context.xml and read it into memory, preserving whitespace
+    xml_file = RemoteXmlFile(ssh, server, CONTEXT_XML, USER_GROUP, keep_backup=True)
+    root = xml_file.load().getroot()
 
     # Apply server-specific resource creation (using the passed function)
     validation_errors = create_resources_fn(root)
 
-    # Write the modified XML to temp file
-    tree.write(temp_local_file, encoding="utf-8", xml_declaration=True)
-
     # Handle validation errors if any
     if validation_errors:
-        os.remove(temp_local_file)
         error_message = f"[{server}] Validation failed:\n" + "\n".join(
             validation_errors
         )
         raise RuntimeError(error_message)
 
-    # Upload the file to the server
+    # Upload the file to the server and set file permission
     print(f"[{server}] Uploading modified context.xml to the server")
-    temp_remote_file = "/tmp/context.xml"
-    sftp = ssh.open_sftp()
-    sftp.put(temp_local_file, temp_remote_file)
-    sftp.close()
+    xml_file.save()
 
-    # Move the new file to the correct location and set file permission
-    run_ssh_command(ssh, f"mv {temp_remote_file} {CONTEXT_XML}", sudo=True)
-    run_ssh_command(ssh, f"chown {USER_GROUP} {CONTEXT_XML}", sudo=True)
-
-    # Clean up
-    os.remove(temp_local_file)
     print(f"[{server}] context.xml updated successfully")
     return True
 
@@ -640,21 +674,14 @@ def modify_yhr_context_xml(root, url, res_name):
     # Format indentation based on existing elements
     format_xml_indentation(root, env_element, res_element)
 
-    # Verify elements after writing
-    modified_parser = etree.XMLParser(remove_blank_text=False)
-    tree = etree.parse(
-        StringIO(etree.tostring(root, encoding="utf-8").decode()), modified_parser
-    )
-    modified_root = tree.getroot()
-
-    # Verification checks
-    env_elements = modified_root.xpath(
+    # Verification checks on the modified tree
+    env_elements = root.xpath(
         "//Environment[@name='configuration.properties.file']"
     )
     if not env_elements:
         validation_errors.append("Failed to add Environment element")
 
-    resource_elements = modified_root.xpath("//Resource[@name='jdbc/yhrDataSource']")
+    resource_elements = root.xpath("//Resource[@name='jdbc/yhrDataSource']")
     if not resource_elements:
         validation_errors.append("Failed to add Resource element")
 
@@ -692,15 +719,8 @@ def modify_nabu_context_xml(root, url, res_name):
     # Format indentation
     format_xml_indentation(root, None, res_element)
 
-    # Verify elements after writing
-    modified_parser = etree.XMLParser(remove_blank_text=False)
-    tree = etree.parse(
-        StringIO(etree.tostring(root, encoding="utf-8").decode()), modified_parser
-    )
-    modified_root = tree.getroot()
-
-    # Verification check
-    resource_elements = modified_root.xpath(f"//Resource[@name='{res_name}']")
+    # Verification check on the modified tree
+    resource_elements = root.xpath(f"//Resource[@name='{res_name}']")
     if not resource_elements:
         validation_errors.append(f"Failed to add Resource element {res_name}")
 
@@ -741,19 +761,9 @@ def update_manager_web_xml(ssh, server):
     """Update manager web.xml by replacing role-names in security-constraints."""
     print(f"[{server}] Updating manager web.xml role configurations...")
 
-    # Backup web.xml
-    run_ssh_command(ssh, f"cp {MANAGER_WEB_XML} {MANAGER_WEB_XML}.bak", sudo=True)
-
-    # Download web.xml locally for modification
-    sftp = ssh.open_sftp()
-    temp_local_file = "manager.web.xml"
-    sftp.get(MANAGER_WEB_XML, temp_local_file)
-    sftp.close()
-
-    # Parse XML while preserving whitespace and comments
-    parser = etree.XMLParser(remove_blank_text=False)
-    tree = etree.parse(temp_local_file, parser)
-    root = tree.getroot()
+    # Backup web.xml and read it into memory, preserving whitespace and comments
+    xml_file = RemoteXmlFile(ssh, server, MANAGER_WEB_XML, USER_GROUP)
+    root = xml_file.load().getroot()
 
     # Define the namespace
     ns = {"j": "https://jakarta.ee/xml/ns/jakartaee"}
@@ -891,9 +901,6 @@ def update_manager_web_xml(ssh, server):
         # If error-page not found, add to the end of the root element
         add_security_roles(root, len(list(root)))
 
-    # Write the modified XML to temp file
-    tree.write(temp_local_file, encoding="utf-8", xml_declaration=True)
-
     # Validate the exact roles set for each constraint
     validation_errors = []
 
@@ -954,20 +961,9 @@ def update_manager_web_xml(ssh, server):
     print(f"  Status: {modified_constraints['status']}")
     print(f"  Security Roles: {role_names}")
 
-    # Upload the file to the server
+    # Upload the file to the server, set file permission and remove the backup
     print("Uploading modified file to the server")
-    temp_remote_file = f"/tmp/manager.web.xml"
-    sftp = ssh.open_sftp()
-    sftp.put(temp_local_file, temp_remote_file)
-    sftp.close()
-
-    # move the new file to the correct location and set file permission
-    run_ssh_command(ssh, f"mv {temp_remote_file} {MANAGER_WEB_XML}", sudo=True)
-    run_ssh_command(ssh, f"chown {USER_GROUP} {MANAGER_WEB_XML}", sudo=True)
-
-    # Clean up
-    run_ssh_command(ssh, f"rm {MANAGER_WEB_XML}.bak", sudo=True)
-    os.remove(temp_local_file)
+    xml_file.save()
     print(f"[{server}] Manager web.xml configurations updated successfully")
     return True
 
@@ -976,21 +972,9 @@ def update_host_manager_web_xml(ssh, server):
     """Update host-manager web.xml by replacing role-names in security-constraints."""
     print(f"[{server}] Updating host-manager web.xml role configurations...")
 
-    # Backup web.xml
-    run_ssh_command(
-        ssh, f"cp {HOST_MANAGER_WEB_XML} {HOST_MANAGER_WEB_XML}.bak", sudo=True
-    )
-
-    # Download web.xml locally for modification
-    sftp = ssh.open_sftp()
-    temp_local_file = "host-manager.web.xml"
-    sftp.get(HOST_MANAGER_WEB_XML, temp_local_file)
-    sftp.close()
-
-    # Parse XML while preserving whitespace and comments
-    parser = etree.XMLParser(remove_blank_text=False)
-    tree = etree.parse(temp_local_file, parser)
-    root = tree.getroot()
+    # Backup web.xml and read it into memory, preserving whitespace and comments
+    xml_file = RemoteXmlFile(ssh, server, HOST_MANAGER_WEB_XML, USER_GROUP)
+    root = xml_file.load().getroot()
 
     # Define the namespace
     ns = {"j": "https://jakarta.ee/xml/ns/jakartaee"}
@@ -1085,9 +1069,6 @@ def update_host_manager_web_xml(ssh, server):
         # If error-page not found, add to the end of the root element
         add_security_roles(root, len(list(root)))
 
-    # Write the modified XML to temp file
-    tree.write(temp_local_file, encoding="utf-8", xml_declaration=True)
-
     # Validate the exact roles set for each constraint
     validation_errors = []
 
@@ -1127,20 +1108,9 @@ def update_host_manager_web_xml(ssh, server):
     print(f"  Html Host Manager: {modified_constraints['htmlHostManager']}")
     print(f"  Security Roles: {role_names}")
 
-    # Upload the file to the server
+    # Upload the file to the server, set file permission and remove the backup
     print("Uploading modified file to the server")
-    temp_remote_file = f"/tmp/host-manager.web.xml"
-    sftp = ssh.open_sftp()
-    sftp.put(temp_local_file, temp_remote_file)
-    sftp.close()
-
-    # move the new file to the correct location and set file permission
-    run_ssh_command(ssh, f"mv {temp_remote_file} {HOST_MANAGER_WEB_XML}", sudo=True)
-    run_ssh_command(ssh, f"chown {USER_GROUP} {HOST_MANAGER_WEB_XML}", sudo=True)
-
-    # Clean up
-    run_ssh_command(ssh, f"rm {HOST_MANAGER_WEB_XML}.bak", sudo=True)
-    os.remove(temp_local_file)
+    xml_file.save()
     print(f"[{server}] Host-manager web.xml configurations updated successfully")
     return True
 
@@ -1165,22 +1135,68 @@ def display_final_warnings():
     print()
 
 
-def main():
-    # Get confirmation before proceeding
-    if not get_confirmation():
-        sys.exit(0)
-
-    has_nabu_servers = False
-
-    for server in SERVERS:
+class HostPrefixedOutput:
+    """
+    Wrap stdout so every line printed by a server's worker thread starts with [server].
+    Lines are written whole, so output from concurrent servers never interleaves mid-line.
+    """
 
-        if server in ["nabu-test", "nabu-prod"]:
-            has_nabu_servers = True
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def set_host(self, server):
+        self._local.host = server
+        self._local.pending = ""
+
+    def write(self, text):
+        host = getattr(self._local, "host", None)
+        if host is None:
+            with self._lock:
+                return self.stream.write(text)
+        self._local.pending += text
+        *lines, self._local.pending = self._local.pending.split("\n")
+        for line in lines:
+            self._write_line(host, line)
+        return len(text)
+
+    def _write_line(self, host, line):
+        # Most messages already carry the server name
+        if line and not line.startswith(f"[{host}]"):
+            line = f"[{host}] {line}"
+        with self._lock:
+            self.stream.write(line + "\n")
+
+    def flush(self):
+        host = getattr(self._local, "host", None)
+        if host is not None and self._local.pending:
+            self._write_line(host, self._local.pending)
+            self._local.pending = ""
+        with self._lock:
+            self.stream.flush()
+
+
+def configure_server(server, archive, pool, cancelled):
+    """
+    Run every configuration step on one server.
+    Returns a result dict with the status, the step reached, the duration and any error.
+    """
+    result = {"server": server, "status": "SKIPPED", "step": None, "seconds": 0.0, "error": None}
+    if cancelled.is_set():
+        result["error"] = "Cancelled after another server failed"
+        return result
 
+    started = time.time()
+    ssh = None
+    try:
         print(
             f"============================================\nStarting Tomcat {NEW_VERSION} configuration on {server}...\n============================================"
         )
 
+        # Look up the server's mappings before connecting
+        result["step"] = "resolve_config"
+
         # Get certificate host
         cert_host = CERT_HOSTS.get(server, "michr-ap-ds15a")
         if not cert_host:
@@ -1206,31 +1222,167 @@ def main():
                 )
             print(f"[{server}] Using TNS name: {tns_name} for database connection")
 
+        # Connect to server and perform tasks, recording the step in progress
+        steps = [
+            ("connect", None),
+            ("download_and_extract", lambda: download_and_extract(ssh, server, archive)),
+            ("configure_files", lambda: configure_files(ssh, server)),
+            ("update_server_xml", lambda: update_server_xml(ssh, server, cert_host)),
+            ("update_context_xml", lambda: update_context_xml(ssh, server, tns_name)),
+            ("update_manager_web_xml", lambda: update_manager_web_xml(ssh, server)),
+            ("update_host_manager_web_xml", lambda: update_host_manager_web_xml(ssh, server)),
+        ]
+        for step, task in steps:
+            result["step"] = step
+            if task is None:
+                ssh = pool.connect(server)
+            else:
+                task()
+
+        print(f"[{server}]  Configuration for Apache Tomcat {NEW_VERSION} completed.")
+        result["status"] = "SUCCESS"
+    except Exception as e:
+        print(f"[{server}] Unexpected error occurred: {e}")
+        result["status"] = "FAILED"
+        result["error"] = str(e)
+    finally:
+        result["seconds"] = round(time.time() - started, 1)
+    return result
+
+
+def configure_servers(servers, archive, pool, workers, fail_fast=False):
+    """
+    Configure the servers concurrently on up to `workers` threads, prefixing output by server.
+    Each server's session is taken from `pool` and left open for later phases.
+    A failed server does not stop the others unless `fail_fast` is set, in which case
+    servers that have not started yet are skipped. Results are returned in server order.
+    """
+    cancelled = threading.Event()
+    output = HostPrefixedOutput(sys.stdout)
+
+    def run(server):
+        output.set_host(server)
         try:
-            # Connect to server
-            ssh = ssh_connect(server)
+            result = configure_server(server, archive, pool, cancelled)
+        finally:
+            output.flush()
+        if fail_fast and result["status"] == "FAILED":
+            cancelled.set()
+        return result
+
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            return list(executor.map(run, servers))
+    finally:
+        sys.stdout = output.stream
 
-            # Perform tasks
-            download_and_extract(ssh, server)
-            configure_files(ssh, server)
-            update_server_xml(ssh, server, cert_host)
-            update_context_xml(ssh, server, tns_name)
-            update_manager_web_xml(ssh, server)
-            update_host_manager_web_xml(ssh, server)
 
-            print(
-                f"[{server}]  Configuration for Apache Tomcat {NEW_VERSION} completed."
-            )
+def print_summary(results):
+    """Print a table of the configuration result of each server."""
+    print("\n" + "=" * 80)
+    print("CONFIGURATION SUMMARY")
+    print("=" * 80)
+
+    width = max(len(result["server"]) for result in results)
+    print(f"   {'Server':<{width}}  {'Status':<8}  {'Time':>7}  Step / Error")
+    for result in results:
+        status_indicator = {"SUCCESS": "✅", "FAILED": "❌"}.get(result["status"], "⏭️")
+        detail = result["error"] or ""
+        if result["status"] == "FAILED":
+            detail = f"{result['step']}: {detail}"
+        print(
+            f"{status_indicator} {result['server']:<{width}}  {result['status']:<8}  {result['seconds']:>6.1f}s  {detail}"
+        )
+
+    success_count = sum(1 for result in results if result["status"] == "SUCCESS")
+    print("-" * 80)
+    print(f"Total servers: {len(results)}")
+    print(f"Successful configurations: {success_count}")
+    print(f"Failed or skipped configurations: {len(results) - success_count}")
+    print("=" * 80)
+    return success_count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=f"Configure Apache Tomcat {NEW_VERSION} on {len(SERVERS)} servers."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Number of servers configured at the same time (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--download-url",
+        default=DOWNLOAD_URL,
+        help="URL of the Tomcat archive; its SHA-512 is read from the same URL with .sha512 appended",
+    )
+    parser.add_argument(
+        "--archive-cache",
+        default=ARCHIVE_CACHE_DIR,
+        help=f"Local directory the verified archive is cached in (default: {ARCHIVE_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="Skip the servers that have not started yet once one server fails",
+    )
+    parser.add_argument(
+        "--deploy",
+        action="store_true",
+        help="Once every server is configured, deploy it as upgrade_tomcat_deploy.py does, "
+        "over the same SSH sessions",
+    )
+    args = parser.parse_args()
+    if args.deploy and (
+        upgrade_tomcat_deploy.NEW_VERSION != NEW_VERSION
+        or upgrade_tomcat_deploy.SERVERS != SERVERS
+    ):
+        parser.error(
+            "--deploy needs the same NEW_VERSION and SERVERS in upgrade_tomcat_deploy.py"
+        )
 
-            ssh.close()
-        except Exception as e:
-            print(f"[{server}] Unexpected error occurred: {e}")
-            ssh.close()
-            exit(1)
+    # Get confirmation before proceeding
+    if not get_confirmation():
+        sys.exit(0)
+
+    has_nabu_servers = any(server in ["nabu-test", "nabu-prod"] for server in SERVERS)
 
-    if has_nabu_servers:
-        # Display final warnings
-        display_final_warnings()
+    # Download and verify the archive once for all servers
+    try:
+        archive = fetch_archive(args.download_url, args.archive_cache)
+    except Exception as e:
+        print(f"Failed to download Apache Tomcat archive: {e}")
+        sys.exit(1)
+
+    with SSHSessionPool() as pool:
+        results = configure_servers(SERVERS, archive, pool, args.workers, args.fail_fast)
+        success_count = print_summary(results)
+
+        if has_nabu_servers:
+            # Display final warnings
+            display_final_warnings()
+
+        if success_count != len(SERVERS):
+            print("\nWARNING: Not all configurations were successful!")
+            if args.deploy:
+                print("Skipping deployment.")
+            sys.exit(1)
+
+        if args.deploy:
+            # Deploy over the sessions the configuration opened; they are kept alive
+            # while the deployment is confirmed
+            if not upgrade_tomcat_deploy.get_confirmation():
+                sys.exit(0)
+            if not upgrade_tomcat_deploy.check_nabu_credentials():
+                sys.exit(0)
+            deploy_results = upgrade_tomcat_deploy.deploy_servers(SERVERS, pool)
+            if upgrade_tomcat_deploy.print_summary(deploy_results) != len(SERVERS):
+                print("\nWARNING: Not all deployments were successful!")
+                sys.exit(1)
+            print("\nAll deployments completed successfully!")
 
 
 if __name__ == "__main__":
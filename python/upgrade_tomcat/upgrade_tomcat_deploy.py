@@ -17,10 +17,8 @@
 # in vscode, cmd+shift+p -> Python: Select Interpretor -> ~/development/scripts/tomcat_venv
 
 import time
-import paramiko
-import os
-import getpass
 import sys
+from ssh_pool import SSHSessionPool
 
 NEW_VERSION = "11.0.7"
 TOMCAT_INSTALL_DIR = "/app/apps/rhel8/apache-tomcat"
@@ -38,8 +36,6 @@ SERVERS = [
     "yhr-demo-test",
 ]
 
-SSH_KEY_PATH = "~/.ssh/id_rsa"  # Path to your SSH private key
-
 
 def get_confirmation():
     """
@@ -141,40 +137,6 @@ def run_ssh_command(ssh, command, sudo=False):
     return output
 
 
-def ssh_connect(server):
-    """Establish an SSH connection using SSH config for hostname resolution."""
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-    # Load SSH config to use the same hostname resolution as your terminal
-    ssh_config = paramiko.SSHConfig()
-    user_config_file = os.path.expanduser("~/.ssh/config")
-    if os.path.exists(user_config_file):
-        with open(user_config_file) as f:
-            ssh_config.parse(f)
-
-    # Get hostname configuration from SSH config
-    host_config = ssh_config.lookup(server)
-
-    try:
-        # Use config-provided hostname if available, otherwise use server name
-        hostname = host_config.get("hostname", server)
-        username = host_config.get("user", getpass.getuser())
-        key_filename = host_config.get(
-            "identityfile", [os.path.expanduser(SSH_KEY_PATH)]
-        )
-        if isinstance(key_filename, list) and key_filename:
-            key_filename = key_filename[0]
-
-        print(f"Connecting to {hostname} as {username}...")
-        ssh.connect(
-            hostname=hostname, username=username, key_filename=key_filename, timeout=10
-        )
-        return ssh
-    except Exception as e:
-        raise RuntimeError(f"Failed to connect to {server}: {e}")
-
-
 def deploy_new_tomcat(ssh, server):
     """
     Deploy the new Tomcat by creating symbolic links and restarting the service.
@@ -310,26 +272,22 @@ def deploy_new_tomcat(ssh, server):
         raise RuntimeError(error_message)
 
 
-def main():
-    # Get confirmation before proceeding
-    if not get_confirmation():
-        sys.exit(0)
-
-    # Check Nabu credentials if any Nabu servers are in the list
-    if not check_nabu_credentials():
-        sys.exit(0)
-
+def deploy_servers(servers, pool):
+    """
+    Deploy the new Tomcat on each server in turn, using the server's session from `pool`.
+    Returns a list of (server, status) tuples.
+    """
     # Track deployment results
     results = []
 
-    for server in SERVERS:
+    for server in servers:
         print(
             f"============================================\nDeploying Apache Tomcat update on {server}...\n============================================"
         )
 
         try:
-            # Connect to server
-            ssh = ssh_connect(server)
+            # Connect to server, or reuse the connection of an earlier phase
+            ssh = pool.connect(server)
 
             # Perform tasks
             deploy_new_tomcat(ssh, server)
@@ -339,10 +297,11 @@ def main():
             error_message = f"[{server}] Unexpected error occurred: {e}"
             print(error_message)
             results.append((server, f"FAILED: {str(e)}"))
-        finally:
-            if ssh:
-                ssh.close()
-    # Print summary
+    return results
+
+
+def print_summary(results):
+    """Print the deployment result of each server and return the number of successes."""
     print("\n" + "=" * 80)
     print("DEPLOYMENT SUMMARY")
     print("=" * 80)
@@ -354,10 +313,26 @@ def main():
         print(f"{status_indicator} {server}: {status}")
 
     print("-" * 80)
-    print(f"Total servers: {len(SERVERS)}")
+    print(f"Total servers: {len(results)}")
     print(f"Successful deployments: {success_count}")
-    print(f"Failed deployments: {len(SERVERS) - success_count}")
+    print(f"Failed deployments: {len(results) - success_count}")
     print("=" * 80)
+    return success_count
+
+
+def main():
+    # Get confirmation before proceeding
+    if not get_confirmation():
+        sys.exit(0)
+
+    # Check Nabu credentials if any Nabu servers are in the list
+    if not check_nabu_credentials():
+        sys.exit(0)
+
+    with SSHSessionPool() as pool:
+        results = deploy_servers(SERVERS, pool)
+
+    success_count = print_summary(results)
 
     # Exit with appropriate code
     if success_count != len(SERVERS):
@@ -0,0 +1,355 @@
+"""Measure the throughput of the enrichment and output stages on synthetic data.
+
+Run from the project directory, for example:
+
+    python -m benchmarks.run --rows 20000 --ip-count 2000 --latency 0.005 --throttle-rate 0.05
+
+Each run is appended as one JSON line to the results file and compared with the
+latest earlier run that used the same options.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.stub_geo_server import StubGeolocationServer
+from benchmarks.synthetic import synthetic_batches
+from main import enrich_batch, get_enrichers
+from src.batch import RowBatch
+from src.ip_lookup.cache import GeolocationCache
+from src.ip_lookup.geolocation import GeolocationClient
+from src.output.buffered_output import BufferedOutput
+from src.output.csv_writer import CsvBatchWriter
+from src.pipeline import StagedPipeline
+from src.row_enricher.geolocation_enricher import GeolocationEnricher
+
+RESULTS_FILENAME = "benchmark_results.jsonl"
+
+# A benchmark's setup returns the callable to measure, which returns its metrics.
+# Setup runs before every repetition, so each one starts from cold caches.
+Setup = Callable[[argparse.Namespace, List[RowBatch], StubGeolocationServer], Callable[[], Dict[str, Any]]]
+
+
+def _client(args: argparse.Namespace, server: StubGeolocationServer, cache_dir: Optional[str] = None) -> GeolocationClient:
+    persistent_cache = None
+    if cache_dir is not None:
+        persistent_cache = GeolocationCache(os.path.join(cache_dir, "geo_cache.sqlite3"))
+    return GeolocationClient(
+        base_url=server.base_url,
+        api_key="benchmark",
+        rate_limit_delay=1 / args.rate_per_second,
+        persistent_cache=persistent_cache,
+        burst=args.burst,
+        max_workers=args.max_workers,
+        backoff_base=0.01,
+        timeout=5.0,
+    )
+
+
+def _server_metrics(server: StubGeolocationServer, lookups: int) -> Dict[str, Any]:
+    # Every lookup the in-memory cache misses ends in exactly one successful request
+    fetched = server.requests - server.throttled
+    return {
+        "lookups": lookups,
+        "server_requests": server.requests,
+        "throttled": server.throttled,
+        "cache_hit_rate": round(1 - fetched / lookups, 4) if lookups else 0.0,
+    }
+
+
+def geolocation_client(args, batches, server):
+    client = _client(args, server)
+    ip_lists = [
+        [ip for ip in set(batch.column("INTEREST_SOURCE_ADDRESS")).union(batch.column("ACTIVATION_SOURCE_ADDRESS")) if ip]
+        for batch in batches
+    ]
+
+    def run():
+        for ips in ip_lists:
+            client.get_geolocations(ips)
+        client.close()
+        lookups = sum(len(ips) for ips in ip_lists)
+        return {"rows": lookups, **_server_metrics(server, lookups)}
+
+    return run
+
+
+def geolocation_client_persistent_cache(args, batches, server):
+    # Resolve everything once into a persistent cache, then measure a new client
+    # that only has the persistent cache to fall back on
+    cache_dir = tempfile.mkdtemp(prefix="benchmark_geo_cache_")
+    warm = _client(args, server, cache_dir)
+    warm.get_geolocations(sorted({ip for batch in batches for ip in batch.column("INTEREST_SOURCE_ADDRESS")}))
+    warm.close()
+    server.reset_counts()
+    client = _client(args, server, cache_dir)
+    ips = [ip for batch in batches for ip in batch.column("INTEREST_SOURCE_ADDRESS")]
+
+    def run():
+        for ip in ips:
+            client.get_geolocation(ip)
+        cache = client.persistent_cache
+        client.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return {
+            "rows": len(ips),
+            "persistent_cache_hits": cache.hits,
+            "persistent_cache_misses": cache.misses,
+            "server_requests": server.requests,
+        }
+
+    return run
+
+
+def geolocation_enricher(args, batches, server):
+    client = _client(args, server)
+    enricher = GeolocationEnricher(client)
+
+    def run():
+        for batch in batches:
+            enricher.enrich_batch(batch)
+        client.close()
+        return {"rows": sum(len(batch) for batch in batches), **_server_metrics(server, _batch_lookups(batches))}
+
+    return run
+
+
+def geolocation_enricher_rows(args, batches, server):
+    # The row by row path (IpEnricher.enrich), against a warm in-memory cache
+    client = _client(args, server)
+    enricher = GeolocationEnricher(client)
+    enricher.prefetch(batches)
+    rows = [row for batch in batches for row in batch.dicts()]
+
+    def run():
+        for row in rows:
+            enricher.enrich(row)
+        client.close()
+        return {"rows": len(rows)}
+
+    return run
+
+
+def enrich_batches(args, batches, server):
+    # main.enrich_batch with every enricher main uses for --name-pattern python, from cold caches
+    client = _client(args, server)
+    enrichers = get_enrichers(client, "python")
+
+    def run():
+        for batch in batches:
+            enrich_batch(batch, enrichers)
+        client.close()
+        return {"rows": sum(len(batch) for batch in batches), **_server_metrics(server, _batch_lookups(batches))}
+
+    return run
+
+
+def csv_writer(args, batches, server):
+    enriched = [enrich_batch(batch, get_enrichers(_WarmBackend(), "python")) for batch in batches]
+
+    def run():
+        with open(os.devnull, "wb") as stream:
+            output = BufferedOutput(stream)
+            writer = CsvBatchWriter(output)
+            for batch in enriched:
+                writer.write_batch(batch)
+            writer.close()
+            stats = output.close()
+        return {"rows": stats["rows"], "bytes": stats["bytes"]}
+
+    return run
+
+
+def staged_pipeline(args, batches, server):
+    # Enrich and write to CSV as main does, from cold caches
+    client = _client(args, server)
+    enrichers = get_enrichers(client, "python")
+
+    def run():
+        with open(os.devnull, "wb") as stream:
+            output = BufferedOutput(stream)
+            writer = CsvBatchWriter(output)
+            pipeline = StagedPipeline(lambda batch: enrich_batch(batch, enrichers), args.enrich_workers)
+            for batch in pipeline.run(iter(batches)):
+                writer.write_batch(batch)
+            writer.close()
+            stats = output.close()
+        client.close()
+        return {"rows": stats["rows"], "bytes": stats["bytes"], **_server_metrics(server, _batch_lookups(batches))}
+
+    return run
+
+
+class _WarmBackend:
+    """A geolocation backend that answers every IP instantly, for output-only benchmarks."""
+
+    def get_geolocation(self, ip):
+        geolocation = StubGeolocationServer.geolocation(ip)
+        geolocation["country"] = geolocation.pop("country_name")
+        return geolocation
+
+    def get_geolocations(self, ip_addresses):
+        return {ip: self.get_geolocation(ip) for ip in ip_addresses}
+
+
+def _batch_lookups(batches: List[RowBatch]) -> int:
+    """Count the IP lookups GeolocationEnricher.enrich_columns makes for the batches."""
+    return sum(
+        len({ip for ip in set(batch.column("INTEREST_SOURCE_ADDRESS")).union(batch.column("ACTIVATION_SOURCE_ADDRESS")) if ip})
+        for batch in batches
+    )
+
+
+BENCHMARKS: Dict[str, Setup] = {
+    "geolocation_client": geolocation_client,
+    "geolocation_client_persistent_cache": geolocation_client_persistent_cache,
+    "geolocation_enricher": geolocation_enricher,
+    "geolocation_enricher_rows": geolocation_enricher_rows,
+    "enrich_batch": enrich_batches,
+    "csv_writer": csv_writer,
+    "staged_pipeline": staged_pipeline,
+}
+
+
+def measure(name: str, args: argparse.Namespace, batches: List[RowBatch], server: StubGeolocationServer) -> Dict[str, Any]:
+    """Run a benchmark `args.repeat` times, keeping the fastest, then once more for peak memory."""
+    best: Optional[Dict[str, Any]] = None
+    for _ in range(args.repeat):
+        server.reset_counts()
+        run = BENCHMARKS[name](args, batches, server)
+        server.reset_counts()
+        started = time.perf_counter()
+        metrics = run()
+        seconds = time.perf_counter() - started
+        if best is None or seconds < best["seconds"]:
+            best = {"seconds": round(seconds, 4), **metrics}
+    assert best is not None
+    best["rows_per_sec"] = round(best["rows"] / best["seconds"], 1) if best["seconds"] else 0.0
+
+    # tracemalloc slows allocation down, so memory is measured in a separate run
+    server.reset_counts()
+    run = BENCHMARKS[name](args, batches, server)
+    server.reset_counts()
+    tracemalloc.start()
+    try:
+        run()
+        best["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"benchmark": name, **best}
+
+
+def git_revision() -> Dict[str, Any]:
+    """Return the current commit and whether the working tree has changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--", "."], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def load_runs(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_baseline(runs: List[Dict[str, Any]], options: Dict[str, Any], commit: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Return the latest stored run with the same options, at `commit` if given."""
+    for run in reversed(runs):
+        if run["options"] != options:
+            continue
+        if commit is None or (run.get("commit") or "").startswith(commit):
+            return run
+    return None
+
+
+def print_comparison(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]]) -> None:
+    previous = {result["benchmark"]: result for result in (baseline or {}).get("results", [])}
+    if baseline is not None:
+        print(f"Compared with {(baseline.get('commit') or 'unknown')[:10]} ({baseline['started_at']})")
+    print(f"{'benchmark':<38} {'rows/s':>12} {'change':>8} {'peak MiB':>9} {'hit rate':>9}")
+    for result in results:
+        change = ""
+        before = previous.get(result["benchmark"])
+        if before and before["rows_per_sec"]:
+            change = f"{(result['rows_per_sec'] / before['rows_per_sec'] - 1) * 100:+.1f}%"
+        hit_rate = result.get("cache_hit_rate")
+        print(
+            f"{result['benchmark']:<38} {result['rows_per_sec']:>12,.1f} {change:>8} "
+            f"{result['peak_memory_bytes'] / (1 << 20):>9.1f} "
+            f"{'' if hit_rate is None else f'{hit_rate:.1%}':>9}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the enrichment and output stages on synthetic data.")
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK", help=f"Benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--rows", type=int, default=10000, help="Synthetic rows (default: 10000)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per batch (default: 1000)")
+    parser.add_argument("--ip-count", type=int, default=500, help="Distinct source IPs in the synthetic rows (default: 500)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic rows and the stub server (default: 0)")
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds the stub server takes per request (default: 0.005)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests the stub server answers with 429 (default: 0)")
+    parser.add_argument("--rate-per-second", type=float, default=1000, help="Client rate limit in requests per second (default: 1000)")
+    parser.add_argument("--burst", type=int, default=50, help="Client rate limit burst (default: 50)")
+    parser.add_argument("--max-workers", type=int, default=8, help="Concurrent lookups per batch (default: 8)")
+    parser.add_argument("--enrich-workers", type=int, default=2, help="Enrichment threads of the staged pipeline (default: 2)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per benchmark; the fastest is kept (default: 3)")
+    parser.add_argument("--results", default=RESULTS_FILENAME, help=f"JSONL file the results are appended to (default: {RESULTS_FILENAME})")
+    parser.add_argument("--compare", metavar="COMMIT", help="Compare with the latest stored run at COMMIT instead of the latest run")
+    parser.add_argument("--no-save", action="store_true", help="Do not append this run to the results file")
+    args = parser.parse_args(argv)
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    names = args.benchmarks or list(BENCHMARKS)
+    options = {
+        name: getattr(args, name)
+        for name in (
+            "rows", "batch_size", "ip_count", "seed", "latency", "throttle_rate",
+            "rate_per_second", "burst", "max_workers", "enrich_workers",
+        )
+    }
+    batches = list(synthetic_batches(args.rows, args.batch_size, args.ip_count, args.seed))
+
+    results = []
+    with StubGeolocationServer(args.latency, args.throttle_rate, seed=args.seed) as server:
+        for name in names:
+            print(f"Running {name}...", file=sys.stderr)
+            results.append(measure(name, args, batches, server))
+
+    runs = load_runs(args.results)
+    print_comparison(results, find_baseline(runs, options, args.compare))
+    if not args.no_save:
+        record = {
+            **git_revision(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "options": options,
+            "results": results,
+        }
+        with open(args.results, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
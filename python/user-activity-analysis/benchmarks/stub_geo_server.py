@@ -0,0 +1,106 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class StubGeolocationServer:
+    def __init__(
+        self,
+        latency: float = 0.01,
+        throttle_rate: float = 0.0,
+        retry_after: Optional[float] = 0.01,
+        seed: int = 0,
+    ) -> None:
+        """A local stand-in for the ipapi.co JSON API.
+
+        Each request waits `latency` seconds. A `throttle_rate` fraction of
+        requests is answered with 429 and a `Retry-After` of `retry_after`
+        seconds (no header if None). Responses are derived from the IP, so
+        repeated lookups return the same geolocation.
+        """
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                with stub._lock:
+                    stub.requests += 1
+                    throttle = stub._rng.random() < stub.throttle_rate
+                    if throttle:
+                        stub.throttled += 1
+                time.sleep(stub.latency)
+                if throttle:
+                    self.send_response(429)
+                    if stub.retry_after is not None:
+                        self.send_header("Retry-After", str(stub.retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                ip = self.path.strip("/").split("/")[0]
+                body = json.dumps(stub.geolocation(ip)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
+
+    @staticmethod
+    def geolocation(ip: str) -> dict:
+        first, _, rest = ip.partition(".")
+        return {
+            "ip": ip,
+            "city": f"City {first}",
+            "region": f"Region {first}",
+            "country_name": f"Country {first}",
+            "postal": rest or "Unknown",
+            "org": f"AS{first} Example",
+            "network": f"{ip.rsplit('.', 1)[0]}.0/24" if ip.count(".") == 3 else None,
+        }
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.throttled = 0
+
+    def start(self) -> "StubGeolocationServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="stub-geo-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubGeolocationServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,93 @@
+import random
+from typing import Iterator, List, Optional
+
+from src.batch import RowBatch
+
+# The columns of suspicious_activity_query.sql with the raw name columns,
+# as selected for --name-pattern python
+COLUMNS = [
+    "USER_ID",
+    "FIRST_NAME",
+    "LAST_NAME",
+    "USER_NAME",
+    "STUDY_ID",
+    "OFFERS_COMPENSATION",
+    "INTEREST_SOURCE_ADDRESS",
+    "SUSPICIOUS_INTERESTED_COUNT",
+    "INTEREST_PERIOD_MINS",
+    "AVG_TIME_TO_SHOW_INTEREST_MINS",
+    "ACTIVATION_SOURCE_ADDRESS",
+    "SUSPICIOUS_SIGNUP_COUNT",
+    "CREATION_PERIOD_MINS",
+    "ACTIVATION_PERIOD_MINS",
+    "AVG_TIME_TO_ACTIVATE_MINS",
+]
+
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie"]
+LAST_NAMES = ["Smith", "Nguyen", "Garcia", "O'Brien", "Kowalski", "Lee", "Patel", "Brown"]
+
+
+def synthetic_ips(count: int, seed: int = 0) -> List[str]:
+    """Return `count` distinct IPv4 addresses spread over /24 networks."""
+    rng = random.Random(seed)
+    ips = set()
+    while len(ips) < count:
+        ips.add(
+            f"{rng.randint(1, 223)}.{rng.randint(0, 255)}."
+            f"{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        )
+    return sorted(ips)
+
+
+def synthetic_batches(
+    rows: int,
+    batch_size: int = 1000,
+    ip_count: int = 500,
+    seed: int = 0,
+    activation_ip_ratio: float = 0.3,
+) -> Iterator[RowBatch]:
+    """Generate RowBatches shaped like the suspicious activity query's result.
+
+    Source addresses are drawn from `ip_count` distinct IPs, so the IP
+    cardinality (and with it the geolocation cache hit rate) can be tuned.
+    `activation_ip_ratio` of the rows have an activation address different
+    from the interest address; the rest have none, like users who signed up
+    before the backup.
+    """
+    rng = random.Random(seed)
+    ips = synthetic_ips(ip_count, seed)
+    batch: List[tuple] = []
+    for user_id in range(1, rows + 1):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        if rng.random() < 0.5:
+            user_name = f"{first}.{last}{rng.randint(0, 99)}@example.com".lower()
+        else:
+            user_name = f"user{user_id}@example.com"
+        activation_ip: Optional[str] = None
+        if rng.random() < activation_ip_ratio:
+            activation_ip = rng.choice(ips)
+        batch.append(
+            (
+                user_id,
+                first,
+                last,
+                user_name,
+                rng.randint(1, 200),
+                rng.choice(["Y", "N"]),
+                rng.choice(ips),
+                rng.randint(2, 40),
+                round(rng.uniform(0, 600), 2),
+                round(rng.uniform(0, 120), 2),
+                activation_ip,
+                rng.randint(0, 20),
+                round(rng.uniform(0, 600), 2),
+                round(rng.uniform(0, 600), 2),
+                round(rng.uniform(0, 60), 2),
+            )
+        )
+        if len(batch) >= batch_size:
+            yield RowBatch(COLUMNS, batch)
+            batch = []
+    if batch:
+        yield RowBatch(COLUMNS, batch)
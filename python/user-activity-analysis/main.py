@@ -1,119 +1,274 @@
 import sys
-import csv
 import argparse
 from src.config import load_config, get_dsn
 from src.database import DatabaseClient, QueryExecutionError, DatabaseConnectionError
-from src.query_builder import build_database_query
+from src.query_builder import build_database_query, build_local_queries, build_study_ids_query, study_filter_params
+from src.local_engine import LocalAnalyticsEngine
+from src.extract_cache import ExtractCache
 import logging
 from logger import configure_logging
-from src.ip_lookup.geolocation import GeolocationClient
+from src.ip_lookup.backend import create_geolocation_backend
 from src.row_enricher.geolocation_enricher import GeolocationEnricher
+from src.row_enricher.name_pattern_enricher import NamePatternEnricher
+from src.spool import RowSpool
+from src.pipeline import StagedPipeline
+from src.login_audit_snapshot import LoginAuditSnapshot
+from src.query_report import QueryReport, default_report_path
+from src.incremental import IncrementalState, merge_rows, read_snapshot, write_snapshot
+from src.output.buffered_output import BufferedOutput, FlushPolicy
+from src.output.csv_writer import CsvBatchWriter
 
 configure_logging()
 logger = logging.getLogger(__name__)
 
-def get_enrichers(config):
-    geo_client = GeolocationClient.from_config(config)
+def get_enrichers(geo_client, name_pattern="sql"):
     enrichers = [GeolocationEnricher(geo_client)]
+    if name_pattern == "python":
+        enrichers.append(NamePatternEnricher())
     # enrichers.append(BlacklistEnricher(...))  # add more as needed
     return enrichers
 
-def enrich_row(row, enrichers):
-    # First convert all input keys to uppercase to ensure consistent case
-    row = {k.upper(): v for k, v in row.items()}
-    
-    # Apply enrichers
+def get_writer(args, output):
+    if args.format == "parquet":
+        from src.output.arrow_writer import ParquetBatchWriter
+        return ParquetBatchWriter(output, args.compression, args.row_group_size)
+    if args.format == "arrow":
+        from src.output.arrow_writer import ArrowIpcBatchWriter
+        return ArrowIpcBatchWriter(output)
+    return CsvBatchWriter(output)
+
+def enrich_batch(batch, enrichers):
+    # Column names are normalized to uppercase once per result set by the database
+    # client, so each enricher only adds its columns to the batch
     for enricher in enrichers:
-        row = enricher.enrich(row)
-    
-    # Convert all keys to uppercase again after enrichment to ensure consistency
-    return {k.upper(): v for k, v in row.items()}
-
-def get_output_fieldnames(first_row, enrichers):
-    # Collect all enrichment fields from enrichers
-    enrichment_fields = []
+        batch = enricher.enrich_batch(batch)
+    return batch
+
+def prefetch_batches(batches, enrichers):
+    # Spool every batch to disk first so the enrichers can resolve all lookups in one
+    # bulk pass; the batches are then replayed against warm caches.
+    spool = RowSpool()
+    for batch in batches:
+        spool.append(batch)
+    logger.info(f"Spooled {spool.count} batches for prefetch")
     for enricher in enrichers:
-        enrichment_fields.extend(enricher.header_fields)
-    
-    # Create a set of uppercase enrichment fields for case-insensitive comparison
-    enrichment_fields_upper = [f.upper() for f in enrichment_fields]
-    
-    # Only include fields that are not already in the enrichment fields (case-insensitive comparison)
-    original_fields = [f for f in first_row.keys() if f.upper() not in enrichment_fields_upper]
-    
-    # Convert original fields to uppercase
-    original_fields_upper = [f.upper() for f in original_fields]
-    
-    # Append enrichment fields at the end
-    return original_fields_upper + enrichment_fields
-
-# This function is now incorporated into enrich_row
-# Keeping it here commented out for reference
-# def convert_keys_to_uppercase(row):
-#    """Convert all dictionary keys to uppercase for CSV output."""
-#    return {k.upper(): v for k, v in row.items()}
+        enricher.prefetch(spool)
+    return spool
+
+def get_snapshot_tables(db, config, queries_dir, refresh):
+    # Read the backup logins from the snapshot tables when they have been built
+    snapshot = LoginAuditSnapshot.from_config(db, config, queries_dir)
+    if snapshot is None:
+        if refresh:
+            raise ValueError("--refresh-snapshot needs LOGIN_AUDIT_SNAPSHOT_PREFIX to be set")
+        return None
+    if refresh:
+        snapshot.refresh()
+    if snapshot.is_built():
+        return snapshot.tables
+    logger.warning("Login audit snapshot has not been built; run with --refresh-snapshot")
+    return None
+
+def get_local_batches(args, db, config, queries_dir, engine):
+    # Extract the raw view rows from Oracle only on the first run, when asked to, or when
+    # the file was loaded from another backup, then aggregate them locally with the
+    # requested thresholds
+    source = {"backup_schema": config["backup_schema_name"], "login_audit_snapshot_prefix": config.get("login_audit_snapshot_prefix")}
+    loaded_from = engine.loaded_from()
+    if loaded_from is not None and loaded_from != source:
+        logger.info(f"{engine.path} was loaded from {loaded_from}, not {source}; extracting the raw rows again")
+    if args.refresh_local or args.refresh_snapshot or loaded_from != source:
+        snapshot_tables = get_snapshot_tables(db, config, queries_dir, args.refresh_snapshot)
+        volunteer_query, activation_query = build_local_queries(config["backup_schema_name"], queries_dir, snapshot_tables)
+        engine.load(db.stream_batches(volunteer_query, {}, args.batch_size), db.stream_batches(activation_query, {}, args.batch_size), source)
+    study_ids = [args.study_id] if args.study_id is not None else None
+    return engine.suspicious_activity(study_ids, args.min_interested, args.min_signups, args.batch_size)
+
+def merge_incremental(batches, state, full_refresh):
+    # Merge this run's rows into the previous snapshot and store the result as the
+    # new snapshot; the merged rows are what gets written to stdout
+    previous = None if full_refresh else read_snapshot(state.snapshot_path)
+    merged = merge_rows(previous, batches)
+    if merged.columns:
+        write_snapshot(state.snapshot_path, merged)
+    return merged
 
 def main():
-    parser = argparse.ArgumentParser(description="Stream user activity analysis to CSV.")
+    parser = argparse.ArgumentParser(description="Stream user activity analysis to CSV, Parquet or Arrow IPC.")
     parser.add_argument("study_id", type=int, nargs="?", help="Study ID to filter the query (optional, runs for all studies if omitted)")
+    parser.add_argument("--prefetch", action="store_true", help="Resolve all distinct IPs in one bulk pass before writing any rows")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Number of rows fetched and enriched per batch (default: 1000)")
+    parser.add_argument("--enrich-workers", type=int, default=2, help="Threads enriching batches while the next ones are fetched and the previous ones written; 0 runs every stage in the main thread (default: 2)")
+    parser.add_argument("--queue-size", type=int, default=4, help="Batches fetched ahead of the one being written (default: 4)")
+    parser.add_argument("--flush", type=FlushPolicy.parse, default=FlushPolicy(), metavar="POLICY", help="When to flush output: 'end' (default), 'live', 'rows:N' or 'ms:T'")
+    parser.add_argument("--buffer-size", type=int, default=1 << 20, help="Output buffer size in bytes (default: 1 MiB)")
+    parser.add_argument("--format", choices=["csv", "parquet", "arrow"], default="csv", help="Output format written to stdout (default: csv)")
+    parser.add_argument("--compression", default="zstd", help="Parquet compression codec (default: zstd)")
+    parser.add_argument("--row-group-size", type=int, default=100000, help="Rows per Parquet row group (default: 100000)")
+    parser.add_argument("--arraysize", type=int, help="Rows fetched per database round trip (overrides DB_ARRAYSIZE)")
+    parser.add_argument("--prefetchrows", type=int, help="Rows returned with the query execute round trip (overrides DB_PREFETCHROWS)")
+    parser.add_argument("--parallel", type=int, metavar="N", help="Run the query per study on up to N concurrent connections (all-studies runs only)")
+    parser.add_argument("--incremental", metavar="STATE_FILE", help="Only recompute rows since the watermark in STATE_FILE and merge them into the previous output (CSV only)")
+    parser.add_argument("--full-refresh", action="store_true", help="With --incremental, recompute everything and replace the stored output")
+    parser.add_argument("--name-pattern", choices=["python", "sql"], help="Compute MATCHES_NAME_PATTERN in the Oracle query (default) or in Python (always with --local-engine)")
+    parser.add_argument("--explain", action="store_true", help="Print the query's EXPLAIN PLAN and append it to the query report instead of running it")
+    parser.add_argument("--profile", action="store_true", help="Capture the executed plan and fetch timings and append them to the query report")
+    parser.add_argument("--refresh-snapshot", action="store_true", help="Rebuild the backup login_audit snapshot if the backup changed (needs LOGIN_AUDIT_SNAPSHOT_PREFIX)")
+    parser.add_argument("--extract-cache", metavar="DIR", help="Cache the extracted query results in DIR and reuse them on later runs (overrides EXTRACT_CACHE_DIR)")
+    parser.add_argument("--refresh", action="store_true", help="Query the database even if the extract cache has the results, and replace them")
+    parser.add_argument("--local-engine", metavar="PATH", help="Aggregate locally from raw view rows kept in the SQLite file PATH")
+    parser.add_argument("--refresh-local", action="store_true", help="With --local-engine, extract the raw view rows from the database again")
+    parser.add_argument("--min-interested", type=int, default=2, help="With --local-engine, distinct users interested in a study from one IP to flag it (default: 2)")
+    parser.add_argument("--min-signups", type=int, default=2, help="With --local-engine, distinct users activated from one IP to flag it (default: 2)")
     args = parser.parse_args()
+    if args.name_pattern is None:
+        # The local engine only extracts the raw names, so it classifies them in Python
+        args.name_pattern = "python" if args.local_engine else "sql"
 
+    geo_client = None
+    spool = None
+    output = None
+    report = None
+    local_engine = None
+    enriched = None
     try:
         # Load config from .env and environment
         config = load_config()
-        enrichers = get_enrichers(config)
-        geo_client = GeolocationClient.from_config(config)
+        geo_client = create_geolocation_backend(config)
+        enrichers = get_enrichers(geo_client, args.name_pattern)
 
         dsn = get_dsn(config)
         user = config["db_username"]
         password = config["db_password"]
 
+        if args.profile and args.parallel:
+            raise ValueError("--profile cannot be combined with --parallel")
+        if args.local_engine:
+            for option in ("parallel", "incremental", "explain", "profile"):
+                if getattr(args, option):
+                    raise ValueError(f"--local-engine cannot be combined with --{option}")
+            if args.name_pattern != "python":
+                raise ValueError("--local-engine only supports --name-pattern python")
+        state = None
+        if args.incremental:
+            if args.format != "csv":
+                raise ValueError("--incremental only supports CSV output")
+            state = IncrementalState.load(args.incremental)
+        since = None if state is None or args.full_refresh else state.watermark
+
         queries_dir = "src/queries"  
         backup_schema = config["backup_schema_name"]  
-        query = build_database_query(backup_schema, queries_dir)
 
-        # If study_id is provided, use it; else, remove the study_id filter from the query
-        if args.study_id is not None:
-            params = {"study_id": args.study_id}
+        # Create database client to stream rows in batches
+        arraysize = args.arraysize if args.arraysize is not None else config.get("db_arraysize")
+        if arraysize is not None and int(arraysize) < 1:
+            raise ValueError("--arraysize (DB_ARRAYSIZE) must be at least 1")
+        prefetchrows = args.prefetchrows if args.prefetchrows is not None else config.get("db_prefetchrows")
+        db = DatabaseClient.from_credentials(
+            user,
+            password,
+            dsn,
+            arraysize=int(arraysize) if arraysize is not None else None,
+            prefetchrows=int(prefetchrows) if prefetchrows is not None else None,
+            pool_size=args.parallel,
+        )
+        extract_cache = ExtractCache.from_config(config, args.extract_cache)
+        if args.local_engine:
+            local_engine = LocalAnalyticsEngine(args.local_engine)
+            batches = get_local_batches(args, db, config, queries_dir, local_engine)
+        else:
+            # The same statement serves every run; only the bound studies differ. If
+            # study_id is provided, bind it; in parallel mode, bind each study in turn;
+            # else, bind all studies
+            window = {"since": since} if since is not None else {}
+            if args.study_id is not None:
+                params = {**study_filter_params([args.study_id]), **window}
+            elif args.parallel:
+                params = None
+            else:
+                params = {**study_filter_params(), **window}
+
+            # Incremental, profiled and explained runs always go to the database. The cache
+            # is keyed on the configured snapshot prefix rather than on whether the snapshot
+            # has been built, so a cached result is read without querying the database
+            cache_key = None
+            if extract_cache is not None and state is None and not args.profile and not args.explain:
+                key_query = build_database_query(backup_schema, queries_dir, name_pattern=args.name_pattern)
+                cache_key = extract_cache.key(key_query, backup_schema, params if params is not None else {"parallel": True}, config.get("login_audit_snapshot_prefix"))
+            if cache_key is not None and not (args.refresh or args.refresh_snapshot) and extract_cache.exists(cache_key):
+                batches = extract_cache.read(cache_key)
+            else:
+                snapshot_tables = get_snapshot_tables(db, config, queries_dir, args.refresh_snapshot)
+                query = build_database_query(backup_schema, queries_dir, incremental=since is not None, snapshot_tables=snapshot_tables, name_pattern=args.name_pattern)
+
+                logger.debug("Executing SQL query:\n%s", query)
+                logger.debug("With parameters: %s", params)
+
+                if args.explain:
+                    report = QueryReport("explain", query, params, queries_dir)
+                    report.plan = db.explain(query)
+                    print("\n".join(report.plan))
+                    report.write(default_report_path())
+                    return
+
+                if state is not None:
+                    # Take the next watermark from the database clock before querying, so rows
+                    # committed while this run is in progress are picked up by the next one
+                    watermark = next(iter(db.stream_batches("SELECT SYSDATE FROM dual", {}))).rows[0][0]
+                    logger.info(f"Incremental run since {since} (next watermark {watermark})")
+                if params is None:
+                    study_ids_query = build_study_ids_query(backup_schema, queries_dir)
+                    study_ids = [row[0] for batch in db.stream_batches(study_ids_query, {}) for row in batch.rows]
+                    logger.info(f"Running query for {len(study_ids)} studies on {args.parallel} connections")
+                    param_sets = ({**study_filter_params([study_id]), **window} for study_id in study_ids)
+                    batches = db.stream_batches_parallel(query, param_sets, args.parallel, args.batch_size, args.queue_size)
+                else:
+                    report = QueryReport("profile", query, params, queries_dir) if args.profile else None
+                    batches = db.stream_batches(query, params, args.batch_size, profile=args.profile)
+                if cache_key is not None:
+                    batches = extract_cache.write(cache_key, batches)
+        if args.prefetch:
+            spool = prefetch_batches(batches, enrichers)
+            batches = iter(spool)
+
+        # Fetch, enrich and write in separate stages, so waiting on the database or the
+        # geolocation API in one stage does not stall the others
+        if args.enrich_workers > 0:
+            enriched = StagedPipeline(lambda batch: enrich_batch(batch, enrichers), args.enrich_workers, args.queue_size).run(batches)
+        else:
+            enriched = (enrich_batch(batch, enrichers) for batch in batches)
+
+        output = BufferedOutput(sys.stdout.buffer, args.flush, args.buffer_size)
+        writer = get_writer(args, output)
+        if state is not None:
+            merged = merge_incremental(enriched, state, args.full_refresh)
+            if merged.columns:
+                writer.write_batch(merged)
         else:
-            # Remove the study_id filter from the query
-            query = query.replace("AND v.study_id = :study_id", "")
-            params = {}
-
-        logger.debug("Executing SQL query:\n%s", query)
-        logger.debug("With parameters: %s", params)
-
-        # Create database client and stream rows
-        db = DatabaseClient.from_credentials(user, password, dsn)
-        rows = db.stream_rows(query, params)
-        first_row = next(rows, None)
-        if first_row is None:
-            return
-        
-        # Enrich the first row (with consistent uppercase keys)
-        enriched_first_row = enrich_row(first_row, enrichers)
-        
-        # Get the fieldnames from the enriched row (already uppercase)
-        fieldnames = get_output_fieldnames(enriched_first_row, enrichers)
-        
-        writer = csv.DictWriter(sys.stdout, fieldnames=fieldnames)
-        writer.writeheader()
-        sys.stdout.flush()
-
-        # Write the first row (keys are already uppercase from enrich_row)
-        writer.writerow(enriched_first_row)
-        sys.stdout.flush()
-
-        for row in rows:
-            # Enrich row (will convert keys to uppercase)
-            enriched_row = enrich_row(row, enrichers)
-            # Write row (keys are already uppercase from enrich_row)
-            writer.writerow(enriched_row)
-            sys.stdout.flush()
+            for batch in enriched:
+                writer.write_batch(batch)
+        writer.close()
+        if report is not None:
+            report.add_fetch_stats(db.last_fetch_stats)
+            report.write(default_report_path())
+        if state is not None:
+            state.save(watermark)
     except (DatabaseConnectionError, QueryExecutionError, ValueError) as e:
         print(f"Error: {e}", file=sys.stderr)
         logger.error(f"Error: {e}")
         sys.exit(1)
+    finally:
+        if enriched is not None:
+            enriched.close()
+        if output is not None:
+            stats = output.close()
+            print(f"Wrote {stats['rows']} rows ({stats['bytes']} bytes) in {stats['seconds']}s, {stats['rows_per_sec']} rows/sec", file=sys.stderr)
+        if spool is not None:
+            spool.close()
+        if geo_client is not None:
+            geo_client.close()
+        if local_engine is not None:
+            local_engine.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
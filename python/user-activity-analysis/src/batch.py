@@ -0,0 +1,65 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+
+class RowBatch:
+    def __init__(self, columns: List[str], rows: List[Tuple[Any, ...]]) -> None:
+        """A batch of positional rows sharing one list of column names."""
+        self.columns = columns
+        self.rows = rows
+        self._index = {name: i for i, name in enumerate(columns)}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def column(self, name: str) -> List[Any]:
+        """Return the values of a column, or Nones if the batch does not have it."""
+        i = self._index.get(name)
+        if i is None:
+            return [None] * len(self.rows)
+        return [row[i] for row in self.rows]
+
+    def dicts(self) -> List[Dict[str, Any]]:
+        """Return the rows as dictionaries keyed by column name."""
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+    def with_columns(self, new_columns: Dict[str, Sequence[Any]]) -> "RowBatch":
+        """Return a new batch with columns appended, replacing any of the same name."""
+        if not new_columns:
+            return self
+        keep = [i for i, name in enumerate(self.columns) if name not in new_columns]
+        columns = [self.columns[i] for i in keep] + list(new_columns)
+        added = zip(*new_columns.values())
+        if len(keep) == len(self.columns):
+            rows = [row + extra for row, extra in zip(self.rows, added)]
+        else:
+            rows = [
+                tuple(row[i] for i in keep) + extra for row, extra in zip(self.rows, added)
+            ]
+        return RowBatch(columns, rows)
+
+    def replace_columns(
+        self, old_columns: Sequence[str], new_columns: Dict[str, Sequence[Any]]
+    ) -> "RowBatch":
+        """Return a new batch with `old_columns` dropped and `new_columns` in their place.
+
+        The new columns are inserted where the first old column was, or appended
+        if the batch has none of the old columns.
+        """
+        positions = [self._index[name] for name in old_columns if name in self._index]
+        if not positions:
+            return self.with_columns(new_columns)
+        at = min(positions)
+        keep = [i for i in range(len(self.columns)) if i not in positions]
+        before = [i for i in keep if i < at]
+        after = [i for i in keep if i > at]
+        columns = (
+            [self.columns[i] for i in before]
+            + list(new_columns)
+            + [self.columns[i] for i in after]
+        )
+        added = zip(*new_columns.values()) if new_columns else ((),) * len(self.rows)
+        rows = [
+            tuple(row[i] for i in before) + extra + tuple(row[i] for i in after)
+            for row, extra in zip(self.rows, added)
+        ]
+        return RowBatch(columns, rows)
@@ -20,7 +20,26 @@ def load_config(
         ]
 
     if optional_vars is None:
-        optional_vars = ["IP_LOOKUP_API_KEY"]
+        optional_vars = [
+            "DB_ARRAYSIZE",
+            "DB_PREFETCHROWS",
+            "IP_LOOKUP_API_KEY",
+            "IP_LOOKUP_BACKEND",
+            "IP_LOOKUP_MMDB_PATH",
+            "IP_LOOKUP_MMDB_ASN_PATH",
+            "IP_LOOKUP_RATE_PER_SECOND",
+            "IP_LOOKUP_BURST",
+            "IP_LOOKUP_MAX_WORKERS",
+            "GEO_CACHE_PATH",
+            "GEO_CACHE_TTL_DAYS",
+            "GEO_CACHE_NEGATIVE_TTL_HOURS",
+            "GEO_CACHE_MAX_ENTRIES",
+            "IP_RANGE_INDEX_PATH",
+            "IP_RANGE_SEED_PATH",
+            "LOGIN_AUDIT_SNAPSHOT_PREFIX",
+            "EXTRACT_CACHE_DIR",
+            "EXTRACT_CACHE_COMPRESSION",
+        ]
 
     _validate_environment_variables(required_vars)
 
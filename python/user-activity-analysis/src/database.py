@@ -1,7 +1,17 @@
 import logging
-from typing import Any, Dict, Iterator
+import math
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.sql.elements import TextClause
+
+from .batch import RowBatch
 
 logger = logging.getLogger(__name__)
 
@@ -14,14 +24,124 @@ class QueryExecutionError(Exception):
     """Custom exception for query execution errors."""
 
 
+# python-oracledb defaults, used when the cursor is not tuned
+DEFAULT_ARRAYSIZE = 100
+DEFAULT_PREFETCHROWS = 2
+
+# Identifies this tool's rows in PLAN_TABLE
+PLAN_STATEMENT_ID = "user_activity_analysis"
+
+# Collection type list parameters are bound as, for TABLE(:param) lookups
+NUMBER_LIST_TYPE = "SYS.ODCINUMBERLIST"
+
+# Ends each query's queue in stream_batches_parallel
+_DONE = object()
+
+
+@lru_cache(maxsize=64)
+def _text(query: str) -> TextClause:
+    """Return one shared text() construct per statement, reused across runs."""
+    return text(query)
+
+
+def _bind_collections(conn, params: dict) -> dict:
+    """Bind list or tuple parameter values as Oracle number collections."""
+    if not any(isinstance(value, (list, tuple)) for value in params.values()):
+        return params
+    # Looking up the type costs a round trip, so it is kept per DBAPI connection
+    number_list = conn.info.get(NUMBER_LIST_TYPE)
+    if number_list is None:
+        number_list = conn.connection.driver_connection.gettype(NUMBER_LIST_TYPE)
+        conn.info[NUMBER_LIST_TYPE] = number_list
+    return {
+        name: (
+            number_list.newobject(list(value))
+            if isinstance(value, (list, tuple))
+            else value
+        )
+        for name, value in params.items()
+    }
+
+
+class FetchStats:
+    def __init__(
+        self, arraysize: Optional[int] = None, prefetchrows: Optional[int] = None
+    ) -> None:
+        """Track how long a streamed query spends executing and fetching."""
+        self.arraysize = arraysize
+        self.prefetchrows = prefetchrows
+        self.execute_seconds = 0.0
+        self.fetch_seconds = 0.0
+        self.first_row_seconds: Optional[float] = None
+        self.fetches = 0
+        self.rows = 0
+        self.plan: Optional[List[str]] = None
+        self._started = time.perf_counter()
+
+    def record_fetch(self, rows: int, seconds: float) -> None:
+        self.fetches += 1
+        self.rows += rows
+        self.fetch_seconds += seconds
+        if rows and self.first_row_seconds is None:
+            self.first_row_seconds = time.perf_counter() - self._started
+
+    def estimated_round_trips(self) -> int:
+        """Estimate round trips from the rows fetched and the cursor tuning."""
+        arraysize = self.arraysize or DEFAULT_ARRAYSIZE
+        prefetchrows = (
+            DEFAULT_PREFETCHROWS if self.prefetchrows is None else self.prefetchrows
+        )
+        # The execute round trip also returns the first `prefetchrows` rows
+        return 1 + math.ceil(max(self.rows - prefetchrows, 0) / arraysize)
+
+    def summary(self) -> Dict[str, Any]:
+        round_trips = self.estimated_round_trips()
+        return {
+            "rows": self.rows,
+            "fetches": self.fetches,
+            "estimated_round_trips": round_trips,
+            "rows_per_round_trip": round(self.rows / round_trips, 1),
+            "execute_seconds": round(self.execute_seconds, 3),
+            "fetch_wait_seconds": round(self.fetch_seconds, 3),
+            "first_row_seconds": (
+                None if self.first_row_seconds is None else round(self.first_row_seconds, 3)
+            ),
+        }
+
+
 class DatabaseClient:
-    def __init__(self, engine):
-        """Initialize database client with engine."""
+    def __init__(
+        self,
+        engine,
+        arraysize: Optional[int] = None,
+        prefetchrows: Optional[int] = None,
+    ):
+        """Initialize database client with engine.
+
+        `arraysize` and `prefetchrows` are only used to report fetch statistics;
+        from_credentials applies them to the engine's cursors.
+        """
         self.engine = engine
+        self.arraysize = arraysize
+        self.prefetchrows = prefetchrows
+        self.last_fetch_stats: Optional[FetchStats] = None
 
     @classmethod
-    def from_credentials(cls, username: str, password: str, dsn: str):
-        """Create a DatabaseClient instance from credentials."""
+    def from_credentials(
+        cls,
+        username: str,
+        password: str,
+        dsn: str,
+        arraysize: Optional[int] = None,
+        prefetchrows: Optional[int] = None,
+        pool_size: Optional[int] = None,
+    ):
+        """Create a DatabaseClient instance from credentials.
+
+        `arraysize` and `prefetchrows` tune how many rows python-oracledb fetches
+        per round trip; the driver defaults are used when they are None.
+        `pool_size` caps the number of pooled connections, for parallel queries.
+        """
         logger.debug(f"Creating database client with DSN: {dsn}")
         try:
             host, port_service = dsn.split(":")
@@ -31,20 +151,56 @@ class DatabaseClient:
             logger.error(f"Caught exception: {type(e).__name__}: {e}")
             raise DatabaseConnectionError(f"Invalid DSN format: {dsn}") from e
         try:
+            pool_options = (
+                {"pool_size": pool_size, "max_overflow": 0} if pool_size else {}
+            )
             engine = create_engine(
-                f"oracle+oracledb://{username}:{password}@{host}:{port}/?service_name={service}"
+                f"oracle+oracledb://{username}:{password}@{host}:{port}/?service_name={service}",
+                **pool_options,
             )
         except Exception as e:
             logger.error(f"Caught exception: {type(e).__name__}: {e}")
             raise DatabaseConnectionError(f"Database connection failed: {e}") from e
-        return cls(engine)
+        if arraysize is not None or prefetchrows is not None:
+            _tune_cursors(engine, arraysize, prefetchrows)
+        return cls(engine, arraysize, prefetchrows)
+
+    def execute(self, statement: str, params: Optional[dict] = None) -> None:
+        """Execute a statement that returns no rows, such as DDL or an insert, and commit."""
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(_text(statement), params or {})
+        except Exception as e:
+            logger.error(f"Statement execution failed: {e}")
+            raise QueryExecutionError(f"Statement execution failed: {e}") from e
+
+    def explain(self, query: str) -> List[str]:
+        """Return the optimizer's plan for a query from EXPLAIN PLAN, without running it."""
+        try:
+            with self.engine.begin() as conn:
+                # Sent as is: EXPLAIN PLAN does not need values for the bind variables,
+                # though it treats them all as VARCHAR2 (see STUDY_ID_FILTER)
+                conn.exec_driver_sql(
+                    f"EXPLAIN PLAN SET STATEMENT_ID = '{PLAN_STATEMENT_ID}' FOR {query}"
+                )
+                result = conn.execute(
+                    text(
+                        "SELECT plan_table_output FROM TABLE("
+                        "DBMS_XPLAN.DISPLAY(NULL, :statement_id, 'TYPICAL'))"
+                    ),
+                    {"statement_id": PLAN_STATEMENT_ID},
+                )
+                return [row[0] for row in result]
+        except Exception as e:
+            logger.error(f"Explain plan failed: {e}")
+            raise QueryExecutionError(f"Explain plan failed: {e}") from e
 
     def stream_rows(self, query: str, params: dict) -> Iterator[Dict[str, Any]]:
         """Stream rows from the database as dictionaries."""
         try:
             with self.engine.connect() as conn:
                 result = conn.execution_options(stream_results=True).execute(
-                    text(query), params
+                    _text(query), _bind_collections(conn, params)
                 )
                 columns = result.keys()
                 for row in result:
@@ -52,3 +208,154 @@ class DatabaseClient:
         except Exception as e:
             logger.error(f"Query execution failed: {e}")
             raise QueryExecutionError(f"Query execution failed: {e}") from e
+
+    def stream_batches(
+        self, query: str, params: dict, batch_size: int = 1000, profile: bool = False
+    ) -> Iterator[RowBatch]:
+        """Stream rows from the database as batches of tuples with uppercase columns.
+
+        Fetch timings and an estimate of the round trips are kept in
+        `last_fetch_stats` and logged once the result set is exhausted. With
+        `profile`, row source statistics are gathered for the query and its
+        executed plan is kept in `last_fetch_stats.plan`.
+        """
+        stats = self.last_fetch_stats = FetchStats(self.arraysize, self.prefetchrows)
+        started = time.perf_counter()
+        try:
+            with self.engine.connect() as conn:
+                if profile:
+                    statistics_level = _statistics_level(conn)
+                    conn.exec_driver_sql("ALTER SESSION SET statistics_level = ALL")
+                try:
+                    result = conn.execution_options(stream_results=True).execute(
+                        _text(query), _bind_collections(conn, params)
+                    )
+                    stats.execute_seconds = time.perf_counter() - started
+                    columns = [column.upper() for column in result.keys()]
+                    while True:
+                        fetch_started = time.perf_counter()
+                        chunk = result.fetchmany(batch_size)
+                        stats.record_fetch(len(chunk), time.perf_counter() - fetch_started)
+                        if not chunk:
+                            break
+                        yield RowBatch(columns, [tuple(row) for row in chunk])
+                    if profile:
+                        stats.plan = _executed_plan(conn)
+                finally:
+                    # Restore the session before it goes back to the pool, even if the
+                    # query failed or the caller stopped reading early
+                    if profile:
+                        conn.exec_driver_sql(
+                            f"ALTER SESSION SET statistics_level = {statistics_level}"
+                        )
+            logger.info(f"Fetch stats: {stats.summary()}")
+        except Exception as e:
+            logger.error(f"Query execution failed: {e}")
+            raise QueryExecutionError(f"Query execution failed: {e}") from e
+
+    def stream_batches_parallel(
+        self,
+        query: str,
+        param_sets: Iterable[dict],
+        max_workers: int = 4,
+        batch_size: int = 1000,
+        queue_size: int = 4,
+    ) -> Iterator[RowBatch]:
+        """Run the query once per parameter set on up to `max_workers` connections.
+
+        Batches are yielded in the order of `param_sets`, so the output is
+        deterministic. Each query streams into its own queue of at most
+        `queue_size` batches, so a large result set is never held in memory
+        while the queries before it are being consumed.
+        """
+        remaining = iter(param_sets)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        def start(params: dict) -> "queue.Queue":
+            batches: "queue.Queue" = queue.Queue(maxsize=max(queue_size, 1))
+            executor.submit(self._fetch_batches, query, params, batch_size, batches, stop)
+            return batches
+
+        try:
+            pending = deque(
+                start(params) for _, params in zip(range(max_workers), remaining)
+            )
+            while pending:
+                batches = pending[0]
+                while True:
+                    item = batches.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item
+                pending.popleft()
+                params = next(remaining, None)
+                if params is not None:
+                    pending.append(start(params))
+        finally:
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _fetch_batches(
+        self,
+        query: str,
+        params: dict,
+        batch_size: int,
+        batches: "queue.Queue",
+        stop: threading.Event,
+    ) -> None:
+        logger.info(f"Running query with parameters: {params}")
+
+        def put(item) -> bool:
+            # Wait for room in the queue, giving up once the consumer has stopped
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        source = None
+        try:
+            source = self.stream_batches(query, params, batch_size)
+            for batch in source:
+                if not put(batch):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+        finally:
+            # Release the connection in the thread that was reading from it
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+
+
+def _statistics_level(conn) -> str:
+    """Return the session's current statistics_level, to restore after profiling."""
+    return conn.exec_driver_sql(
+        "SELECT value FROM v$parameter WHERE name = 'statistics_level'"
+    ).scalar()
+
+
+def _executed_plan(conn) -> List[str]:
+    """Return the plan, with actual rows and timings, of the session's last query."""
+    result = conn.exec_driver_sql(
+        "SELECT plan_table_output FROM TABLE("
+        "DBMS_XPLAN.DISPLAY_CURSOR(NULL, NULL, 'ALLSTATS LAST'))"
+    )
+    return [row[0] for row in result]
+
+
+def _tune_cursors(engine, arraysize: Optional[int], prefetchrows: Optional[int]) -> None:
+    """Set arraysize/prefetchrows on every cursor before it executes."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _set_fetch_sizes(conn, cursor, statement, parameters, context, executemany):
+        if arraysize is not None:
+            cursor.arraysize = arraysize
+        if prefetchrows is not None:
+            cursor.prefetchrows = prefetchrows
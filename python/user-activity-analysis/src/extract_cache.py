@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pyarrow as pa
+
+from .batch import RowBatch
+
+logger = logging.getLogger(__name__)
+
+# Every cached column is a union of the value types the database returns, so each
+# value is read back with the type it was extracted with: python-oracledb returns
+# integral NUMBERs as int and the others as float, even within one column, and a
+# column's type cannot be told from the first batch when it only holds NULLs.
+VALUE_FIELDS = [
+    pa.field("int", pa.int64()),
+    pa.field("float", pa.float64()),
+    pa.field("string", pa.string()),
+    pa.field("timestamp", pa.timestamp("us")),
+]
+VALUE_TYPE = pa.dense_union(VALUE_FIELDS)
+
+
+def _value_type_id(value: Any) -> int:
+    if value is None or (isinstance(value, int) and not isinstance(value, bool)):
+        return 0
+    if isinstance(value, float):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return 3
+    raise TypeError(f"cannot cache {type(value).__name__} values losslessly")
+
+
+def _value_array(values: List[Any]) -> pa.UnionArray:
+    """Convert a column to a VALUE_TYPE array; NULLs are stored as int NULLs."""
+    children: List[List[Any]] = [[] for _ in VALUE_FIELDS]
+    type_ids = []
+    offsets = []
+    for value in values:
+        type_id = _value_type_id(value)
+        type_ids.append(type_id)
+        offsets.append(len(children[type_id]))
+        children[type_id].append(value)
+    return pa.UnionArray.from_dense(
+        pa.array(type_ids, pa.int8()),
+        pa.array(offsets, pa.int32()),
+        [pa.array(child, field.type) for child, field in zip(children, VALUE_FIELDS)],
+        [field.name for field in VALUE_FIELDS],
+    )
+
+
+def _to_record_batch(batch: RowBatch) -> pa.RecordBatch:
+    return pa.RecordBatch.from_arrays(
+        [_value_array(batch.column(name)) for name in batch.columns],
+        schema=pa.schema([pa.field(name, VALUE_TYPE) for name in batch.columns]),
+    )
+
+
+class ExtractCache:
+    def __init__(self, directory: str, compression: Optional[str] = "zstd") -> None:
+        """Keep extracted query results as Arrow IPC files, keyed by query and parameters.
+
+        Files are memory-mapped when read back; with `compression` None, the
+        Arrow columns are mapped without being decompressed. Each batch is still
+        converted to Python rows as it is read, since the enrichers and writers
+        take RowBatch rows. Values are stored without conversion, so the batches
+        read back are the ones that were extracted.
+        """
+        self.directory = directory
+        self.compression = compression
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(
+        cls, config: Dict[str, str], directory: Optional[str] = None
+    ) -> Optional["ExtractCache"]:
+        """Create an ExtractCache from configuration, or None if no directory is set."""
+        directory = directory or config.get("extract_cache_dir")
+        if not directory:
+            return None
+        compression = config.get("extract_cache_compression", "zstd")
+        return cls(directory, None if compression == "none" else compression)
+
+    @staticmethod
+    def key(
+        query: str,
+        backup_schema: str,
+        params: Optional[Dict[str, Any]],
+        snapshot_prefix: Optional[str] = None,
+    ) -> str:
+        """Return a hash of the SQL text, backup schema, bind parameters and snapshot prefix."""
+        payload = json.dumps(
+            {
+                "query": query,
+                "backup_schema": backup_schema,
+                "params": params,
+                "snapshot_prefix": snapshot_prefix,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def read(self, key: str) -> Iterator[RowBatch]:
+        """Replay a cached result as the batches it was written in.
+
+        Only one batch at a time is converted to Python values.
+        """
+        path = self.path(key)
+        logger.info(f"Reading extracted rows from {path}")
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                record_batch = reader.get_batch(i)
+                columns = [column.to_pylist() for column in record_batch.columns]
+                yield RowBatch(record_batch.schema.names, list(zip(*columns)))
+
+    def write(self, key: str, batches: Iterable[RowBatch]) -> Iterator[RowBatch]:
+        """Pass the batches through while writing them to the cache.
+
+        The file only replaces the cached result once every batch has been
+        written, so an interrupted extraction is never read back. A result with
+        values that cannot be stored losslessly is passed through uncached.
+        """
+        path = self.path(key)
+        tmp_path = f"{path}.tmp"
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        writer: Optional[pa.ipc.RecordBatchFileWriter] = None
+        caching = True
+        rows = 0
+        complete = False
+        try:
+            with pa.OSFile(tmp_path, "wb") as sink:
+                for batch in batches:
+                    if caching:
+                        try:
+                            record_batch = _to_record_batch(batch)
+                        except (TypeError, OverflowError, pa.ArrowException) as e:
+                            logger.warning(f"Not caching extracted rows in {path}: {e}")
+                            caching = False
+                        else:
+                            if writer is None:
+                                writer = pa.ipc.new_file(
+                                    sink, record_batch.schema, options=options
+                                )
+                            writer.write_batch(record_batch)
+                            rows += len(batch)
+                    yield batch
+                if writer is not None:
+                    writer.close()
+                # An empty result has no schema to write, so it is not cached
+                complete = caching and writer is not None
+        finally:
+            if complete:
+                os.replace(tmp_path, path)
+                logger.info(f"Cached {rows} extracted rows in {path}")
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,146 @@
+import csv
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
+
+from .batch import RowBatch
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ("USER_ID", "STUDY_ID")
+
+
+class IncrementalState:
+    def __init__(
+        self,
+        path: str,
+        watermark: Optional[datetime] = None,
+        snapshot_path: Optional[str] = None,
+    ) -> None:
+        """State of incremental runs: the high-water mark and the merged output.
+
+        `watermark` is the database time the last successful run started at; the
+        next run only recomputes rows on or after it. `snapshot_path` is the CSV
+        holding the merged output of all previous runs.
+        """
+        self.path = path
+        self.watermark = watermark
+        self.snapshot_path = snapshot_path or f"{os.path.splitext(path)[0]}.csv"
+
+    @classmethod
+    def load(cls, path: str) -> "IncrementalState":
+        """Load the state file, or return an empty state if it does not exist yet."""
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path) as f:
+            data = json.load(f)
+        watermark = data.get("watermark")
+        return cls(
+            path,
+            datetime.fromisoformat(watermark) if watermark else None,
+            data.get("snapshot_path"),
+        )
+
+    def save(self, watermark: datetime) -> None:
+        """Record a new high-water mark after a successful run."""
+        self.watermark = watermark
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "watermark": watermark.isoformat(),
+                    "snapshot_path": self.snapshot_path,
+                },
+                f,
+                indent=2,
+            )
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved incremental watermark {watermark.isoformat()} to {self.path}")
+
+
+def read_snapshot(path: str) -> Optional[RowBatch]:
+    """Read the merged output of previous runs, or None if there is none yet."""
+    if not os.path.exists(path):
+        return None
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        columns = next(reader, None)
+        if columns is None:
+            return None
+        return RowBatch(columns, [tuple(row) for row in reader])
+
+
+def write_snapshot(path: str, batch: RowBatch) -> None:
+    """Atomically replace the snapshot with the merged rows."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(batch.columns)
+        writer.writerows(batch.rows)
+    os.replace(tmp_path, path)
+
+
+def _as_text(value: Any) -> str:
+    # Match what csv.writer writes, so new rows compare and sort like snapshot rows.
+    return "" if value is None else str(value)
+
+
+def _as_number(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def merge_rows(previous: Optional[RowBatch], batches: Iterable[RowBatch]) -> RowBatch:
+    """Merge newly computed rows into the previous snapshot.
+
+    Rows are keyed by user and study; a new row replaces the previous one for the
+    same key. The result keeps the query's order: suspicious interested count
+    descending, then user, study and interest address.
+    """
+    columns: Optional[List[str]] = None
+    merged = {}
+    for batch in batches:
+        if columns is None:
+            columns = batch.columns
+            if previous is not None and previous.columns != columns:
+                raise ValueError(
+                    "Incremental snapshot columns do not match the query; "
+                    "run with --full-refresh"
+                )
+            if previous is not None:
+                key_index = [previous.columns.index(name) for name in KEY_COLUMNS]
+                for row in previous.rows:
+                    merged[tuple(row[i] for i in key_index)] = tuple(row)
+        key_index = [batch.columns.index(name) for name in KEY_COLUMNS]
+        for row in batch.rows:
+            text = tuple(_as_text(value) for value in row)
+            merged[tuple(text[i] for i in key_index)] = text
+
+    if columns is None:
+        if previous is None:
+            return RowBatch([], [])
+        return previous
+
+    count = columns.index("SUSPICIOUS_INTERESTED_COUNT")
+    user, study, address = (
+        columns.index(name)
+        for name in ("USER_ID", "STUDY_ID", "INTEREST_SOURCE_ADDRESS")
+    )
+
+    def sort_key(row: Tuple[str, ...]) -> Tuple[float, float, float, str]:
+        return (
+            -_as_number(row[count]),
+            _as_number(row[user]),
+            _as_number(row[study]),
+            row[address],
+        )
+
+    rows = sorted(merged.values(), key=sort_key)
+    logger.info(
+        f"Merged {len(rows)} rows ({len(rows) - len(previous or [])} new) into snapshot"
+    )
+    return RowBatch(columns, rows)
@@ -0,0 +1,29 @@
+from typing import Dict, List
+
+
+# To be used like an interface
+class GeolocationBackend:
+    def get_geolocation(self, ip: str) -> Dict[str, str]:
+        """Return city, region, country, postal and org for a single IP address."""
+        raise NotImplementedError
+
+    def get_geolocations(self, ip_addresses: List[str]) -> Dict[str, Dict[str, str]]:
+        """Return geolocation data for multiple IP addresses, keyed by IP."""
+        return {ip: self.get_geolocation(ip) for ip in dict.fromkeys(ip_addresses)}
+
+    def close(self) -> None:
+        """Release any resources held by the backend."""
+
+
+def create_geolocation_backend(config: Dict[str, str]) -> GeolocationBackend:
+    """Create the geolocation backend selected by IP_LOOKUP_BACKEND (ipapi or mmdb)."""
+    backend = config.get("ip_lookup_backend", "ipapi").lower()
+    if backend == "ipapi":
+        from .geolocation import GeolocationClient
+
+        return GeolocationClient.from_config(config)
+    if backend == "mmdb":
+        from .mmdb import MmdbGeolocationClient
+
+        return MmdbGeolocationClient.from_config(config)
+    raise ValueError(f"Unknown IP_LOOKUP_BACKEND: {backend}")
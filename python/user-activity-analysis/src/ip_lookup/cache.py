@@ -0,0 +1,160 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+GEO_KEYS = ["city", "region", "country", "postal", "org"]
+
+# Access times of cache hits are written in one transaction per this many hits
+ACCESS_FLUSH_SIZE = 1000
+
+
+class GeolocationCache:
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 30 * 24 * 60 * 60,
+        negative_ttl_seconds: float = 60 * 60,
+        max_entries: int = 100000,
+    ) -> None:
+        """Initialize a persistent SQLite-backed geolocation cache keyed by IP.
+
+        Hits do not write to the database: their access times are kept in memory
+        and written in batches, before any eviction and on close.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS geolocation (
+                ip TEXT PRIMARY KEY,
+                city TEXT,
+                region TEXT,
+                country TEXT,
+                postal TEXT,
+                org TEXT,
+                is_negative INTEGER NOT NULL DEFAULT 0,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS geolocation_accessed_at ON geolocation (accessed_at)"
+        )
+        self._conn.commit()
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM geolocation").fetchone()
+        self._accessed: Dict[str, float] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> Optional["GeolocationCache"]:
+        """Create a GeolocationCache from configuration, or None if no path is set."""
+        path = config.get("geo_cache_path")
+        if not path:
+            return None
+        return cls(
+            path,
+            ttl_seconds=float(config.get("geo_cache_ttl_days", 30)) * 24 * 60 * 60,
+            negative_ttl_seconds=float(config.get("geo_cache_negative_ttl_hours", 1))
+            * 60
+            * 60,
+            max_entries=int(config.get("geo_cache_max_entries", 100000)),
+        )
+
+    def get(self, ip: str) -> Optional[Dict[str, str]]:
+        """Return the cached geolocation for an IP, or None if missing or stale."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT city, region, country, postal, org, is_negative, fetched_at "
+                "FROM geolocation WHERE ip = ?",
+                (ip,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            ttl = self.negative_ttl_seconds if row[5] else self.ttl_seconds
+            if now - row[6] > ttl:
+                logger.debug(f"Cache entry for {ip} is stale")
+                self._conn.execute("DELETE FROM geolocation WHERE ip = ?", (ip,))
+                self._conn.commit()
+                self._count -= 1
+                self._accessed.pop(ip, None)
+                self.misses += 1
+                return None
+            self._accessed[ip] = now
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+                self._conn.commit()
+            self.hits += 1
+            return dict(zip(GEO_KEYS, row[:5]))
+
+    def set(self, ip: str, geolocation: Dict[str, str], negative: bool = False) -> None:
+        """Store a geolocation for an IP, evicting least recently used entries."""
+        now = time.time()
+        values = [geolocation.get(key, "Unknown") for key in GEO_KEYS]
+        with self._lock:
+            self._accessed.pop(ip, None)
+            updated = self._conn.execute(
+                "UPDATE geolocation SET city = ?, region = ?, country = ?, postal = ?, "
+                "org = ?, is_negative = ?, fetched_at = ?, accessed_at = ? WHERE ip = ?",
+                (*values, int(negative), now, now, ip),
+            ).rowcount
+            if not updated:
+                self._conn.execute(
+                    "INSERT INTO geolocation "
+                    "(ip, city, region, country, postal, org, is_negative, fetched_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (ip, *values, int(negative), now, now),
+                )
+                self._count += 1
+            self._evict()
+            self._conn.commit()
+
+    def _flush_accessed(self) -> None:
+        """Write the pending access times of cache hits, without committing."""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE geolocation SET accessed_at = ? WHERE ip = ?",
+                [(accessed_at, ip) for ip, accessed_at in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _evict(self) -> None:
+        """Delete least recently used entries beyond max_entries."""
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        # Eviction orders by access time, so it must see the pending hits
+        self._flush_accessed()
+        self._conn.execute(
+            "DELETE FROM geolocation WHERE ip IN "
+            "(SELECT ip FROM geolocation ORDER BY accessed_at ASC LIMIT ?)",
+            (excess,),
+        )
+        self._count -= excess
+        self.evictions += excess
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and eviction counters."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self) -> None:
+        """Write the pending access times and close the underlying database connection."""
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+            self._conn.close()
+        logger.info(f"Geolocation cache stats: {self.stats()}")
@@ -1,20 +1,72 @@
 import logging
+import math
+import random
+import threading
 import time
-from typing import Dict, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from .backend import GeolocationBackend
+from .cache import GeolocationCache
+from .range_index import IpRangeIndex
+from .rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
 
-class GeolocationClient:
+UNKNOWN_GEOLOCATION = {
+    "city": "Unknown",
+    "region": "Unknown",
+    "country": "Unknown",
+    "postal": "Unknown",
+    "org": "Unknown",
+}
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class GeolocationClient(GeolocationBackend):
     def __init__(
-        self, base_url: str, api_key: str, rate_limit_delay: float = 0.1
+        self,
+        base_url: str,
+        api_key: str,
+        rate_limit_delay: float = 0.1,
+        persistent_cache: Optional[GeolocationCache] = None,
+        burst: int = 1,
+        max_workers: int = 8,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        max_backoff: float = 30.0,
+        timeout: float = 10.0,
+        range_index: Optional[IpRangeIndex] = None,
     ) -> None:
-        """Initialize geolocation client with caching."""
+        """Initialize geolocation client with caching and a token-bucket rate limit.
+
+        `rate_limit_delay` is the average interval between requests; `burst` is
+        how many requests may be issued back to back before the limit applies.
+        `max_backoff` caps the delay between retries, including one asked for
+        with Retry-After.
+        """
         self.base_url = base_url
         self.api_key = api_key
         self.rate_limit_delay = rate_limit_delay
+        self.persistent_cache = persistent_cache
+        self.range_index = range_index
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(1 / rate_limit_delay, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(max_workers, 1))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self._cache: Dict[str, Dict[str, str]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
 
     @classmethod
     def from_config(cls, config: Dict[str, str]) -> "GeolocationClient":
@@ -22,47 +74,131 @@ class GeolocationClient:
         return cls(
             base_url="https://ipapi.co",
             api_key=config["ip_lookup_api_key"],
-            rate_limit_delay=0.1,
+            rate_limit_delay=1 / float(config.get("ip_lookup_rate_per_second", 10)),
+            persistent_cache=GeolocationCache.from_config(config),
+            burst=int(config.get("ip_lookup_burst", 1)),
+            max_workers=int(config.get("ip_lookup_max_workers", 8)),
+            range_index=IpRangeIndex.from_config(config),
         )
 
     def get_geolocation(self, ip: str) -> Dict[str, str]:
-        """Fetch geolocation data for a single IP address, with caching."""
+        """Fetch geolocation data for a single IP address, with caching.
+
+        Concurrent calls for the same IP share a single in-flight request.
+        """
         if not ip:
-            return {
-                "city": "Unknown",
-                "region": "Unknown",
-                "country": "Unknown",
-                "postal": "Unknown",
-                "org": "Unknown",
-            }
-        if ip in self._cache:
-            return self._cache[ip]
+            return dict(UNKNOWN_GEOLOCATION)
+        with self._lock:
+            if ip in self._cache:
+                return self._cache[ip]
+            future = self._inflight.get(ip)
+            owner = future is None
+            if future is None:
+                future = Future()
+                self._inflight[ip] = future
+        if not owner:
+            return future.result()
+
         try:
-            response = requests.get(f"{self.base_url}/{ip}/json/?key={self.api_key}")
-            response.raise_for_status()
-            data = response.json()
-            logger.debug(f"GeoLocation response data: {data}")
-            result = {
-                "city": data.get("city", "Unknown"),
-                "region": data.get("region", "Unknown"),
-                "country": data.get("country_name", "Unknown"),
-                "postal": data.get("postal", "Unknown"),
-                "org": data.get("org", "Unknown"),
-            }
-        except requests.RequestException as e:
-            logger.error(f"Caught exception for {ip}: {type(e).__name__}: {e}")
-            result = {
-                "city": "Unknown",
-                "region": "Unknown",
-                "country": "Unknown",
-                "postal": "Unknown",
-                "org": "Unknown",
-            }
+            result = self._resolve(ip)
+            with self._lock:
+                self._cache[ip] = result
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
         finally:
-            time.sleep(self.rate_limit_delay)
-        self._cache[ip] = result
+            with self._lock:
+                self._inflight.pop(ip, None)
         return result
 
+    def _resolve(self, ip: str) -> Dict[str, str]:
+        """Resolve an IP from the persistent cache or range index, falling back to the API."""
+        if self.persistent_cache is not None:
+            cached = self.persistent_cache.get(ip)
+            if cached is not None:
+                return cached
+        if self.range_index is not None:
+            indexed = self.range_index.lookup(ip)
+            if indexed is not None:
+                return indexed
+        result, failed, network = self._fetch(ip)
+        if self.range_index is not None and network:
+            self.range_index.add_network(network, result)
+        if self.persistent_cache is not None:
+            self.persistent_cache.set(ip, result, negative=failed)
+        return result
+
+    def _fetch(self, ip: str) -> Tuple[Dict[str, str], bool, Optional[str]]:
+        """Call the API, retrying 429/5xx and transient errors with jittered backoff.
+
+        Returns the geolocation, whether the lookup failed and the network block
+        the IP belongs to, if the API reported one.
+        """
+        url = f"{self.base_url}/{ip}/json/?key={self.api_key}"
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                if (
+                    response.status_code in RETRY_STATUS_CODES
+                    and attempt < self.max_retries
+                ):
+                    delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                    logger.warning(
+                        f"Got {response.status_code} for {ip}, retrying in {delay:.2f}s"
+                    )
+                    time.sleep(delay)
+                    continue
+                response.raise_for_status()
+                data = response.json()
+                logger.debug(f"GeoLocation response data: {data}")
+                return {
+                    "city": data.get("city", "Unknown"),
+                    "region": data.get("region", "Unknown"),
+                    "country": data.get("country_name", "Unknown"),
+                    "postal": data.get("postal", "Unknown"),
+                    "org": data.get("org", "Unknown"),
+                }, False, data.get("network")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt < self.max_retries:
+                    delay = self._backoff(attempt)
+                    logger.warning(
+                        f"Caught {type(e).__name__} for {ip}, retrying in {delay:.2f}s"
+                    )
+                    time.sleep(delay)
+                    continue
+                logger.error(f"Caught exception for {ip}: {type(e).__name__}: {e}")
+                break
+            except requests.RequestException as e:
+                logger.error(f"Caught exception for {ip}: {type(e).__name__}: {e}")
+                break
+        return dict(UNKNOWN_GEOLOCATION), True, None
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Return the delay before the next attempt, honouring Retry-After up to max_backoff."""
+        if retry_after is not None:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = math.nan
+            if math.isfinite(delay):
+                return min(max(delay, 0.0), self.max_backoff)
+        delay = self.backoff_base * (2**attempt) * random.uniform(0.5, 1.5)
+        return min(delay, self.max_backoff)
+
     def get_geolocations(self, ip_addresses: List[str]) -> Dict[str, Dict[str, str]]:
-        """Fetch geolocation data for multiple IP addresses, using cache."""
-        return {ip: self.get_geolocation(ip) for ip in ip_addresses}
\ No newline at end of file
+        """Fetch geolocation data for multiple IP addresses concurrently, using cache."""
+        unique_ips = list(dict.fromkeys(ip_addresses))
+        if self.max_workers <= 1 or len(unique_ips) <= 1:
+            return {ip: self.get_geolocation(ip) for ip in unique_ips}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(unique_ips, executor.map(self.get_geolocation, unique_ips)))
+
+    def close(self) -> None:
+        """Release the HTTP session, persistent cache and range index, if any."""
+        self.session.close()
+        if self.range_index is not None:
+            self.range_index.close()
+        if self.persistent_cache is not None:
+            self.persistent_cache.close()
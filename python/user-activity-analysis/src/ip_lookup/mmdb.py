@@ -0,0 +1,71 @@
+import logging
+from typing import Any, Dict, Optional
+
+import maxminddb
+
+from .backend import GeolocationBackend
+from .geolocation import UNKNOWN_GEOLOCATION
+
+logger = logging.getLogger(__name__)
+
+
+class MmdbGeolocationClient(GeolocationBackend):
+    def __init__(self, city_db_path: str, asn_db_path: Optional[str] = None) -> None:
+        """Initialize an offline client over memory-mapped GeoLite2/GeoIP2 databases.
+
+        The City database supplies city, region, country and postal code; the
+        optional ASN database supplies the org.
+        """
+        self.city_reader = maxminddb.open_database(city_db_path, maxminddb.MODE_MMAP)
+        self.asn_reader = (
+            maxminddb.open_database(asn_db_path, maxminddb.MODE_MMAP)
+            if asn_db_path
+            else None
+        )
+        self._cache: Dict[str, Dict[str, str]] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> "MmdbGeolocationClient":
+        """Create an MmdbGeolocationClient instance from configuration."""
+        if not config.get("ip_lookup_mmdb_path"):
+            raise ValueError("IP_LOOKUP_MMDB_PATH is required for the mmdb backend")
+        return cls(
+            city_db_path=config["ip_lookup_mmdb_path"],
+            asn_db_path=config.get("ip_lookup_mmdb_asn_path"),
+        )
+
+    def get_geolocation(self, ip: str) -> Dict[str, str]:
+        """Look up geolocation data for a single IP address in the local databases."""
+        if not ip:
+            return dict(UNKNOWN_GEOLOCATION)
+        if ip in self._cache:
+            return self._cache[ip]
+        try:
+            city = self.city_reader.get(ip) or {}
+            asn = (self.asn_reader.get(ip) if self.asn_reader else None) or {}
+        except ValueError as e:
+            logger.error(f"Caught exception for {ip}: {type(e).__name__}: {e}")
+            city, asn = {}, {}
+        subdivisions = city.get("subdivisions") or [{}]
+        result = {
+            "city": _name(city.get("city")),
+            "region": _name(subdivisions[0]),
+            "country": _name(city.get("country")),
+            "postal": (city.get("postal") or {}).get("code", "Unknown"),
+            "org": asn.get("autonomous_system_organization", "Unknown"),
+        }
+        self._cache[ip] = result
+        return result
+
+    def close(self) -> None:
+        """Close the memory-mapped databases."""
+        self.city_reader.close()
+        if self.asn_reader is not None:
+            self.asn_reader.close()
+
+
+def _name(record: Optional[Dict[str, Any]]) -> str:
+    """Return the English name of an MMDB record, or Unknown."""
+    if not record:
+        return "Unknown"
+    return record.get("names", {}).get("en", "Unknown")
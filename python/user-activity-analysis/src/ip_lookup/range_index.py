@@ -0,0 +1,161 @@
+import bisect
+import csv
+import ipaddress
+import logging
+import os
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from .cache import GEO_KEYS
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDS = ["start_ip", "end_ip"] + GEO_KEYS
+
+
+class _RangeTable:
+    """Sorted, non-overlapping [start, end] integer ranges for one IP version."""
+
+    def __init__(self, typecode: Optional[str]) -> None:
+        # IPv4 bounds fit in a compact unsigned array; IPv6 needs Python ints.
+        self.starts = array(typecode) if typecode else []
+        self.ends = array(typecode) if typecode else []
+        self.records: List[int] = []
+
+    def find(self, value: int) -> Optional[int]:
+        idx = bisect.bisect_right(self.starts, value) - 1
+        if idx >= 0 and self.ends[idx] >= value:
+            return self.records[idx]
+        return None
+
+    def insert(self, start: int, end: int, record: int) -> bool:
+        idx = bisect.bisect_right(self.starts, start)
+        # Skip ranges that overlap a neighbour; a missing range only costs a lookup.
+        if idx > 0 and self.ends[idx - 1] >= start:
+            return False
+        if idx < len(self.starts) and self.starts[idx] <= end:
+            return False
+        self.starts.insert(idx, start)
+        self.ends.insert(idx, end)
+        self.records.insert(idx, record)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class IpRangeIndex:
+    # Blocks wider than this are too coarse to reuse a single geolocation for.
+    MIN_PREFIX = {4: 16, 6: 48}
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """Initialize an empty index of IP ranges to geolocation records.
+
+        If `path` is given, close() saves the index there.
+        """
+        self.path = path
+        self._tables = {4: _RangeTable("I"), 6: _RangeTable(None)}
+        self._records: List[Tuple[str, ...]] = []
+        self._record_ids: Dict[Tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+        self.avoided_lookups = 0
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self._tables.values())
+
+    def lookup(self, ip: str) -> Optional[Dict[str, str]]:
+        """Return the geolocation of the range containing the IP, if any."""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        with self._lock:
+            record = self._tables[address.version].find(int(address))
+            if record is None:
+                return None
+            self.avoided_lookups += 1
+            return dict(zip(GEO_KEYS, self._records[record]))
+
+    def add_network(self, network: str, geolocation: Dict[str, str]) -> bool:
+        """Index a CIDR network block, returning whether it was added."""
+        try:
+            net = ipaddress.ip_network(network, strict=False)
+        except ValueError:
+            logger.debug(f"Ignoring invalid network {network}")
+            return False
+        if net.prefixlen < self.MIN_PREFIX[net.version]:
+            logger.debug(f"Ignoring network {network} wider than the minimum prefix")
+            return False
+        return self._add(
+            net.version,
+            int(net.network_address),
+            int(net.broadcast_address),
+            geolocation,
+        )
+
+    def add_range(self, start_ip: str, end_ip: str, geolocation: Dict[str, str]) -> bool:
+        """Index an inclusive start/end address range, returning whether it was added."""
+        start = ipaddress.ip_address(start_ip)
+        end = ipaddress.ip_address(end_ip)
+        if start.version != end.version or int(end) < int(start):
+            raise ValueError(f"Invalid IP range: {start_ip} - {end_ip}")
+        return self._add(start.version, int(start), int(end), geolocation)
+
+    def _add(
+        self, version: int, start: int, end: int, geolocation: Dict[str, str]
+    ) -> bool:
+        values = tuple(geolocation.get(key, "Unknown") for key in GEO_KEYS)
+        with self._lock:
+            record = self._record_ids.get(values)
+            if record is None:
+                record = len(self._records)
+                self._records.append(values)
+                self._record_ids[values] = record
+            return self._tables[version].insert(start, end, record)
+
+    def load_csv(self, path: str) -> int:
+        """Bulk load ranges from a CSV with start_ip/end_ip or network columns."""
+        loaded = 0
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                if row.get("network"):
+                    added = self.add_network(row["network"], row)
+                else:
+                    added = self.add_range(row["start_ip"], row["end_ip"], row)
+                loaded += int(added)
+        logger.info(f"Loaded {loaded} IP ranges from {path}")
+        return loaded
+
+    def save_csv(self, path: str) -> None:
+        """Persist all ranges to a CSV that load_csv can read back."""
+        tmp_path = f"{path}.tmp"
+        with self._lock, open(tmp_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            for version, table in self._tables.items():
+                address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+                for start, end, record in zip(table.starts, table.ends, table.records):
+                    writer.writerow(
+                        [address(start), address(end), *self._records[record]]
+                    )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> Optional["IpRangeIndex"]:
+        """Create an IpRangeIndex from configuration, or None if no path is set."""
+        path = config.get("ip_range_index_path")
+        if not path:
+            return None
+        index = cls(path)
+        if os.path.exists(path):
+            index.load_csv(path)
+        if config.get("ip_range_seed_path"):
+            index.load_csv(config["ip_range_seed_path"])
+        return index
+
+    def close(self) -> None:
+        """Save the index back to its configured path."""
+        if self.path:
+            self.save_csv(self.path)
+        logger.info(f"IP range index avoided {self.avoided_lookups} lookups")
@@ -0,0 +1,244 @@
+import json
+import logging
+import sqlite3
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+from .batch import RowBatch
+
+logger = logging.getLogger(__name__)
+
+VOLUNTEER_COLUMNS = [
+    "USER_ID",
+    "FIRST_NAME",
+    "LAST_NAME",
+    "USER_NAME",
+    "STUDY_ID",
+    "OFFERS_COMPENSATION",
+    "SOURCE_ADDRESS",
+    "SHOWED_INTEREST_DATE",
+    "SHOWED_INTEREST_AFTER_LOGIN_MINS",
+]
+ACTIVATION_COLUMNS = [
+    "USER_ID",
+    "SOURCE_ADDRESS",
+    "TIME_TO_ACTIVATE_MINS",
+    "CREATED_DATE",
+    "USER_ACTIVATION_TIME",
+]
+
+# The aggregation from suspicious_activity_query.sql in SQLite, with the distinct
+# user thresholds as parameters. Dates are stored as text and compared through
+# julianday(); the study filter is appended before the ORDER BY.
+SUSPICIOUS_ACTIVITY_SQL = """
+WITH
+signup_suspicious AS (
+  SELECT
+    source_address,
+    COUNT(DISTINCT user_id) AS suspicious_signup_count,
+    ROUND((julianday(MAX(created_date)) - julianday(MIN(created_date))) * 24 * 60, 2)
+      AS creation_period_mins,
+    ROUND((julianday(MAX(user_activation_time)) - julianday(MIN(user_activation_time))) * 24 * 60, 2)
+      AS activation_period_mins,
+    ROUND(AVG(time_to_activate_mins), 2) AS avg_time_to_activate_mins
+  FROM activations
+  GROUP BY source_address
+  HAVING COUNT(DISTINCT user_id) >= :min_signup_users
+),
+interested_suspicious AS (
+  SELECT
+    study_id,
+    offers_compensation,
+    source_address,
+    COUNT(DISTINCT user_id) AS suspicious_interested_count,
+    ROUND((julianday(MAX(showed_interest_date)) - julianday(MIN(showed_interest_date))) * 24 * 60, 2)
+      AS interest_period_mins,
+    ROUND(AVG(showed_interest_after_login_mins), 2) AS avg_time_to_show_interest_mins
+  FROM volunteers
+  GROUP BY study_id, source_address, offers_compensation
+  HAVING COUNT(DISTINCT user_id) >= :min_interested_users
+)
+SELECT
+  v.user_id,
+  v.first_name,
+  v.last_name,
+  v.user_name,
+  v.study_id,
+  v.offers_compensation,
+  v.source_address AS interest_source_address,
+  i.suspicious_interested_count,
+  i.interest_period_mins,
+  i.avg_time_to_show_interest_mins,
+  u.source_address AS activation_source_address,
+  COALESCE(s.suspicious_signup_count, 0) AS suspicious_signup_count,
+  COALESCE(s.creation_period_mins, 0) AS creation_period_mins,
+  COALESCE(s.activation_period_mins, 0) AS activation_period_mins,
+  COALESCE(s.avg_time_to_activate_mins, 0) AS avg_time_to_activate_mins
+FROM volunteers v
+LEFT JOIN activations u
+  ON v.user_id = u.user_id
+JOIN interested_suspicious i
+  ON v.study_id = i.study_id
+ AND v.source_address = i.source_address
+LEFT JOIN signup_suspicious s
+  ON u.source_address = s.source_address
+WHERE 1=1
+{study_filter}
+ORDER BY
+  i.suspicious_interested_count DESC,
+  v.user_id,
+  v.study_id,
+  v.source_address
+"""
+
+
+def _sqlite_value(value: Any) -> Any:
+    """Convert a database value to one SQLite stores and compares like Oracle."""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _oracle_number(value: Any) -> Any:
+    """Return a result value the way python-oracledb returns a NUMBER.
+
+    SQLite's ROUND and AVG always return REAL; Oracle returns integral values
+    as int and the others as float.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class LocalAnalyticsEngine:
+    def __init__(self, path: str) -> None:
+        """Keep the raw view rows in a local SQLite file and aggregate them in-process.
+
+        Once loaded, the suspicious activity aggregates can be recomputed with
+        different thresholds without querying Oracle again.
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS volunteers ({', '.join(VOLUNTEER_COLUMNS)})"
+        )
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS activations ({', '.join(ACTIVATION_COLUMNS)})"
+        )
+        load_info_columns = [
+            row[1] for row in self._conn.execute("PRAGMA table_info(load_info)")
+        ]
+        if load_info_columns and "source" not in load_info_columns:
+            # Files loaded before the source was recorded are extracted again
+            self._conn.execute("DROP TABLE load_info")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS load_info (loaded_at REAL, volunteers INTEGER, "
+            "activations INTEGER, source TEXT)"
+        )
+        self._conn.commit()
+
+    def is_loaded(self) -> bool:
+        return self._conn.execute("SELECT 1 FROM load_info").fetchone() is not None
+
+    def loaded_from(self) -> Optional[Dict[str, Any]]:
+        """Return the source the stored rows were extracted from, or None if none are."""
+        row = self._conn.execute("SELECT source FROM load_info").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _insert(self, table: str, columns: Sequence[str], batches: Iterable[RowBatch]) -> int:
+        placeholders = ", ".join("?" for _ in columns)
+        count = 0
+        for batch in batches:
+            # Select the columns by name, so the extraction query's order does not matter
+            values = zip(*(batch.column(name) for name in columns))
+            rows = [tuple(_sqlite_value(value) for value in row) for row in values]
+            self._conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+            count += len(rows)
+        return count
+
+    def load(
+        self,
+        volunteer_batches: Iterable[RowBatch],
+        activation_batches: Iterable[RowBatch],
+        source: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, int]:
+        """Replace the stored raw rows with freshly extracted ones.
+
+        `source` describes where the rows were extracted from, e.g. the backup
+        schema, and is returned by loaded_from() on later runs.
+        """
+        started = time.perf_counter()
+        with self._conn:
+            self._conn.execute("DELETE FROM load_info")
+            self._conn.execute("DELETE FROM volunteers")
+            self._conn.execute("DELETE FROM activations")
+            counts = {
+                "volunteers": self._insert("volunteers", VOLUNTEER_COLUMNS, volunteer_batches),
+                "activations": self._insert(
+                    "activations", ACTIVATION_COLUMNS, activation_batches
+                ),
+            }
+            self._conn.execute(
+                "INSERT INTO load_info VALUES (?, ?, ?, ?)",
+                (
+                    time.time(),
+                    counts["volunteers"],
+                    counts["activations"],
+                    json.dumps(source or {}, sort_keys=True),
+                ),
+            )
+        # Indexes for the joins are built once, after the bulk insert
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS activations_user_id ON activations (USER_ID)"
+        )
+        self._conn.commit()
+        logger.info(
+            f"Loaded {counts} raw rows into {self.path} in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+        return counts
+
+    def suspicious_activity(
+        self,
+        study_ids: Optional[Sequence[int]] = None,
+        min_interested_users: int = 2,
+        min_signup_users: int = 2,
+        batch_size: int = 1000,
+    ) -> Iterator[RowBatch]:
+        """Compute the suspicious activity rows from the stored raw rows.
+
+        An IP counts as suspicious once at least `min_interested_users` users
+        showed interest in a study from it, or `min_signup_users` users activated
+        their account from it. The columns and value types match the Oracle
+        query with the raw name columns, ready for NamePatternEnricher.
+        """
+        params: Dict[str, Any] = {
+            "min_interested_users": min_interested_users,
+            "min_signup_users": min_signup_users,
+        }
+        study_filter = ""
+        if study_ids is not None:
+            names = [f"study_id_{i}" for i in range(len(study_ids))]
+            study_filter = f"AND v.study_id IN ({', '.join(':' + name for name in names)})"
+            params.update(zip(names, study_ids))
+        cursor = self._conn.execute(
+            SUSPICIOUS_ACTIVITY_SQL.format(study_filter=study_filter), params
+        )
+        columns = [column[0].upper() for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield RowBatch(
+                columns, [tuple(_oracle_number(value) for value in row) for row in rows]
+            )
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,124 @@
+import logging
+import re
+from typing import Any, Dict, Optional, Set, Tuple
+
+from .database import DatabaseClient
+from .query_builder import (build_login_audit_fingerprint_query,
+                            build_login_audit_snapshot_statements)
+
+logger = logging.getLogger(__name__)
+
+# Table names are interpolated into DDL, so the prefix must be a plain identifier
+# short enough to leave room for the suffixes.
+PREFIX_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9_]{0,100}$")
+
+
+class LoginAuditSnapshot:
+    def __init__(
+        self, db: DatabaseClient, backup_schema: str, queries_dir: str, prefix: str
+    ) -> None:
+        """Manage in-database snapshot tables of the backup schema's login_audit.
+
+        The backup login_audit never changes, so the successful logins (indexed
+        by user and time) and each user's first login after account creation are
+        copied once into tables named after `prefix`. A metadata table records
+        the row count and latest login of the backup they were built from.
+        """
+        if not PREFIX_PATTERN.match(prefix):
+            raise ValueError(f"Invalid login audit snapshot prefix: {prefix}")
+        self.db = db
+        self.backup_schema = backup_schema
+        self.queries_dir = queries_dir
+        self.tables = {
+            "logins": f"{prefix}_LOGINS".upper(),
+            "first_login": f"{prefix}_FIRST_LOGIN".upper(),
+            "meta": f"{prefix}_META".upper(),
+        }
+
+    @classmethod
+    def from_config(
+        cls, db: DatabaseClient, config: Dict[str, str], queries_dir: str
+    ) -> Optional["LoginAuditSnapshot"]:
+        """Create a LoginAuditSnapshot from configuration, or None if no prefix is set."""
+        prefix = config.get("login_audit_snapshot_prefix")
+        if not prefix:
+            return None
+        return cls(db, config["backup_schema_name"], queries_dir, prefix)
+
+    def _query_one(self, query: str, params: dict) -> Optional[Tuple[Any, ...]]:
+        for batch in self.db.stream_batches(query, params):
+            if batch.rows:
+                return batch.rows[0]
+        return None
+
+    def backup_fingerprint(self) -> Tuple[Any, ...]:
+        """Return the row count and latest login time of the backup login_audit."""
+        row = self._query_one(
+            build_login_audit_fingerprint_query(self.backup_schema, self.queries_dir),
+            {},
+        )
+        return tuple(row) if row else (0, None)
+
+    def existing_tables(self) -> Set[str]:
+        """Return the names of the snapshot tables that exist in the current schema."""
+        query = (
+            "SELECT TABLE_NAME FROM USER_TABLES "
+            "WHERE TABLE_NAME IN (:logins, :first_login, :meta)"
+        )
+        batches = self.db.stream_batches(query, dict(self.tables))
+        return {row[0] for batch in batches for row in batch.rows}
+
+    def snapshot_fingerprint(self) -> Optional[Tuple[Any, ...]]:
+        """Return the fingerprint the snapshot was built from, or None if there is none."""
+        # The metadata table does not exist until the first build; look it up rather
+        # than letting the query fail, which would be logged as an error
+        if self.tables["meta"] not in self.existing_tables():
+            return None
+        row = self._query_one(
+            f"SELECT ROW_COUNT, MAX_LOGIN_TIME FROM {self.tables['meta']} "
+            "WHERE BACKUP_SCHEMA = :backup_schema",
+            {"backup_schema": self.backup_schema},
+        )
+        return tuple(row) if row else None
+
+    def is_built(self) -> bool:
+        return self.snapshot_fingerprint() is not None
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuild the snapshot if the backup changed since it was built.
+
+        Returns whether the snapshot was rebuilt.
+        """
+        current = self.backup_fingerprint()
+        if not force and self.snapshot_fingerprint() == current:
+            logger.info(f"Login audit snapshot is up to date with {current[0]} rows")
+            return False
+
+        logger.info(f"Building login audit snapshot from {current[0]} backup rows")
+        self.drop()
+        for statement in build_login_audit_snapshot_statements(
+            self.backup_schema, self.queries_dir, self.tables
+        ):
+            self.db.execute(statement)
+        self.db.execute(
+            f"INSERT INTO {self.tables['meta']} "
+            "(BACKUP_SCHEMA, ROW_COUNT, MAX_LOGIN_TIME, BUILT_AT) "
+            "VALUES (:backup_schema, :row_count, :max_login_time, SYSDATE)",
+            {
+                "backup_schema": self.backup_schema,
+                "row_count": current[0],
+                "max_login_time": current[1],
+            },
+        )
+        logger.info(f"Built login audit snapshot tables {self.tables}")
+        return True
+
+    def drop(self) -> None:
+        """Drop the snapshot tables, skipping any that do not exist."""
+        existing = self.existing_tables()
+        # The metadata goes first, so a partly dropped snapshot is never used
+        for name in ("meta", "logins", "first_login"):
+            if self.tables[name] in existing:
+                self.db.execute(f"DROP TABLE {self.tables[name]} PURGE")
+            else:
+                logger.debug(f"Snapshot table {self.tables[name]} does not exist")
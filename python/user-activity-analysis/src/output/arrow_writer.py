@@ -0,0 +1,133 @@
+import decimal
+from typing import Any, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..batch import RowBatch
+from .buffered_output import BufferedOutput
+
+INTEGER_COLUMNS = {
+    "USER_ID",
+    "STUDY_ID",
+    "SUSPICIOUS_INTERESTED_COUNT",
+    "SUSPICIOUS_SIGNUP_COUNT",
+}
+
+
+def _column_type(name: str, values: List[Any]) -> pa.DataType:
+    """Pick the Arrow type of a column from its name, falling back to inference."""
+    if name in INTEGER_COLUMNS:
+        return pa.int64()
+    if name.endswith("_MINS"):
+        return pa.float64()
+    inferred = pa.array(values, from_pandas=True).type
+    if pa.types.is_null(inferred):
+        return pa.string()
+    if pa.types.is_decimal(inferred):
+        return pa.float64()
+    return inferred
+
+
+def _to_arrow_values(values: List[Any], arrow_type: pa.DataType) -> List[Any]:
+    # Oracle NUMBERs may arrive as Decimal, which Arrow will not cast to ints/floats
+    if pa.types.is_integer(arrow_type):
+        return [None if v is None else int(v) for v in values]
+    if pa.types.is_floating(arrow_type):
+        return [None if v is None else float(v) for v in values]
+    if pa.types.is_string(arrow_type):
+        return [None if v is None else str(v) for v in values]
+    return [float(v) if isinstance(v, decimal.Decimal) else v for v in values]
+
+
+class ArrowBatchWriter:
+    def __init__(self, output: BufferedOutput) -> None:
+        """Base class converting RowBatches to typed Arrow record batches.
+
+        The schema is fixed from the first batch; subclasses write the batches.
+        """
+        self.output = output
+        self.sink = pa.PythonFile(output, mode="w")
+        self.schema: Optional[pa.Schema] = None
+
+    def _to_record_batch(self, batch: RowBatch) -> pa.RecordBatch:
+        if self.schema is None:
+            self.schema = pa.schema(
+                [
+                    pa.field(name, _column_type(name, batch.column(name)))
+                    for name in batch.columns
+                ]
+            )
+            self._open(self.schema)
+        arrays = [
+            pa.array(_to_arrow_values(batch.column(field.name), field.type), type=field.type)
+            for field in self.schema
+        ]
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def _open(self, schema: pa.Schema) -> None:
+        raise NotImplementedError
+
+    def write_batch(self, batch: RowBatch) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+
+class ArrowIpcBatchWriter(ArrowBatchWriter):
+    def __init__(self, output: BufferedOutput) -> None:
+        """Write RowBatches as an Arrow IPC stream."""
+        super().__init__(output)
+        self._writer: Optional[pa.ipc.RecordBatchStreamWriter] = None
+
+    def _open(self, schema: pa.Schema) -> None:
+        self._writer = pa.ipc.new_stream(self.sink, schema)
+
+    def write_batch(self, batch: RowBatch) -> None:
+        record_batch = self._to_record_batch(batch)
+        self._writer.write_batch(record_batch)
+        self.output.add_rows(len(batch))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class ParquetBatchWriter(ArrowBatchWriter):
+    def __init__(
+        self,
+        output: BufferedOutput,
+        compression: str = "zstd",
+        row_group_size: int = 100000,
+    ) -> None:
+        """Write RowBatches as a Parquet file with row groups of `row_group_size` rows."""
+        super().__init__(output)
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._pending: List[pa.RecordBatch] = []
+        self._pending_rows = 0
+
+    def _open(self, schema: pa.Schema) -> None:
+        self._writer = pq.ParquetWriter(self.sink, schema, compression=self.compression)
+
+    def write_batch(self, batch: RowBatch) -> None:
+        self._pending.append(self._to_record_batch(batch))
+        self._pending_rows += len(batch)
+        if self._pending_rows >= self.row_group_size:
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        if not self._pending:
+            return
+        table = pa.Table.from_batches(self._pending, schema=self.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self.output.add_rows(self._pending_rows)
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._write_pending()
+            self._writer.close()
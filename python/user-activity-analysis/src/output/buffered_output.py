@@ -0,0 +1,105 @@
+import logging
+import time
+from typing import BinaryIO, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FlushPolicy:
+    def __init__(
+        self, every_rows: Optional[int] = None, every_ms: Optional[float] = None
+    ) -> None:
+        """Decide when buffered output is flushed.
+
+        With neither threshold set, output is only flushed when it is closed.
+        """
+        self.every_rows = every_rows
+        self.every_ms = every_ms
+
+    @classmethod
+    def parse(cls, spec: str) -> "FlushPolicy":
+        """Parse a policy spec: 'end', 'live', 'rows:N' or 'ms:T'."""
+        kind, _, value = spec.partition(":")
+        try:
+            if kind == "end" and not value:
+                return cls()
+            if kind == "live" and not value:
+                return cls(every_rows=1)
+            if kind == "rows" and int(value) > 0:
+                return cls(every_rows=int(value))
+            if kind == "ms" and float(value) >= 0:
+                return cls(every_ms=float(value))
+        except ValueError:
+            pass
+        raise ValueError(f"Invalid flush policy: {spec}")
+
+    def should_flush(self, rows_since_flush: int, ms_since_flush: float) -> bool:
+        if self.every_rows is not None and rows_since_flush >= self.every_rows:
+            return True
+        return self.every_ms is not None and ms_since_flush >= self.every_ms
+
+
+class BufferedOutput:
+    def __init__(
+        self,
+        stream: BinaryIO,
+        flush_policy: Optional[FlushPolicy] = None,
+        buffer_size: int = 1 << 20,
+    ) -> None:
+        """Accumulate encoded output in a large buffer and flush it per policy."""
+        self.stream = stream
+        self.flush_policy = flush_policy or FlushPolicy()
+        self.buffer_size = buffer_size
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.closed = False
+        self._buffer = bytearray()
+        self._rows_since_flush = 0
+        self._started = time.monotonic()
+        self._last_flush = self._started
+
+    def write(self, data: bytes) -> int:
+        """Buffer bytes, writing them through once the buffer is full."""
+        self._buffer += data
+        self.bytes_written += len(data)
+        if len(self._buffer) >= self.buffer_size:
+            self._drain()
+        return len(data)
+
+    def add_rows(self, count: int) -> None:
+        """Record that `count` complete rows were written, flushing if due."""
+        self.rows_written += count
+        self._rows_since_flush += count
+        ms_since_flush = (time.monotonic() - self._last_flush) * 1000
+        if self.flush_policy.should_flush(self._rows_since_flush, ms_since_flush):
+            self.flush()
+
+    def _drain(self) -> None:
+        if self._buffer:
+            self.stream.write(self._buffer)
+            self._buffer.clear()
+
+    def flush(self) -> None:
+        """Write out the buffer and flush the underlying stream."""
+        self._drain()
+        self.stream.flush()
+        self._rows_since_flush = 0
+        self._last_flush = time.monotonic()
+
+    def stats(self) -> Dict[str, float]:
+        """Return rows and bytes written, elapsed seconds and rows per second."""
+        elapsed = time.monotonic() - self._started
+        return {
+            "rows": self.rows_written,
+            "bytes": self.bytes_written,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.rows_written / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def close(self) -> Dict[str, float]:
+        """Flush remaining output and return the final stats."""
+        self.flush()
+        self.closed = True
+        stats = self.stats()
+        logger.info(f"Output stats: {stats}")
+        return stats
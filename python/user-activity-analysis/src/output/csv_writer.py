@@ -0,0 +1,28 @@
+import csv
+import io
+
+from ..batch import RowBatch
+from .buffered_output import BufferedOutput
+
+
+class CsvBatchWriter:
+    def __init__(self, output: BufferedOutput, encoding: str = "utf-8") -> None:
+        """Write RowBatches as CSV, encoding a whole batch per buffered write."""
+        self.output = output
+        self.encoding = encoding
+        self._text = io.StringIO()
+        self._writer = csv.writer(self._text)
+        self._header_written = False
+
+    def write_batch(self, batch: RowBatch) -> None:
+        if not self._header_written:
+            self._writer.writerow(batch.columns)
+            self._header_written = True
+        self._writer.writerows(batch.rows)
+        self.output.write(self._text.getvalue().encode(self.encoding))
+        self._text.seek(0)
+        self._text.truncate()
+        self.output.add_rows(len(batch))
+
+    def close(self) -> None:
+        """Finish the CSV output; nothing is written if no batches were seen."""
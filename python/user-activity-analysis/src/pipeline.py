@@ -0,0 +1,88 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Union
+
+from .batch import RowBatch
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class _FetchError:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class StagedPipeline:
+    def __init__(
+        self,
+        enrich: Callable[[RowBatch], RowBatch],
+        workers: int = 2,
+        queue_size: int = 4,
+    ) -> None:
+        """Overlap fetching, enriching and writing batches in separate stages.
+
+        A fetch thread pulls batches from the source and hands each one to a
+        pool of `workers` enrichment threads. The caller consumes the enriched
+        batches in source order. At most `queue_size` batches are fetched
+        ahead of the one being written, so a slow stage holds back the others
+        instead of buffering without bound.
+        """
+        if workers < 1:
+            raise ValueError(f"Pipeline needs at least one worker: {workers}")
+        self.enrich = enrich
+        self.workers = workers
+        self.queue_size = max(queue_size, 1)
+
+    def run(self, batches: Iterable[RowBatch]) -> Iterator[RowBatch]:
+        """Yield the enriched batches in the order they were fetched."""
+        pending: "queue.Queue[Union[Future, _FetchError, object]]" = queue.Queue(
+            maxsize=self.queue_size
+        )
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="pipeline-enrich"
+        )
+
+        def put(item) -> bool:
+            # Wait for room in the queue, giving up once the consumer has stopped
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fetch() -> None:
+            source = iter(batches)
+            try:
+                for batch in source:
+                    if not put(executor.submit(self.enrich, batch)):
+                        return
+                put(_DONE)
+            except BaseException as e:
+                put(_FetchError(e))
+            finally:
+                # Release the source's cursor in the thread that was reading it
+                close = getattr(source, "close", None)
+                if close is not None:
+                    close()
+
+        fetcher = threading.Thread(target=fetch, name="pipeline-fetch", daemon=True)
+        fetcher.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _FetchError):
+                    raise item.error
+                yield item.result()
+        finally:
+            stop.set()
+            fetcher.join()
+            executor.shutdown(wait=True, cancel_futures=True)
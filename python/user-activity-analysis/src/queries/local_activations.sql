@@ -0,0 +1,7 @@
+SELECT
+  USER_ID,
+  SOURCE_ADDRESS,
+  TIME_TO_ACTIVATE_MINS,
+  CAST(CREATED_DATE AS DATE) AS CREATED_DATE,
+  CAST(USER_ACTIVATION_TIME AS DATE) AS USER_ACTIVATION_TIME
+FROM v_user_activation_time
@@ -0,0 +1,13 @@
+SELECT
+  v.USER_ID,
+  au.first_name,
+  au.last_name,
+  au.user_name,
+  v.STUDY_ID,
+  v.OFFERS_COMPENSATION,
+  v.SOURCE_ADDRESS,
+  v.SHOWED_INTEREST_DATE,
+  v.SHOWED_INTEREST_AFTER_LOGIN_MINS
+FROM v_study_volunteer_ip v
+JOIN app_user au
+  ON au.id = v.user_id
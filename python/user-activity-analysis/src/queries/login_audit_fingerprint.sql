@@ -0,0 +1,4 @@
+SELECT
+  COUNT(*) AS row_count,
+  MAX(SUCCESSFUL_LOGIN_TIME) AS max_login_time
+FROM {backup_schema}.login_audit
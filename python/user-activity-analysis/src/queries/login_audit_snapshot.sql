@@ -0,0 +1,27 @@
+CREATE TABLE {logins_table} COMPRESS AS
+SELECT USER_ID, SUCCESSFUL_LOGIN_TIME, SOURCE_ADDRESS
+FROM {backup_schema}.login_audit
+WHERE SUCCESSFUL_LOGIN_TIME IS NOT NULL;
+
+CREATE INDEX {logins_table}_IX
+ON {logins_table} (USER_ID, SUCCESSFUL_LOGIN_TIME, SOURCE_ADDRESS);
+
+CREATE TABLE {first_login_table} AS
+SELECT
+  l.USER_ID,
+  MIN(l.SUCCESSFUL_LOGIN_TIME) AS SUCCESSFUL_LOGIN_TIME,
+  MIN(l.SOURCE_ADDRESS) KEEP (DENSE_RANK FIRST ORDER BY l.SUCCESSFUL_LOGIN_TIME) AS SOURCE_ADDRESS
+FROM {backup_schema}.login_audit l
+JOIN db_user_auth_detail d ON l.USER_ID = d.USER_ID
+WHERE l.SUCCESSFUL_LOGIN_TIME >= d.CREATED_DATE
+GROUP BY l.USER_ID;
+
+CREATE UNIQUE INDEX {first_login_table}_IX
+ON {first_login_table} (USER_ID, SUCCESSFUL_LOGIN_TIME, SOURCE_ADDRESS);
+
+CREATE TABLE {meta_table} (
+  BACKUP_SCHEMA VARCHAR2(128) NOT NULL,
+  ROW_COUNT NUMBER NOT NULL,
+  MAX_LOGIN_TIME TIMESTAMP,
+  BUILT_AT DATE NOT NULL
+)
@@ -0,0 +1,24 @@
+CASE
+  WHEN REGEXP_LIKE(
+    au.user_name,
+    '^' ||
+    REGEXP_REPLACE(au.first_name, '([][.^$*+?(){}|\\])', '\\\1') ||
+    '[._+-]?' ||
+    REGEXP_REPLACE(au.last_name, '([][.^$*+?(){}|\\])', '\\\1') ||
+    '[._+-]?' ||
+    '[0-9]*@.+$',
+    'i'
+  )
+  OR REGEXP_LIKE(
+    au.user_name,
+    '^' ||
+    REGEXP_REPLACE(au.last_name, '([][.^$*+?(){}|\\])', '\\\1') ||
+    '[._+-]?' ||
+    REGEXP_REPLACE(au.first_name, '([][.^$*+?(){}|\\])', '\\\1') ||
+    '[._+-]?' ||
+    '[0-9]*@.+$',
+    'i'
+  )
+  THEN 'True'
+  ELSE 'False'
+END AS matches_name_pattern
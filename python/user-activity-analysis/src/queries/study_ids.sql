@@ -0,0 +1,3 @@
+SELECT DISTINCT study_id
+FROM study_volunteer
+ORDER BY study_id
@@ -24,30 +24,7 @@ interested_suspicious AS (
 )
 SELECT
   v.USER_ID,
-  CASE
-    WHEN REGEXP_LIKE(
-      au.user_name,
-      '^' ||
-      REGEXP_REPLACE(au.first_name, '([.\^\$\*\+\?\(\)\|\{\}\[\]\\\\])', '\\\1') ||
-      '(?:\\.|_|\+|\\-)?' ||
-      REGEXP_REPLACE(au.last_name, '([.\^\$\*\+\?\(\)\|\{\}\[\]\\\\])', '\\\1') ||
-      '(?:\\.|_|\+|\\-)?' ||
-      '[0-9]*@.+$',
-      'i'
-    )
-    OR REGEXP_LIKE(
-      au.user_name,
-      '^' ||
-      REGEXP_REPLACE(au.last_name, '([.\^\$\*\+\?\(\)\|\{\}\[\]\\\\])', '\\\1') ||
-      '(?:\\.|_|\+|\\-)?' ||
-      REGEXP_REPLACE(au.first_name, '([.\^\$\*\+\?\(\)\|\{\}\[\]\\\\])', '\\\1') ||
-      '(?:\\.|_|\+|\\-)?' ||
-      '[0-9]*@.+$',
-      'i'
-    )
-    THEN 'True'
-    ELSE 'False'
-  END AS matches_name_pattern,
+  {name_pattern_columns},
   v.STUDY_ID,
   v.offers_compensation,
   v.SOURCE_ADDRESS AS INTEREST_SOURCE_ADDRESS,
@@ -71,6 +48,7 @@ LEFT JOIN signup_suspicious s
   ON u.source_address = s.source_address
 WHERE 1=1
 -- APPEND STUDY_ID_FILTER_HERE
+-- APPEND CHANGED_GROUPS_FILTER_HERE
 ORDER BY
   i.suspicious_interested_count DESC,
   v.user_id,
@@ -21,9 +21,11 @@ FROM (
       ORDER BY l.SUCCESSFUL_LOGIN_TIME DESC
     ) AS rn
   FROM (
-    SELECT * FROM login_audit
+    SELECT USER_ID, SUCCESSFUL_LOGIN_TIME, SOURCE_ADDRESS FROM login_audit
+    -- APPEND LOGIN_FILTER_HERE
     UNION ALL
-    SELECT * FROM {backup_schema}.login_audit
+    SELECT USER_ID, SUCCESSFUL_LOGIN_TIME, SOURCE_ADDRESS FROM {backup_schema}.login_audit
+    -- APPEND LOGIN_FILTER_HERE
   ) l
   RIGHT JOIN study_volunteer v
     ON l.USER_ID = v.USER_ID
@@ -44,6 +46,8 @@ FROM (
     WHERE ep.name = 'offersCompensation'
   ) oc
     ON oc.study_id = v.STUDY_ID
+  WHERE 1=1
+  -- APPEND ENTITY_FILTER_HERE
 )
 WHERE rn = 1
   AND SOURCE_ADDRESS IS NOT NULL
@@ -12,9 +12,11 @@ LEFT JOIN (
     MIN(l.SUCCESSFUL_LOGIN_TIME) AS user_activation_time,
     MIN(l.source_address) KEEP (DENSE_RANK FIRST ORDER BY l.SUCCESSFUL_LOGIN_TIME) AS source_address
   FROM (
-    SELECT * FROM login_audit
+    SELECT USER_ID, SUCCESSFUL_LOGIN_TIME, SOURCE_ADDRESS FROM login_audit
+    -- APPEND LOGIN_FILTER_HERE
     UNION ALL
-    SELECT * FROM {backup_schema}.login_audit
+    SELECT USER_ID, SUCCESSFUL_LOGIN_TIME, SOURCE_ADDRESS FROM {backup_schema}.login_audit
+    -- APPEND LOGIN_FILTER_HERE
   ) l
   JOIN db_user_auth_detail d2 ON l.USER_ID = d2.USER_ID
   WHERE
@@ -25,4 +27,5 @@ LEFT JOIN (
     l.USER_ID
 ) la ON d.USER_ID = la.USER_ID
 WHERE la.user_activation_time IS NOT NULL
+  -- APPEND ENTITY_FILTER_HERE
 ORDER BY la.user_activation_time DESC
\ No newline at end of file
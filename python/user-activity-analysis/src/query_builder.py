@@ -1,4 +1,59 @@
 import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+STUDY_ID_MARKER = "-- APPEND STUDY_ID_FILTER_HERE"
+# One statement serves every run: :all_studies = 1 disables the filter, otherwise
+# the studies are bound as a number collection, so Oracle parses it only once.
+# The CAST types the bind for EXPLAIN PLAN, which has no value to take it from.
+STUDY_IDS = "SELECT column_value FROM TABLE(CAST(:study_ids AS SYS.ODCINUMBERLIST))"
+STUDY_ID_FILTER = f"AND (:all_studies = 1 OR v.study_id IN ({STUDY_IDS}))"
+
+# The study filter also reaches the views' inputs, so a run for some studies only
+# joins and aggregates the studies and users it returns (see _build_study_groups).
+VOLUNTEER_LOGIN_STUDIES = (
+    "(:all_studies = 1 OR USER_ID IN (SELECT user_id FROM study_volunteers))"
+)
+VOLUNTEER_ENTITY_STUDIES = f"(:all_studies = 1 OR v.STUDY_ID IN ({STUDY_IDS}))"
+ACTIVATION_LOGIN_STUDIES = (
+    "(:all_studies = 1 OR USER_ID IN (SELECT user_id FROM study_signups))"
+)
+ACTIVATION_ENTITY_STUDIES = (
+    "(:all_studies = 1 OR d.USER_ID IN (SELECT user_id FROM study_signups))"
+)
+
+NAME_PATTERN_PLACEHOLDER = "{name_pattern_columns}"
+# Raw name columns for NamePatternEnricher, which classifies them in Python
+NAME_COLUMNS = "au.first_name,\n  au.last_name,\n  au.user_name"
+NAME_PATTERN_MODES = ("python", "sql")
+
+LOGIN_FILTER_MARKER = "-- APPEND LOGIN_FILTER_HERE"
+ENTITY_FILTER_MARKER = "-- APPEND ENTITY_FILTER_HERE"
+
+CHANGED_GROUPS_MARKER = "-- APPEND CHANGED_GROUPS_FILTER_HERE"
+
+# Windows for incremental runs, relative to the :since bind variable. Each view
+# only looks at logins within the lookback it needs before its own events.
+VOLUNTEER_LOGIN_WINDOW = "SUCCESSFUL_LOGIN_TIME >= :since - INTERVAL '3' HOUR"
+VOLUNTEER_ENTITY_WINDOW = "v.SHOWED_INTEREST_DATE >= :since"
+ACTIVATION_LOGIN_WINDOW = "SUCCESSFUL_LOGIN_TIME >= :since - INTERVAL '7' DAY"
+ACTIVATION_ENTITY_WINDOW = "d.CREATED_DATE >= :since - INTERVAL '7' DAY"
+
+# Incremental runs semi-join the views' inputs against the changed groups, so
+# only the studies and users those groups need are joined to the logins and
+# aggregated (see _build_changed_groups).
+VOLUNTEER_LOGIN_GROUPS = "USER_ID IN (SELECT user_id FROM group_volunteers)"
+VOLUNTEER_ENTITY_GROUPS = "v.STUDY_ID IN (SELECT study_id FROM group_studies)"
+ACTIVATION_LOGIN_GROUPS = "USER_ID IN (SELECT user_id FROM group_signups)"
+ACTIVATION_ENTITY_GROUPS = "d.USER_ID IN (SELECT user_id FROM group_signups)"
+
+# Incremental runs only return the rows of groups with events in the window: the
+# study/IP pairs someone showed interest from, and the IPs someone activated from.
+CHANGED_GROUPS_FILTER = (
+    "AND ((v.study_id, v.source_address) IN "
+    "(SELECT study_id, source_address FROM changed_interest)\n"
+    "  OR u.source_address IN (SELECT source_address FROM changed_signup))"
+)
 
 
 def _load_query(filename: str, backup_schema: str) -> str:
@@ -25,32 +80,225 @@ def _build_suspicious_activity_query(
     return combined_sql
 
 
-def _add_study_id_filter(query: str) -> str:
-    if "-- APPEND STUDY_ID_FILTER_HERE" in query:
-        return query.replace(
-            "-- APPEND STUDY_ID_FILTER_HERE", "AND v.study_id = :study_id"
+def _add_filters(
+    query: str, login_filters: Sequence[str], entity_filters: Sequence[str]
+) -> str:
+    """Apply conditions to a view's login_audit selects and to its entity rows."""
+    login_filter = "WHERE " + " AND ".join(login_filters) if login_filters else ""
+    entity_filter = "\n  ".join(f"AND {condition}" for condition in entity_filters)
+    return query.replace(LOGIN_FILTER_MARKER, login_filter).replace(
+        ENTITY_FILTER_MARKER, entity_filter
+    )
+
+
+def _build_changed_groups(
+    v_study_volunteer_ip: str, v_user_activation_time: str, activation_logins: str
+) -> str:
+    """Return the CTEs finding the changed groups and the rows needed to recompute them.
+
+    changed_interest and changed_signup only scan the :since windows. The other
+    CTEs widen them to complete groups: every volunteer of a study with a changed
+    group or with a volunteer who may have activated from a changed IP, and every
+    user who may have activated from an IP one of those volunteers logged in from.
+    `activation_logins` selects USER_ID and SOURCE_ADDRESS from the logins that
+    v_user_activation_time reads.
+    """
+    volunteers_since = _add_filters(
+        v_study_volunteer_ip, [VOLUNTEER_LOGIN_WINDOW], [VOLUNTEER_ENTITY_WINDOW]
+    )
+    activations_since = _add_filters(
+        v_user_activation_time, [ACTIVATION_LOGIN_WINDOW], [ACTIVATION_ENTITY_WINDOW]
+    )
+    return f"""
+    changed_interest AS (
+        SELECT DISTINCT study_id, source_address FROM (
+        {volunteers_since}
         )
+    ),
+    changed_signup AS (
+        SELECT DISTINCT source_address FROM (
+        {activations_since}
+        )
+    ),
+    group_studies AS (
+        SELECT study_id FROM changed_interest
+        UNION
+        SELECT study_id FROM study_volunteer
+        WHERE user_id IN (
+          SELECT USER_ID FROM ({activation_logins})
+          WHERE SOURCE_ADDRESS IN (SELECT source_address FROM changed_signup)
+        )
+    ),
+    group_volunteers AS (
+        SELECT DISTINCT user_id FROM study_volunteer
+        WHERE study_id IN (SELECT study_id FROM group_studies)
+    ),
+    group_signups AS (
+        SELECT user_id FROM group_volunteers
+        UNION
+        SELECT USER_ID FROM ({activation_logins})
+        WHERE SOURCE_ADDRESS IN (
+          SELECT SOURCE_ADDRESS FROM ({activation_logins})
+          WHERE USER_ID IN (SELECT user_id FROM group_volunteers)
+        )
+    ),"""
+
+
+def _build_study_groups(activation_logins: str) -> str:
+    """Return the CTEs finding the users a run for the bound studies needs.
+
+    study_volunteers are the studies' volunteers. study_signups adds every user
+    who may have activated from an IP one of them logged in from, so the signup
+    groups of the volunteers' activation IPs are complete. Both are only read
+    when :all_studies is 0.
+    """
+    return f"""
+    study_volunteers AS (
+        SELECT DISTINCT user_id FROM study_volunteer
+        WHERE study_id IN ({STUDY_IDS})
+    ),
+    study_signups AS (
+        SELECT user_id FROM study_volunteers
+        UNION
+        SELECT USER_ID FROM ({activation_logins})
+        WHERE SOURCE_ADDRESS IN (
+          SELECT SOURCE_ADDRESS FROM ({activation_logins})
+          WHERE USER_ID IN (SELECT user_id FROM study_volunteers)
+        )
+    ),"""
+
+
+def _login_source(backup_table: str) -> str:
+    return (
+        "SELECT USER_ID, SOURCE_ADDRESS FROM login_audit "
+        f"UNION ALL SELECT USER_ID, SOURCE_ADDRESS FROM {backup_table}"
+    )
+
+
+def _use_snapshot_table(query: str, backup_schema: str, table: str) -> str:
+    return query.replace(f"{backup_schema}.login_audit", table)
+
+
+def _add_name_pattern_columns(query: str, queries_dir: str, name_pattern: str) -> str:
+    if name_pattern == "sql":
+        with open(os.path.join(queries_dir, "matches_name_pattern.sql")) as f:
+            columns = f.read().strip().replace("\n", "\n  ")
+    elif name_pattern == "python":
+        columns = NAME_COLUMNS
+    else:
+        raise ValueError(f"Unknown name pattern mode: {name_pattern}")
+    return query.replace(NAME_PATTERN_PLACEHOLDER, columns)
+
+
+def _add_study_id_filter(query: str) -> str:
+    if STUDY_ID_MARKER in query:
+        return query.replace(STUDY_ID_MARKER, STUDY_ID_FILTER)
     else:
         order_by_idx = query.lower().rfind("order by")
         if order_by_idx != -1:
             return (
                 query[:order_by_idx]
-                + "AND v.study_id = :study_id\n"
+                + STUDY_ID_FILTER
+                + "\n"
                 + query[order_by_idx:]
             )
-        return query + "\nAND v.study_id = :study_id\n"
+        return query + "\n" + STUDY_ID_FILTER + "\n"
+
+
+def study_filter_params(
+    study_ids: Optional[Sequence[int]] = None,
+) -> Dict[str, Union[int, List[int]]]:
+    """Return the bind parameters selecting `study_ids`, or all studies if None."""
+    if study_ids is None:
+        return {"all_studies": 1, "study_ids": []}
+    return {"all_studies": 0, "study_ids": list(study_ids)}
+
+
+def build_database_query(
+    backup_schema: str,
+    queries_dir: str,
+    incremental: bool = False,
+    snapshot_tables: Optional[Dict[str, str]] = None,
+    name_pattern: str = "python",
+) -> str:
+    """Build the suspicious activity query.
 
+    The study filter is always present and bound with study_filter_params().
+    It also restricts the views' inputs, so a run for some studies only
+    aggregates the groups of those studies' volunteers.
+    With `incremental`, only the rows of groups with events on or after the
+    :since bind variable are returned: study/IP pairs with new interest, and
+    IPs with new activations. Finding those groups scans login_audit only as
+    far back as the windows need. The views then only read the studies and
+    users of those groups, which are aggregated over their full history, so
+    their counts and periods are complete.
+    With `snapshot_tables`, the views read the backup logins from the "logins"
+    and "first_login" snapshot tables instead of the backup login_audit.
+    `name_pattern` is "python" to select the raw first, last and user names for
+    NamePatternEnricher, or "sql" to compute MATCHES_NAME_PATTERN in Oracle.
 
-def build_database_query(backup_schema: str, queries_dir: str) -> str:
+    The SQL is built once per set of arguments and cached, so repeated calls
+    return the identical statement text.
+    """
+    return _build_database_query(
+        backup_schema,
+        queries_dir,
+        incremental,
+        tuple(sorted(snapshot_tables.items())) if snapshot_tables else None,
+        name_pattern,
+    )
+
+
+@lru_cache(maxsize=None)
+def _build_database_query(
+    backup_schema: str,
+    queries_dir: str,
+    incremental: bool,
+    snapshot_items: Optional[Tuple[Tuple[str, str], ...]],
+    name_pattern: str,
+) -> str:
+    snapshot_tables = dict(snapshot_items) if snapshot_items else None
     v_study_volunteer_ip = _load_query(
         os.path.join(queries_dir, "v_study_volunteer_ip.sql"), backup_schema
     )
     v_user_activation_time = _load_query(
         os.path.join(queries_dir, "v_user_activation_time.sql"), backup_schema
     )
-    suspicious_activity_ctes_and_select = _load_query(
-        os.path.join(queries_dir, "suspicious_activity_query.sql"), backup_schema
+    if snapshot_tables:
+        v_study_volunteer_ip = _use_snapshot_table(
+            v_study_volunteer_ip, backup_schema, snapshot_tables["logins"]
+        )
+        v_user_activation_time = _use_snapshot_table(
+            v_user_activation_time, backup_schema, snapshot_tables["first_login"]
+        )
+    activation_logins = _login_source(
+        snapshot_tables["first_login"] if snapshot_tables else f"{backup_schema}.login_audit"
+    )
+    study_groups = _build_study_groups(activation_logins)
+    volunteer_filters = ([VOLUNTEER_LOGIN_STUDIES], [VOLUNTEER_ENTITY_STUDIES])
+    activation_filters = ([ACTIVATION_LOGIN_STUDIES], [ACTIVATION_ENTITY_STUDIES])
+    changed_groups = ""
+    if incremental:
+        changed_groups = _build_changed_groups(
+            v_study_volunteer_ip, v_user_activation_time, activation_logins
+        )
+        volunteer_filters[0].append(VOLUNTEER_LOGIN_GROUPS)
+        volunteer_filters[1].append(VOLUNTEER_ENTITY_GROUPS)
+        activation_filters[0].append(ACTIVATION_LOGIN_GROUPS)
+        activation_filters[1].append(ACTIVATION_ENTITY_GROUPS)
+    v_study_volunteer_ip = _add_filters(v_study_volunteer_ip, *volunteer_filters)
+    v_user_activation_time = _add_filters(v_user_activation_time, *activation_filters)
+    suspicious_activity_ctes_and_select = _add_name_pattern_columns(
+        _load_query(
+            os.path.join(queries_dir, "suspicious_activity_query.sql"), backup_schema
+        ),
+        queries_dir,
+        name_pattern,
     )
+    if incremental:
+        suspicious_activity_ctes_and_select = suspicious_activity_ctes_and_select.replace(
+            CHANGED_GROUPS_MARKER, CHANGED_GROUPS_FILTER
+        )
 
     # Ensure the suspicious_activity_query.sql does not start with a comma or whitespace
     suspicious_activity_ctes_and_select = suspicious_activity_ctes_and_select.lstrip()
@@ -59,7 +307,7 @@ def build_database_query(backup_schema: str, queries_dir: str) -> str:
         suspicious_activity_ctes_and_select = "," + suspicious_activity_ctes_and_select
 
     query = f"""
-    WITH
+    WITH{study_groups}{changed_groups}
     v_study_volunteer_ip AS (
         {v_study_volunteer_ip}
     ),
@@ -69,3 +317,56 @@ def build_database_query(backup_schema: str, queries_dir: str) -> str:
     {suspicious_activity_ctes_and_select}
     """
     return _add_study_id_filter(query)
+
+
+def build_study_ids_query(backup_schema: str, queries_dir: str) -> str:
+    return _load_query(os.path.join(queries_dir, "study_ids.sql"), backup_schema)
+
+
+def build_login_audit_fingerprint_query(backup_schema: str, queries_dir: str) -> str:
+    return _load_query(
+        os.path.join(queries_dir, "login_audit_fingerprint.sql"), backup_schema
+    )
+
+
+def build_login_audit_snapshot_statements(
+    backup_schema: str, queries_dir: str, tables: Dict[str, str]
+) -> List[str]:
+    """Return the DDL statements that build the backup login_audit snapshot."""
+    sql = _load_query(
+        os.path.join(queries_dir, "login_audit_snapshot.sql"), backup_schema
+    )
+    for name, table in tables.items():
+        sql = sql.replace(f"{{{name}_table}}", table)
+    return [statement.strip() for statement in sql.split(";") if statement.strip()]
+
+
+def build_local_queries(
+    backup_schema: str,
+    queries_dir: str,
+    snapshot_tables: Optional[Dict[str, str]] = None,
+) -> Tuple[str, str]:
+    """Build the queries that extract the raw view rows for LocalAnalyticsEngine.
+
+    Returns the volunteer query, which includes the user's names, and the
+    activation query.
+    """
+    views = {}
+    for name, snapshot_table, select_file in (
+        ("v_study_volunteer_ip", "logins", "local_volunteers.sql"),
+        ("v_user_activation_time", "first_login", "local_activations.sql"),
+    ):
+        view = _load_query(os.path.join(queries_dir, f"{name}.sql"), backup_schema)
+        if snapshot_tables:
+            view = _use_snapshot_table(
+                view, backup_schema, snapshot_tables[snapshot_table]
+            )
+        select = _load_query(os.path.join(queries_dir, select_file), backup_schema)
+        views[name] = f"""
+    WITH
+    {name} AS (
+        {view}
+    )
+    {select}
+    """
+    return views["v_study_volunteer_ip"], views["v_user_activation_time"]
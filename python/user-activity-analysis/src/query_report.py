@@ -0,0 +1,86 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .database import FetchStats
+
+logger = logging.getLogger(__name__)
+
+REPORT_FILENAME = "query_reports.jsonl"
+
+
+def default_report_path(filename: str = REPORT_FILENAME) -> str:
+    """Return a path next to the log file, or in the working directory if there is none."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.FileHandler):
+            return os.path.join(os.path.dirname(handler.baseFilename), filename)
+    return filename
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    return str(value)
+
+
+class QueryReport:
+    def __init__(
+        self, mode: str, query: str, params: Optional[dict], queries_dir: str
+    ) -> None:
+        """Collect the plan and timings of one run of the analysis query.
+
+        The query text and each SQL file in `queries_dir` are fingerprinted, so
+        reports from before and after a change to the SQL can be told apart.
+        """
+        self.mode = mode
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.query_sha256 = _sha256(query)
+        self.params = {
+            name: _json_value(value) for name, value in (params or {}).items()
+        }
+        self.query_files = {}
+        for path in sorted(glob.glob(os.path.join(queries_dir, "*.sql"))):
+            with open(path) as f:
+                self.query_files[os.path.basename(path)] = _sha256(f.read())
+        self.plan: List[str] = []
+        self.fetch: Optional[Dict[str, Any]] = None
+
+    def add_fetch_stats(self, stats: Optional[FetchStats]) -> None:
+        """Record the fetch statistics and executed plan of the query."""
+        if stats is None:
+            return
+        self.fetch = stats.summary()
+        if stats.plan is not None:
+            self.plan = stats.plan
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "started_at": self.started_at.isoformat(),
+            "total_seconds": round(time.perf_counter() - self._started, 3),
+            "query_sha256": self.query_sha256,
+            "query_files": self.query_files,
+            "params": self.params,
+            "fetch": self.fetch,
+            "plan": self.plan,
+        }
+
+    def write(self, path: str) -> Dict[str, Any]:
+        """Append the report as one JSON line to `path` and return it."""
+        report = self.to_dict()
+        with open(path, "a") as f:
+            f.write(json.dumps(report) + "\n")
+        logger.info(f"Wrote {self.mode} report to {path}")
+        return report
@@ -3,6 +3,9 @@ from .ipenricher import IpEnricher
 
 logger = logging.getLogger(__name__)
 
+GEO_KEYS = ["city", "region", "country", "postal", "org"]
+UNKNOWN = {key: "Unknown" for key in GEO_KEYS}
+
 GEO_FIELDS = [
     "INTEREST_CITY", "INTEREST_REGION", "INTEREST_COUNTRY", "INTEREST_POSTAL", "INTEREST_ORG",
     "ACTIVATION_CITY", "ACTIVATION_REGION", "ACTIVATION_COUNTRY", "ACTIVATION_POSTAL", "ACTIVATION_ORG"
@@ -16,6 +19,37 @@ class GeolocationEnricher(IpEnricher):
     def header_fields(self):
         return GEO_FIELDS
 
+    def prefetch(self, batches):
+        ips = set()
+        for batch in batches:
+            ips.update(batch.column("INTEREST_SOURCE_ADDRESS"))
+            ips.update(batch.column("ACTIVATION_SOURCE_ADDRESS"))
+        ips.discard(None)
+        ips.discard("")
+        logger.info(f"Prefetching geolocation for {len(ips)} distinct IPs")
+        self.geo_client.get_geolocations(sorted(ips))
+
+    def enrich_columns(self, batch):
+        interest_ips = batch.column("INTEREST_SOURCE_ADDRESS")
+        activation_ips = batch.column("ACTIVATION_SOURCE_ADDRESS")
+        # Resolve each distinct IP in the batch once, concurrently
+        geos = self.geo_client.get_geolocations(
+            [ip for ip in set(interest_ips).union(activation_ips) if ip]
+        )
+        interest_geos = [geos.get(ip, UNKNOWN) if ip else UNKNOWN for ip in interest_ips]
+        activation_geos = [
+            geos.get(ip, UNKNOWN) if ip else interest_geo
+            for ip, interest_geo in zip(activation_ips, interest_geos)
+        ]
+
+        columns = {}
+        for prefix, batch_geos in (("INTEREST", interest_geos), ("ACTIVATION", activation_geos)):
+            for key in GEO_KEYS:
+                columns[f"{prefix}_{key.upper()}"] = [
+                    geo.get(key, "Unknown") for geo in batch_geos
+                ]
+        return columns
+
     def enrich(self, row):
         interest_ip = row.get("INTEREST_SOURCE_ADDRESS")
         activation_ip = row.get("ACTIVATION_SOURCE_ADDRESS")
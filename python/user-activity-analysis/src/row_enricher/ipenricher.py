@@ -1,4 +1,6 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List
+
+from ..batch import RowBatch
 
 #To be used like an interface
 class IpEnricher:
@@ -6,7 +8,22 @@ class IpEnricher:
         """Enrich the row with additional attributes."""
         raise NotImplementedError
 
+    def enrich_columns(self, batch: RowBatch) -> Dict[str, List[Any]]:
+        """Return the new columns for a batch, keyed by header field.
+
+        Falls back to enriching row by row; override for a columnar implementation.
+        """
+        enriched = [self.enrich(row) for row in batch.dicts()]
+        return {field: [row.get(field) for row in enriched] for field in self.header_fields}
+
+    def enrich_batch(self, batch: RowBatch) -> RowBatch:
+        """Return the batch with this enricher's columns added."""
+        return batch.with_columns(self.enrich_columns(batch))
+
+    def prefetch(self, batches: Iterable[RowBatch]) -> None:
+        """Optionally warm up lookups for all batches before enrich is called."""
+
     @property
     def header_fields(self) -> list:
         """Return the list of new header fields this enricher adds."""
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
@@ -0,0 +1,76 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Optional, Pattern
+
+from .ipenricher import IpEnricher
+
+logger = logging.getLogger(__name__)
+
+NAME_FIELDS = ["FIRST_NAME", "LAST_NAME", "USER_NAME"]
+MATCH_FIELD = "MATCHES_NAME_PATTERN"
+
+# An optional ".", "_", "+" or "-" between the names and before the digits, the
+# same class as in matches_name_pattern.sql
+SEPARATOR = r"[._+-]?"
+
+
+@lru_cache(maxsize=4096)
+def _name_pattern(first_name: str, last_name: str) -> Pattern[str]:
+    """Compile the pattern for one first/last name pair, once per pair."""
+    first, last = re.escape(first_name), re.escape(last_name)
+    return re.compile(
+        rf"(?:{first}{SEPARATOR}{last}|{last}{SEPARATOR}{first}){SEPARATOR}[0-9]*@.+",
+        re.IGNORECASE,
+    )
+
+
+def matches_name_pattern(
+    first_name: Optional[str], last_name: Optional[str], user_name: Optional[str]
+) -> str:
+    """Return "True" if the username is the user's names followed by digits and a domain.
+
+    Matches "first.last42@..." and "last_first@...", ignoring case. A missing
+    name counts as empty, like a NULL concatenated in Oracle. This is the same
+    check as the REGEXP_LIKE calls in matches_name_pattern.sql.
+    """
+    if not user_name:
+        return "False"
+    pattern = _name_pattern(first_name or "", last_name or "")
+    return "True" if pattern.fullmatch(user_name) else "False"
+
+
+class NamePatternEnricher(IpEnricher):
+    def __init__(self, cache_size: int = 100000):
+        """Classify usernames built from the user's names, like the SQL check.
+
+        Replaces the FIRST_NAME, LAST_NAME and USER_NAME columns with
+        MATCHES_NAME_PATTERN, so they are not written to the output.
+        """
+        self._classify = lru_cache(maxsize=cache_size)(matches_name_pattern)
+
+    @property
+    def header_fields(self):
+        return [MATCH_FIELD]
+
+    def enrich_columns(self, batch):
+        return {
+            MATCH_FIELD: [
+                self._classify(first, last, user)
+                for first, last, user in zip(
+                    *(batch.column(field) for field in NAME_FIELDS)
+                )
+            ]
+        }
+
+    def enrich_batch(self, batch):
+        return batch.replace_columns(NAME_FIELDS, self.enrich_columns(batch))
+
+    def enrich(self, row):
+        row[MATCH_FIELD] = self._classify(
+            *(row.pop(field, None) for field in NAME_FIELDS)
+        )
+        return row
+
+    def cache_info(self):
+        return self._classify.cache_info()
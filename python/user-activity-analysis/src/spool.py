@@ -0,0 +1,26 @@
+import pickle
+import tempfile
+from typing import Any, Iterator
+
+
+class RowSpool:
+    def __init__(self) -> None:
+        """Spool rows or batches to an anonymous temporary file so they can be replayed."""
+        self._file = tempfile.TemporaryFile()
+        self.count = 0
+
+    def append(self, item: Any) -> None:
+        """Write a row or batch to the end of the spool."""
+        pickle.dump(item, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.count += 1
+
+    def __iter__(self) -> Iterator[Any]:
+        """Replay spooled items from the beginning."""
+        self._file.flush()
+        self._file.seek(0)
+        for _ in range(self.count):
+            yield pickle.load(self._file)
+
+    def close(self) -> None:
+        """Close and delete the temporary file."""
+        self._file.close()
@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+import pytest
+
+from src.ip_lookup.backend import GeolocationBackend, create_geolocation_backend
+from src.ip_lookup.geolocation import GeolocationClient
+
+
+def test_backend_get_geolocation_not_implemented():
+    with pytest.raises(NotImplementedError):
+        GeolocationBackend().get_geolocation("1.2.3.4")
+
+
+def test_create_defaults_to_ipapi():
+    backend = create_geolocation_backend({"ip_lookup_api_key": "key"})
+    assert isinstance(backend, GeolocationClient)
+
+
+def test_create_mmdb_backend():
+    with patch("src.ip_lookup.mmdb.MmdbGeolocationClient.from_config") as mock_from_config:
+        backend = create_geolocation_backend(
+            {"ip_lookup_backend": "MMDB", "ip_lookup_mmdb_path": "city.mmdb"}
+        )
+        assert backend is mock_from_config.return_value
+
+
+def test_create_unknown_backend():
+    with pytest.raises(ValueError) as exc_info:
+        create_geolocation_backend({"ip_lookup_backend": "carrier-pigeon"})
+    assert "Unknown IP_LOOKUP_BACKEND" in str(exc_info.value)
@@ -0,0 +1,153 @@
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from src.ip_lookup.cache import GeolocationCache
+
+GEO = {
+    "city": "Ann Arbor",
+    "region": "Michigan",
+    "country": "United States",
+    "postal": "48109",
+    "org": "University of Michigan",
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Fixture for a GeolocationCache backed by a temp file."""
+    geo_cache = GeolocationCache(str(tmp_path / "geo.sqlite3"), max_entries=2)
+    yield geo_cache
+    geo_cache.close()
+
+
+def test_get_miss_then_hit(cache):
+    assert cache.get("1.2.3.4") is None
+    cache.set("1.2.3.4", GEO)
+    assert cache.get("1.2.3.4") == GEO
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_persists_between_instances(tmp_path):
+    path = str(tmp_path / "geo.sqlite3")
+    first = GeolocationCache(path)
+    first.set("1.2.3.4", GEO)
+    first.close()
+
+    second = GeolocationCache(path)
+    assert second.get("1.2.3.4") == GEO
+    second.close()
+
+
+def test_stale_entry_is_a_miss(cache):
+    with patch("src.ip_lookup.cache.time.time", return_value=1000.0):
+        cache.set("1.2.3.4", GEO)
+    with patch("src.ip_lookup.cache.time.time", return_value=1000.0 + cache.ttl_seconds + 1):
+        assert cache.get("1.2.3.4") is None
+    assert cache.misses == 1
+
+
+def test_negative_entry_uses_negative_ttl(cache):
+    with patch("src.ip_lookup.cache.time.time", return_value=1000.0):
+        cache.set("1.2.3.4", {key: "Unknown" for key in GEO}, negative=True)
+    with patch("src.ip_lookup.cache.time.time", return_value=1001.0):
+        assert cache.get("1.2.3.4")["city"] == "Unknown"
+    with patch(
+        "src.ip_lookup.cache.time.time",
+        return_value=1000.0 + cache.negative_ttl_seconds + 1,
+    ):
+        assert cache.get("1.2.3.4") is None
+
+
+def test_evicts_least_recently_used(cache):
+    with patch("src.ip_lookup.cache.time.time", return_value=1.0):
+        cache.set("1.1.1.1", GEO)
+    with patch("src.ip_lookup.cache.time.time", return_value=2.0):
+        cache.set("2.2.2.2", GEO)
+    with patch("src.ip_lookup.cache.time.time", return_value=3.0):
+        cache.get("1.1.1.1")
+    with patch("src.ip_lookup.cache.time.time", return_value=4.0):
+        cache.set("3.3.3.3", GEO)
+        assert cache.get("2.2.2.2") is None
+        assert cache.get("1.1.1.1") == GEO
+        assert cache.get("3.3.3.3") == GEO
+    assert cache.evictions == 1
+
+
+def test_from_config_without_path_returns_none():
+    assert GeolocationCache.from_config({"ip_lookup_api_key": "key"}) is None
+
+
+def test_from_config_with_path(tmp_path):
+    geo_cache = GeolocationCache.from_config(
+        {
+            "geo_cache_path": str(tmp_path / "geo.sqlite3"),
+            "geo_cache_ttl_days": "2",
+            "geo_cache_negative_ttl_hours": "3",
+            "geo_cache_max_entries": "10",
+        }
+    )
+    assert geo_cache is not None
+    assert geo_cache.ttl_seconds == 2 * 24 * 60 * 60
+    assert geo_cache.negative_ttl_seconds == 3 * 60 * 60
+    assert geo_cache.max_entries == 10
+    geo_cache.close()
+
+
+def accessed_at(path, ip):
+    conn = sqlite3.connect(path)
+    (value,) = conn.execute("SELECT accessed_at FROM geolocation WHERE ip = ?", (ip,)).fetchone()
+    conn.close()
+    return value
+
+
+def test_hits_write_access_times_on_close(tmp_path):
+    path = str(tmp_path / "geo.sqlite3")
+    geo_cache = GeolocationCache(path)
+    with patch("src.ip_lookup.cache.time.time", return_value=1.0):
+        geo_cache.set("1.2.3.4", GEO)
+    statements = []
+    geo_cache._conn.set_trace_callback(statements.append)
+    with patch("src.ip_lookup.cache.time.time", return_value=2.0):
+        for _ in range(3):
+            assert geo_cache.get("1.2.3.4") == GEO
+
+    assert all(statement.startswith("SELECT") for statement in statements)
+    assert accessed_at(path, "1.2.3.4") == 1.0
+    geo_cache.close()
+    assert accessed_at(path, "1.2.3.4") == 2.0
+
+
+def test_hits_write_access_times_in_batches(tmp_path):
+    path = str(tmp_path / "geo.sqlite3")
+    geo_cache = GeolocationCache(path)
+    geo_cache.set("1.2.3.4", GEO)
+    geo_cache.set("5.6.7.8", GEO)
+    with patch("src.ip_lookup.cache.ACCESS_FLUSH_SIZE", 2), patch(
+        "src.ip_lookup.cache.time.time", return_value=5.0
+    ):
+        geo_cache.get("1.2.3.4")
+        assert accessed_at(path, "1.2.3.4") != 5.0
+        geo_cache.get("5.6.7.8")
+    assert accessed_at(path, "1.2.3.4") == 5.0
+    assert accessed_at(path, "5.6.7.8") == 5.0
+    geo_cache.close()
+
+
+def test_set_tracks_the_row_count_without_counting(tmp_path):
+    path = str(tmp_path / "geo.sqlite3")
+    first = GeolocationCache(path, max_entries=2)
+    first.set("1.1.1.1", GEO)
+    first.close()
+
+    second = GeolocationCache(path, max_entries=2)
+    statements = []
+    second._conn.set_trace_callback(statements.append)
+    second.set("1.1.1.1", GEO)
+    second.set("2.2.2.2", GEO)
+    assert second.evictions == 0
+    second.set("3.3.3.3", GEO)
+    assert second.evictions == 1
+    assert not any("COUNT" in statement for statement in statements)
+    second.close()
@@ -1,9 +1,12 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 import pytest
 import requests
 
 from src.ip_lookup.geolocation import GeolocationClient
+from src.ip_lookup.range_index import IpRangeIndex
 
 
 @pytest.fixture
@@ -31,7 +34,9 @@ def test_get_geolocation_success(geo_client):
         "postal": "94105",
         "org": "ExampleOrg",
     }
-    with patch("requests.get") as mock_get, patch("time.sleep") as mock_sleep:
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ) as mock_acquire:
         mock_get.return_value = mock_response
         result = geo_client.get_geolocation("1.2.3.4")
         assert result == {
@@ -42,21 +47,25 @@ def test_get_geolocation_success(geo_client):
             "org": "ExampleOrg",
         }
         mock_get.assert_called_once_with(
-            "https://ipapi.co/1.2.3.4/json/?key=test_api_key"
+            "https://ipapi.co/1.2.3.4/json/?key=test_api_key", timeout=10.0
         )
-        mock_sleep.assert_called_once_with(0.1)
+        mock_acquire.assert_called_once()
 
-    # Test cache hit (should not call requests.get or time.sleep again)
-    with patch("requests.get") as mock_get, patch("time.sleep") as mock_sleep:
+    # Test cache hit (should not call the API or the rate limiter again)
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ) as mock_acquire:
         cached_result = geo_client.get_geolocation("1.2.3.4")
         assert cached_result == result
         mock_get.assert_not_called()
-        mock_sleep.assert_not_called()
+        mock_acquire.assert_not_called()
 
 
 def test_get_geolocation_request_error(geo_client):
     """Test geolocation failure returns default values."""
-    with patch("requests.get") as mock_get, patch("time.sleep") as mock_sleep:
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ) as mock_acquire:
         mock_get.side_effect = requests.RequestException("Network error")
         result = geo_client.get_geolocation("1.2.3.4")
         assert result == {
@@ -67,12 +76,14 @@ def test_get_geolocation_request_error(geo_client):
             "org": "Unknown",
         }
         mock_get.assert_called_once_with(
-            "https://ipapi.co/1.2.3.4/json/?key=test_api_key"
+            "https://ipapi.co/1.2.3.4/json/?key=test_api_key", timeout=10.0
         )
-        mock_sleep.assert_called_once_with(0.1)
+        mock_acquire.assert_called_once()
 
     # Test cache hit for failed lookup
-    with patch("requests.get") as mock_get, patch("time.sleep") as mock_sleep:
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ) as mock_acquire:
         cached_result = geo_client.get_geolocation("1.2.3.4")
         assert cached_result == {
             "city": "Unknown",
@@ -82,12 +93,14 @@ def test_get_geolocation_request_error(geo_client):
             "org": "Unknown",
         }
         mock_get.assert_not_called()
-        mock_sleep.assert_not_called()
+        mock_acquire.assert_not_called()
 
 
 def test_get_geolocation_empty_ip(geo_client):
     """Test geolocation lookup with empty IP returns Unknowns and does not cache."""
-    with patch("requests.get") as mock_get, patch("time.sleep") as mock_sleep:
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ) as mock_acquire:
         result = geo_client.get_geolocation("")
         assert result == {
             "city": "Unknown",
@@ -97,7 +110,7 @@ def test_get_geolocation_empty_ip(geo_client):
             "org": "Unknown",
         }
         mock_get.assert_not_called()
-        mock_sleep.assert_not_called()
+        mock_acquire.assert_not_called()
     # Should not be cached
     assert "" not in geo_client._cache
 
@@ -112,7 +125,9 @@ def test_get_geolocations_success(geo_client):
         "postal": "94105",
         "org": "ExampleOrg",
     }
-    with patch("requests.get") as mock_get, patch("time.sleep") as mock_sleep:
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ) as mock_acquire:
         mock_get.return_value = mock_response
         result = geo_client.get_geolocations(["1.2.3.4", "5.6.7.8"])
         assert result == {
@@ -131,24 +146,181 @@ def test_get_geolocations_success(geo_client):
                 "org": "ExampleOrg",
             },
         }
-        mock_get.assert_any_call("https://ipapi.co/1.2.3.4/json/?key=test_api_key")
-        mock_get.assert_any_call("https://ipapi.co/5.6.7.8/json/?key=test_api_key")
+        mock_get.assert_any_call(
+            "https://ipapi.co/1.2.3.4/json/?key=test_api_key", timeout=10.0
+        )
+        mock_get.assert_any_call(
+            "https://ipapi.co/5.6.7.8/json/?key=test_api_key", timeout=10.0
+        )
         assert mock_get.call_count == 2
-        assert mock_sleep.call_count == 2
+        assert mock_acquire.call_count == 2
 
     # Test cache hit for both IPs
-    with patch("requests.get") as mock_get, patch("time.sleep") as mock_sleep:
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ) as mock_acquire:
         result = geo_client.get_geolocations(["1.2.3.4", "5.6.7.8"])
         assert result["1.2.3.4"]["city"] == "San Francisco"
         assert result["5.6.7.8"]["city"] == "San Francisco"
         mock_get.assert_not_called()
-        mock_sleep.assert_not_called()
+        mock_acquire.assert_not_called()
 
 
 def test_get_geolocations_empty(geo_client):
     """Test geolocation lookup with empty IP list."""
-    with patch("requests.get") as mock_get, patch("time.sleep") as mock_sleep:
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ) as mock_acquire:
         result = geo_client.get_geolocations([])
         assert result == {}
         mock_get.assert_not_called()
-        mock_sleep.assert_not_called()
\ No newline at end of file
+        mock_acquire.assert_not_called()
+
+def test_get_geolocation_uses_persistent_cache(tmp_path):
+    """Test lookups are served from the persistent cache across clients."""
+    config = {
+        "ip_lookup_api_key": "test_api_key",
+        "geo_cache_path": str(tmp_path / "geo.sqlite3"),
+    }
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"city": "Ann Arbor"}
+    with patch("requests.Session.get") as mock_get, patch("time.sleep"):
+        mock_get.return_value = mock_response
+        first = GeolocationClient.from_config(config)
+        first.get_geolocation("1.2.3.4")
+        first.close()
+        mock_get.assert_called_once()
+
+    with patch("requests.Session.get") as mock_get, patch("time.sleep") as mock_sleep:
+        second = GeolocationClient.from_config(config)
+        result = second.get_geolocation("1.2.3.4")
+        assert result["city"] == "Ann Arbor"
+        mock_get.assert_not_called()
+        mock_sleep.assert_not_called()
+        assert second.persistent_cache.stats()["hits"] == 1
+        second.close()
+
+
+def test_get_geolocation_retries_rate_limited_response(geo_client):
+    """Test 429 responses are retried with backoff before succeeding."""
+    throttled = MagicMock(status_code=429, headers={"Retry-After": "2"})
+    ok = MagicMock(status_code=200)
+    ok.json.return_value = {"city": "Ann Arbor"}
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ) as mock_acquire, patch("time.sleep") as mock_sleep:
+        mock_get.side_effect = [throttled, ok]
+        result = geo_client.get_geolocation("1.2.3.4")
+        assert result["city"] == "Ann Arbor"
+        assert mock_get.call_count == 2
+        assert mock_acquire.call_count == 2
+        mock_sleep.assert_called_once_with(2.0)
+
+
+@pytest.mark.parametrize("retry_after, expected", [
+    ("2", 2.0),
+    ("86400", 30.0),
+    ("-5", 0.0),
+])
+def test_backoff_clamps_retry_after(geo_client, retry_after, expected):
+    """Test Retry-After is honoured within [0, max_backoff]."""
+    assert geo_client._backoff(0, retry_after) == expected
+
+
+@pytest.mark.parametrize("retry_after", ["nan", "inf", "-inf", "Wed, 21 Oct 2015 07:28:00 GMT"])
+def test_backoff_ignores_unusable_retry_after(geo_client, retry_after):
+    """Test a non-finite or non-numeric Retry-After falls back to jittered backoff."""
+    with patch("random.uniform", return_value=1.0):
+        assert geo_client._backoff(2, retry_after) == geo_client.backoff_base * 4
+
+
+def test_backoff_is_capped(geo_client):
+    """Test the exponential backoff never exceeds max_backoff."""
+    with patch("random.uniform", return_value=1.5):
+        assert geo_client._backoff(20) == geo_client.max_backoff
+
+
+def test_get_geolocation_retries_with_negative_retry_after(geo_client):
+    """Test a negative Retry-After from the server retries without sleeping."""
+    throttled = MagicMock(status_code=429, headers={"Retry-After": "-1"})
+    ok = MagicMock(status_code=200)
+    ok.json.return_value = {"city": "Ann Arbor"}
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ), patch("time.sleep") as mock_sleep:
+        mock_get.side_effect = [throttled, ok]
+        assert geo_client.get_geolocation("1.2.3.4")["city"] == "Ann Arbor"
+        mock_sleep.assert_called_once_with(0.0)
+
+
+def test_get_geolocation_gives_up_after_max_retries(geo_client):
+    """Test persistent 5xx responses fall back to Unknown values."""
+    unavailable = MagicMock(status_code=503, headers={})
+    unavailable.raise_for_status.side_effect = requests.HTTPError("503")
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ), patch("time.sleep") as mock_sleep:
+        mock_get.return_value = unavailable
+        result = geo_client.get_geolocation("1.2.3.4")
+        assert result["city"] == "Unknown"
+        assert mock_get.call_count == geo_client.max_retries + 1
+        assert mock_sleep.call_count == geo_client.max_retries
+
+
+def test_get_geolocations_deduplicates_ips(geo_client):
+    """Test duplicate IPs in a batch are looked up once."""
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"city": "Ann Arbor"}
+    with patch.object(geo_client.session, "get") as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ):
+        mock_get.return_value = mock_response
+        result = geo_client.get_geolocations(["1.2.3.4", "1.2.3.4", "5.6.7.8"])
+        assert list(result) == ["1.2.3.4", "5.6.7.8"]
+        assert mock_get.call_count == 2
+
+
+def test_get_geolocation_shares_inflight_request(geo_client):
+    """Test concurrent lookups of the same IP wait on one in-flight request."""
+    started = threading.Event()
+    release = threading.Event()
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"city": "Ann Arbor"}
+
+    def slow_get(*args, **kwargs):
+        started.set()
+        release.wait(timeout=5)
+        return mock_response
+
+    with patch.object(geo_client.session, "get", side_effect=slow_get) as mock_get, patch.object(
+        geo_client.rate_limiter, "acquire"
+    ):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(geo_client.get_geolocation, "1.2.3.4")
+            started.wait(timeout=5)
+            second = executor.submit(geo_client.get_geolocation, "1.2.3.4")
+            release.set()
+            assert first.result()["city"] == "Ann Arbor"
+            assert second.result()["city"] == "Ann Arbor"
+        mock_get.assert_called_once()
+
+
+def test_get_geolocation_reuses_network_block():
+    """Test an IP in a previously seen network block is answered locally."""
+    client = GeolocationClient(
+        "https://ipapi.co", "test_api_key", range_index=IpRangeIndex()
+    )
+    mock_response = MagicMock()
+    mock_response.json.return_value = {
+        "city": "Ann Arbor",
+        "network": "141.211.0.0/16",
+    }
+    with patch.object(client.session, "get") as mock_get, patch.object(
+        client.rate_limiter, "acquire"
+    ):
+        mock_get.return_value = mock_response
+        client.get_geolocation("141.211.0.1")
+        result = client.get_geolocation("141.211.99.99")
+        assert result["city"] == "Ann Arbor"
+        mock_get.assert_called_once()
+        assert client.range_index.avoided_lookups == 1
@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock, patch
+
+import maxminddb
+import pytest
+
+from src.ip_lookup.mmdb import MmdbGeolocationClient
+
+CITY_RECORD = {
+    "city": {"names": {"en": "Ann Arbor"}},
+    "subdivisions": [{"names": {"en": "Michigan"}}],
+    "country": {"names": {"en": "United States"}},
+    "postal": {"code": "48109"},
+}
+ASN_RECORD = {"autonomous_system_organization": "University of Michigan"}
+
+
+@pytest.fixture
+def readers():
+    """Fixture patching maxminddb.open_database with City and ASN readers."""
+    city_reader = MagicMock()
+    asn_reader = MagicMock()
+    city_reader.get.return_value = CITY_RECORD
+    asn_reader.get.return_value = ASN_RECORD
+    with patch(
+        "src.ip_lookup.mmdb.maxminddb.open_database",
+        side_effect=[city_reader, asn_reader],
+    ) as mock_open:
+        yield mock_open, city_reader, asn_reader
+
+
+def test_get_geolocation_maps_records(readers):
+    mock_open, city_reader, _ = readers
+    client = MmdbGeolocationClient("city.mmdb", "asn.mmdb")
+    result = client.get_geolocation("141.211.0.1")
+    assert result == {
+        "city": "Ann Arbor",
+        "region": "Michigan",
+        "country": "United States",
+        "postal": "48109",
+        "org": "University of Michigan",
+    }
+    mock_open.assert_any_call("city.mmdb", maxminddb.MODE_MMAP)
+
+    # Cached on second lookup
+    client.get_geolocation("141.211.0.1")
+    city_reader.get.assert_called_once()
+
+
+def test_get_geolocation_not_found(readers):
+    _, city_reader, asn_reader = readers
+    city_reader.get.return_value = None
+    asn_reader.get.return_value = None
+    client = MmdbGeolocationClient("city.mmdb", "asn.mmdb")
+    assert set(client.get_geolocation("10.0.0.1").values()) == {"Unknown"}
+
+
+def test_get_geolocation_invalid_ip(readers):
+    _, city_reader, _ = readers
+    city_reader.get.side_effect = ValueError("not an IP")
+    client = MmdbGeolocationClient("city.mmdb", "asn.mmdb")
+    assert set(client.get_geolocation("not-an-ip").values()) == {"Unknown"}
+
+
+def test_get_geolocation_empty_ip(readers):
+    _, city_reader, _ = readers
+    client = MmdbGeolocationClient("city.mmdb", "asn.mmdb")
+    assert set(client.get_geolocation("").values()) == {"Unknown"}
+    city_reader.get.assert_not_called()
+
+
+def test_from_config_requires_path():
+    with pytest.raises(ValueError):
+        MmdbGeolocationClient.from_config({"ip_lookup_backend": "mmdb"})
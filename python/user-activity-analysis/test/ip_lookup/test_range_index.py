@@ -0,0 +1,80 @@
+import pytest
+
+from src.ip_lookup.range_index import IpRangeIndex
+
+GEO = {
+    "city": "Ann Arbor",
+    "region": "Michigan",
+    "country": "United States",
+    "postal": "48109",
+    "org": "University of Michigan",
+}
+
+
+def test_lookup_inside_network():
+    index = IpRangeIndex()
+    assert index.add_network("141.211.0.0/16", GEO)
+    assert index.lookup("141.211.4.5") == GEO
+    assert index.lookup("141.212.0.1") is None
+    assert index.avoided_lookups == 1
+
+
+def test_lookup_ipv6_network():
+    index = IpRangeIndex()
+    assert index.add_network("2607:f018::/48", GEO)
+    assert index.lookup("2607:f018:0:1::1") == GEO
+    assert index.lookup("2607:f019::1") is None
+
+
+def test_rejects_coarse_and_overlapping_networks():
+    index = IpRangeIndex()
+    assert not index.add_network("10.0.0.0/8", GEO)
+    assert index.add_network("10.1.0.0/16", GEO)
+    assert not index.add_network("10.1.2.0/24", GEO)
+    assert not index.add_network("not-a-network", GEO)
+    assert len(index) == 1
+
+
+def test_lookup_invalid_ip():
+    assert IpRangeIndex().lookup("not-an-ip") is None
+
+
+def test_add_range_rejects_reversed_bounds():
+    with pytest.raises(ValueError):
+        IpRangeIndex().add_range("10.0.0.9", "10.0.0.1", GEO)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "ranges.csv")
+    index = IpRangeIndex(path)
+    index.add_network("141.211.0.0/16", GEO)
+    index.add_network("2607:f018::/48", GEO)
+    index.close()
+
+    reloaded = IpRangeIndex.from_config({"ip_range_index_path": path})
+    assert reloaded is not None
+    assert len(reloaded) == 2
+    assert reloaded.lookup("141.211.200.1") == GEO
+    assert reloaded.lookup("2607:f018::5") == GEO
+
+
+def test_bulk_load_seed_csv(tmp_path):
+    seed = tmp_path / "seed.csv"
+    seed.write_text(
+        "network,start_ip,end_ip,city,region,country,postal,org\n"
+        "35.0.0.0/16,,,Ann Arbor,Michigan,United States,48109,UMich\n"
+        ",8.8.8.0,8.8.8.255,Mountain View,California,United States,94043,Google\n"
+    )
+    index = IpRangeIndex.from_config(
+        {
+            "ip_range_index_path": str(tmp_path / "ranges.csv"),
+            "ip_range_seed_path": str(seed),
+        }
+    )
+    assert index is not None
+    assert index.lookup("35.0.1.1")["org"] == "UMich"
+    assert index.lookup("8.8.8.8")["city"] == "Mountain View"
+
+
+def test_from_config_without_path_returns_none():
+    assert IpRangeIndex.from_config({}) is None
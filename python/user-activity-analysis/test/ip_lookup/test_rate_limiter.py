@@ -0,0 +1,32 @@
+from unittest.mock import patch
+
+import pytest
+
+from src.ip_lookup.rate_limiter import TokenBucket
+
+
+def test_acquire_within_burst_does_not_sleep():
+    bucket = TokenBucket(rate=1, capacity=3)
+    with patch("src.ip_lookup.rate_limiter.time.sleep") as mock_sleep:
+        for _ in range(3):
+            bucket.acquire()
+        mock_sleep.assert_not_called()
+
+
+def test_acquire_sleeps_when_bucket_is_empty():
+    clock = [100.0]
+    with patch("src.ip_lookup.rate_limiter.time.monotonic", side_effect=lambda: clock[0]):
+        bucket = TokenBucket(rate=2, capacity=1)
+        bucket.acquire()
+
+        def advance(seconds):
+            clock[0] += seconds
+
+        with patch("src.ip_lookup.rate_limiter.time.sleep", side_effect=advance) as mock_sleep:
+            bucket.acquire()
+            mock_sleep.assert_called_once_with(0.5)
+
+
+def test_invalid_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
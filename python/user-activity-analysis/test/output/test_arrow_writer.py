@@ -0,0 +1,70 @@
+import datetime
+import decimal
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.batch import RowBatch
+from src.output.arrow_writer import ArrowIpcBatchWriter, ParquetBatchWriter
+from src.output.buffered_output import BufferedOutput
+
+COLUMNS = ["STUDY_ID", "INTEREST_PERIOD_MINS", "SHOWED_INTEREST_DATE", "INTEREST_CITY"]
+BATCHES = [
+    RowBatch(
+        COLUMNS,
+        [(decimal.Decimal(4739), decimal.Decimal("12.5"), datetime.datetime(2025, 5, 1), "Ann Arbor")],
+    ),
+    RowBatch(COLUMNS, [(4740, 3, None, None), (4741, None, datetime.datetime(2025, 5, 2), "Detroit")]),
+]
+EXPECTED = {
+    "STUDY_ID": [4739, 4740, 4741],
+    "INTEREST_PERIOD_MINS": [12.5, 3.0, None],
+    "SHOWED_INTEREST_DATE": [datetime.datetime(2025, 5, 1), None, datetime.datetime(2025, 5, 2)],
+    "INTEREST_CITY": ["Ann Arbor", None, "Detroit"],
+}
+
+
+def _write(writer_cls, **kwargs):
+    stream = io.BytesIO()
+    output = BufferedOutput(stream)
+    writer = writer_cls(output, **kwargs)
+    for batch in BATCHES:
+        writer.write_batch(batch)
+    writer.close()
+    output.close()
+    return stream.getvalue(), output
+
+
+def test_parquet_keeps_types():
+    data, output = _write(ParquetBatchWriter, row_group_size=2)
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+    table = parquet_file.read()
+
+    assert table.schema.field("STUDY_ID").type == pa.int64()
+    assert table.schema.field("INTEREST_PERIOD_MINS").type == pa.float64()
+    assert pa.types.is_timestamp(table.schema.field("SHOWED_INTEREST_DATE").type)
+    assert table.to_pydict() == EXPECTED
+    assert parquet_file.metadata.num_row_groups == 2
+    assert output.rows_written == 3
+
+
+def test_parquet_compression():
+    data, _ = _write(ParquetBatchWriter, compression="snappy")
+    metadata = pq.ParquetFile(io.BytesIO(data)).metadata
+    assert metadata.row_group(0).column(0).compression == "SNAPPY"
+
+
+def test_arrow_ipc_stream():
+    data, output = _write(ArrowIpcBatchWriter)
+    table = pa.ipc.open_stream(data).read_all()
+    assert table.schema.field("STUDY_ID").type == pa.int64()
+    assert table.to_pydict() == EXPECTED
+    assert output.rows_written == 3
+
+
+def test_no_batches_writes_nothing():
+    stream = io.BytesIO()
+    writer = ParquetBatchWriter(BufferedOutput(stream))
+    writer.close()
+    assert stream.getvalue() == b""
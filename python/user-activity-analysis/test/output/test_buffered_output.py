@@ -0,0 +1,65 @@
+import io
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.output.buffered_output import BufferedOutput, FlushPolicy
+
+
+@pytest.mark.parametrize(
+    "spec, every_rows, every_ms",
+    [("end", None, None), ("live", 1, None), ("rows:500", 500, None), ("ms:250", None, 250.0)],
+)
+def test_parse_flush_policy(spec, every_rows, every_ms):
+    policy = FlushPolicy.parse(spec)
+    assert policy.every_rows == every_rows
+    assert policy.every_ms == every_ms
+
+
+@pytest.mark.parametrize("spec", ["", "rows", "rows:0", "rows:x", "ms:-1", "live:1", "sometimes"])
+def test_parse_invalid_flush_policy(spec):
+    with pytest.raises(ValueError):
+        FlushPolicy.parse(spec)
+
+
+def test_end_policy_only_flushes_on_close():
+    buffer = io.BytesIO()
+    stream = MagicMock(wraps=buffer)
+    output = BufferedOutput(stream, FlushPolicy())
+    output.write(b"a,b\r\n")
+    output.add_rows(1)
+    stream.write.assert_not_called()
+    stream.flush.assert_not_called()
+
+    stats = output.close()
+    assert buffer.getvalue() == b"a,b\r\n"
+    stream.flush.assert_called_once()
+    assert stats["rows"] == 1
+    assert stats["bytes"] == 5
+
+
+def test_rows_policy_flushes_every_n_rows():
+    stream = MagicMock(wraps=io.BytesIO())
+    output = BufferedOutput(stream, FlushPolicy(every_rows=2))
+    output.write(b"x")
+    output.add_rows(1)
+    stream.flush.assert_not_called()
+    output.write(b"y")
+    output.add_rows(1)
+    stream.flush.assert_called_once()
+
+
+def test_ms_policy_flushes_after_interval():
+    stream = MagicMock(wraps=io.BytesIO())
+    output = BufferedOutput(stream, FlushPolicy(every_ms=0))
+    output.write(b"x")
+    output.add_rows(1)
+    stream.flush.assert_called_once()
+
+
+def test_full_buffer_is_written_through_without_flush():
+    stream = MagicMock(wraps=io.BytesIO())
+    output = BufferedOutput(stream, FlushPolicy(), buffer_size=4)
+    output.write(b"abcdef")
+    stream.write.assert_called_once()
+    stream.flush.assert_not_called()
@@ -0,0 +1,21 @@
+import io
+
+from src.batch import RowBatch
+from src.output.buffered_output import BufferedOutput
+from src.output.csv_writer import CsvBatchWriter
+
+
+def test_write_batches_with_single_header():
+    stream = io.BytesIO()
+    output = BufferedOutput(stream)
+    writer = CsvBatchWriter(output)
+    writer.write_batch(RowBatch(["ID", "CITY"], [(1, "Ann Arbor"), (2, None)]))
+    writer.write_batch(RowBatch(["ID", "CITY"], [(3, "Detroit, MI")]))
+    writer.close()
+    output.close()
+
+    assert stream.getvalue() == (
+        b"ID,CITY\r\n1,Ann Arbor\r\n2,\r\n3,\"Detroit, MI\"\r\n"
+    )
+    assert output.rows_written == 3
+    assert output.bytes_written == len(stream.getvalue())
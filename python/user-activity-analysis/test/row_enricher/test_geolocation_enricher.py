@@ -1,5 +1,6 @@
 import pytest
 from unittest.mock import MagicMock
+from src.batch import RowBatch
 from src.row_enricher.geolocation_enricher import GeolocationEnricher, GEO_FIELDS
 
 @pytest.fixture
@@ -57,4 +58,45 @@ def test_header_fields_property(mock_geo_client):
     enricher = GeolocationEnricher(mock_geo_client)
     assert isinstance(enricher.header_fields, list)
     for field in GEO_FIELDS:
-        assert field in enricher.header_fields
\ No newline at end of file
+        assert field in enricher.header_fields
+
+def test_prefetch_resolves_distinct_ips(mock_geo_client):
+    enricher = GeolocationEnricher(mock_geo_client)
+    batches = [
+        RowBatch(
+            ["INTEREST_SOURCE_ADDRESS", "ACTIVATION_SOURCE_ADDRESS"],
+            [("2.2.2.2", "1.1.1.1"), ("1.1.1.1", None)],
+        ),
+        RowBatch(["INTEREST_SOURCE_ADDRESS", "ACTIVATION_SOURCE_ADDRESS"], [("", "2.2.2.2")]),
+    ]
+    enricher.prefetch(batches)
+    mock_geo_client.get_geolocations.assert_called_once_with(["1.1.1.1", "2.2.2.2"])
+
+def test_enrich_columns_matches_enrich(mock_geo_client):
+    mock_geo_client.get_geolocations.side_effect = lambda ips: {
+        ip: mock_geo_client.get_geolocation(ip) for ip in ips
+    }
+    enricher = GeolocationEnricher(mock_geo_client)
+    columns = ["INTEREST_SOURCE_ADDRESS", "ACTIVATION_SOURCE_ADDRESS"]
+    rows = [("1.1.1.1", "2.2.2.2"), ("3.3.3.3", "3.3.3.3"), ("4.4.4.4", ""), (None, None)]
+    batch = RowBatch(columns, rows)
+
+    result = enricher.enrich_columns(batch)
+
+    assert list(result) == GEO_FIELDS
+    for i, row in enumerate(batch.dicts()):
+        expected = enricher.enrich(row)
+        assert {field: result[field][i] for field in GEO_FIELDS} == {
+            field: expected[field] for field in GEO_FIELDS
+        }
+
+def test_enrich_columns_looks_up_each_ip_once(mock_geo_client):
+    mock_geo_client.get_geolocations.return_value = {}
+    enricher = GeolocationEnricher(mock_geo_client)
+    batch = RowBatch(
+        ["INTEREST_SOURCE_ADDRESS", "ACTIVATION_SOURCE_ADDRESS"],
+        [("1.1.1.1", "2.2.2.2"), ("1.1.1.1", "1.1.1.1")],
+    )
+    enricher.enrich_columns(batch)
+    (ips,), _ = mock_geo_client.get_geolocations.call_args
+    assert sorted(ips) == ["1.1.1.1", "2.2.2.2"]
@@ -1,4 +1,5 @@
 import pytest
+from src.batch import RowBatch
 from src.row_enricher.ipenricher import IpEnricher
 
 def test_ipenricher_enrich_not_implemented():
@@ -9,4 +10,19 @@ def test_ipenricher_enrich_not_implemented():
 def test_ipenricher_header_fields_not_implemented():
     enricher = IpEnricher()
     with pytest.raises(NotImplementedError):
-        _ = enricher.header_fields
\ No newline at end of file
+        _ = enricher.header_fields
+
+def test_ipenricher_prefetch_is_a_noop():
+    enricher = IpEnricher()
+    assert enricher.prefetch([RowBatch(["INTEREST_SOURCE_ADDRESS"], [("1.1.1.1",)])]) is None
+
+def test_ipenricher_enrich_columns_falls_back_to_enrich():
+    class UpperEnricher(IpEnricher):
+        header_fields = ["NAME_UPPER"]
+
+        def enrich(self, row):
+            row["NAME_UPPER"] = row["NAME"].upper()
+            return row
+
+    batch = RowBatch(["NAME"], [("foo",), ("bar",)])
+    assert UpperEnricher().enrich_columns(batch) == {"NAME_UPPER": ["FOO", "BAR"]}
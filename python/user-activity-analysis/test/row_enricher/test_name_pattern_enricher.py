@@ -0,0 +1,85 @@
+import os
+import re
+import sqlite3
+
+import pytest
+from src.batch import RowBatch
+from src.row_enricher.name_pattern_enricher import NamePatternEnricher, matches_name_pattern
+
+QUERIES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "src", "queries")
+
+NAME_PATTERN_CASES = [
+    ("John", "Smith", "john.smith@example.com", "True"),
+    ("John", "Smith", "JohnSmith42@example.com", "True"),
+    ("John", "Smith", "smith_john7@example.com", "True"),
+    ("John", "Smith", "john-smith.99@example.com", "True"),
+    ("John", "Smith", "jsmith@example.com", "False"),
+    ("John", "Smith", "john.smith@", "False"),
+    ("John", "Smith", "john..smith@example.com", "False"),
+    ("J.", "O'Neil", "j.o'neil@example.com", "True"),
+    ("J.", "O'Neil", "jxo'neil@example.com", "False"),
+    ("John", None, "john12@example.com", "True"),
+    ("John", "Smith", None, "False"),
+]
+
+@pytest.mark.parametrize("first, last, user_name, expected", NAME_PATTERN_CASES)
+def test_matches_name_pattern(first, last, user_name, expected):
+    assert matches_name_pattern(first, last, user_name) == expected
+
+def test_enrich_batch_replaces_name_columns_in_place():
+    batch = RowBatch(
+        ["USER_ID", "FIRST_NAME", "LAST_NAME", "USER_NAME", "STUDY_ID"],
+        [
+            (1, "Ann", "Lee", "ann.lee1@example.com", 10),
+            (2, "Ann", "Lee", "someone@example.com", 10),
+            (3, "Ann", "Lee", "ann.lee1@example.com", 11),
+        ],
+    )
+    enricher = NamePatternEnricher()
+    result = enricher.enrich_batch(batch)
+    assert result.columns == ["USER_ID", "MATCHES_NAME_PATTERN", "STUDY_ID"]
+    assert result.rows == [(1, "True", 10), (2, "False", 10), (3, "True", 11)]
+    assert enricher.cache_info().hits == 1
+
+def test_enrich_row():
+    row = {"USER_ID": 1, "FIRST_NAME": "Ann", "LAST_NAME": "Lee", "USER_NAME": "lee+ann@x.org"}
+    assert NamePatternEnricher().enrich(row) == {"USER_ID": 1, "MATCHES_NAME_PATTERN": "True"}
+
+def sql_matches_name_pattern(first, last, user_name):
+    """Evaluate matches_name_pattern.sql in SQLite with Python's re as the regex engine.
+
+    The pattern and replacement literals in the SQL mean the same in POSIX ERE
+    and in re, so this reproduces what Oracle computes.
+    """
+    with open(os.path.join(QUERIES_DIR, "matches_name_pattern.sql")) as f:
+        expression = f.read()
+    conn = sqlite3.connect(":memory:")
+    conn.create_function(
+        "REGEXP_LIKE", 3,
+        lambda value, pattern, flags: None if value is None else bool(
+            re.search(pattern, value, re.IGNORECASE if "i" in flags else 0)
+        ),
+    )
+    conn.create_function(
+        "REGEXP_REPLACE", 3,
+        lambda value, pattern, replacement: re.sub(pattern, replacement, value),
+    )
+    # Oracle concatenates a NULL as an empty string, SQLite does not
+    row = conn.execute(
+        f"SELECT {expression} FROM (SELECT ? AS first_name, ? AS last_name, ? AS user_name) au",
+        (first or "", last or "", user_name),
+    ).fetchone()
+    conn.close()
+    return row[0]
+
+@pytest.mark.parametrize("first, last, user_name", [
+    case[:3] for case in NAME_PATTERN_CASES
+] + [
+    ("Ann (Jo)", "Lee", "ann (jo)lee@example.com"),
+    ("A+", "B", "aab@example.com"),
+    ("A]b", "C\\d", "a]b.c\\d1@example.com"),
+])
+def test_sql_and_python_checks_agree(first, last, user_name):
+    assert sql_matches_name_pattern(first, last, user_name) == matches_name_pattern(
+        first, last, user_name
+    )
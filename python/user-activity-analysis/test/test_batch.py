@@ -0,0 +1,44 @@
+from src.batch import RowBatch
+
+
+def test_column_and_dicts():
+    batch = RowBatch(["ID", "VALUE"], [(1, "foo"), (2, "bar")])
+    assert len(batch) == 2
+    assert batch.column("VALUE") == ["foo", "bar"]
+    assert batch.column("MISSING") == [None, None]
+    assert batch.dicts() == [{"ID": 1, "VALUE": "foo"}, {"ID": 2, "VALUE": "bar"}]
+
+
+def test_with_columns_appends():
+    batch = RowBatch(["ID"], [(1,), (2,)])
+    result = batch.with_columns({"A": ["a1", "a2"], "B": ["b1", "b2"]})
+    assert result.columns == ["ID", "A", "B"]
+    assert result.rows == [(1, "a1", "b1"), (2, "a2", "b2")]
+
+
+def test_with_columns_replaces_existing_column():
+    batch = RowBatch(["ID", "A", "VALUE"], [(1, "old", "foo")])
+    result = batch.with_columns({"A": ["new"]})
+    assert result.columns == ["ID", "VALUE", "A"]
+    assert result.rows == [(1, "foo", "new")]
+
+
+def test_with_no_columns_returns_same_batch():
+    batch = RowBatch(["ID"], [(1,)])
+    assert batch.with_columns({}) is batch
+
+
+def test_replace_columns_keeps_position():
+    batch = RowBatch(
+        ["ID", "FIRST_NAME", "LAST_NAME", "VALUE"], [(1, "Ann", "Lee", "foo")]
+    )
+    result = batch.replace_columns(["FIRST_NAME", "LAST_NAME"], {"MATCH": ["True"]})
+    assert result.columns == ["ID", "MATCH", "VALUE"]
+    assert result.rows == [(1, "True", "foo")]
+
+
+def test_replace_missing_columns_appends():
+    batch = RowBatch(["ID"], [(1,)])
+    result = batch.replace_columns(["FIRST_NAME"], {"MATCH": ["False"]})
+    assert result.columns == ["ID", "MATCH"]
+    assert result.rows == [(1, "False")]
@@ -1,7 +1,9 @@
+import time
 from unittest.mock import MagicMock, patch
 
 import pytest
 
+from src.batch import RowBatch
 from src.database import (DatabaseClient, DatabaseConnectionError,
                           QueryExecutionError)
 
@@ -79,3 +81,241 @@ def test_stream_rows_query_execution_error(mock_engine):
     with pytest.raises(QueryExecutionError) as exc_info:
         list(db_client.stream_rows("SELECT ...", {"study_id": 1234}))
     assert "Query execution failed" in str(exc_info.value)
+
+
+def test_stream_batches_yields_uppercase_batches(mock_engine):
+    mock_result = MagicMock()
+    mock_result.keys.return_value = ["id", "study_id", "value"]
+    mock_result.fetchmany.side_effect = [
+        [(1, 1234, "foo"), (2, 1234, "bar")],
+        [(3, 1234, "baz")],
+        [],
+    ]
+
+    mock_conn = MagicMock()
+    mock_conn.execution_options.return_value.execute.return_value = mock_result
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+
+    db_client = DatabaseClient(mock_engine)
+    batches = list(db_client.stream_batches("SELECT ...", {"study_id": 1234}, 2))
+    assert [batch.columns for batch in batches] == [["ID", "STUDY_ID", "VALUE"]] * 2
+    assert [batch.rows for batch in batches] == [
+        [(1, 1234, "foo"), (2, 1234, "bar")],
+        [(3, 1234, "baz")],
+    ]
+    mock_result.fetchmany.assert_called_with(2)
+
+
+def test_stream_batches_records_fetch_stats(mock_engine):
+    mock_result = MagicMock()
+    mock_result.keys.return_value = ["id"]
+    mock_result.fetchmany.side_effect = [[(i,) for i in range(250)], [(250,)], []]
+
+    mock_conn = MagicMock()
+    mock_conn.execution_options.return_value.execute.return_value = mock_result
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+
+    db_client = DatabaseClient(mock_engine, arraysize=100, prefetchrows=50)
+    list(db_client.stream_batches("SELECT ...", {}, 250))
+
+    summary = db_client.last_fetch_stats.summary()
+    assert summary["rows"] == 251
+    assert summary["fetches"] == 3
+    # One execute round trip with 50 prefetched rows, then 201 rows at 100 per trip
+    assert summary["estimated_round_trips"] == 4
+    assert summary["first_row_seconds"] is not None
+
+
+def test_from_credentials_tunes_cursors():
+    db_client = DatabaseClient.from_credentials(
+        "username", "password", "localhost:1521/service", arraysize=1000, prefetchrows=500
+    )
+    assert db_client.arraysize == 1000
+    assert db_client.prefetchrows == 500
+
+    cursor = MagicMock()
+    db_client.engine.dispatch.before_cursor_execute(
+        None, cursor, "SELECT 1", {}, None, False
+    )
+    assert cursor.arraysize == 1000
+    assert cursor.prefetchrows == 500
+
+
+def test_stream_batches_parallel_keeps_parameter_order():
+    db_client = DatabaseClient(MagicMock())
+
+    def fake_stream_batches(query, params, batch_size):
+        study_id = params["study_id"]
+        # Later studies finish first to check results are reordered
+        time.sleep(0.01 * (3 - study_id))
+        return iter([RowBatch(["STUDY_ID"], [(study_id,)])])
+
+    with patch.object(db_client, "stream_batches", side_effect=fake_stream_batches):
+        batches = list(
+            db_client.stream_batches_parallel(
+                "SELECT ...", [{"study_id": i} for i in range(1, 4)], max_workers=2
+            )
+        )
+    assert [batch.rows for batch in batches] == [[(1,)], [(2,)], [(3,)]]
+
+
+def test_stream_batches_parallel_raises_query_errors():
+    db_client = DatabaseClient(MagicMock())
+    with patch.object(
+        db_client, "stream_batches", side_effect=QueryExecutionError("boom")
+    ):
+        with pytest.raises(QueryExecutionError):
+            list(db_client.stream_batches_parallel("SELECT ...", [{"study_id": 1}]))
+
+
+def test_stream_batches_parallel_streams_at_most_queue_size_ahead():
+    db_client = DatabaseClient(MagicMock())
+    fetched = []
+
+    def fake_stream_batches(query, params, batch_size):
+        for i in range(20):
+            fetched.append((params["study_id"], i))
+            yield RowBatch(["STUDY_ID"], [(params["study_id"],)])
+
+    with patch.object(db_client, "stream_batches", side_effect=fake_stream_batches):
+        batches = db_client.stream_batches_parallel(
+            "SELECT ...", [{"study_id": 1}, {"study_id": 2}], max_workers=2, queue_size=2
+        )
+        assert next(batches).rows == [(1,)]
+        time.sleep(0.1)
+        # Per study: two queued and one waiting to be queued, besides the one yielded
+        assert len([f for f in fetched if f[0] == 1]) <= 4
+        assert len([f for f in fetched if f[0] == 2]) <= 3
+        batches.close()
+        assert len(fetched) <= 7
+
+
+def test_from_credentials_with_pool_size():
+    db_client = DatabaseClient.from_credentials(
+        "username", "password", "localhost:1521/service", pool_size=4
+    )
+    assert db_client.engine.pool.size() == 4
+    assert db_client.engine.pool._max_overflow == 0
+
+
+def test_execute_commits_statement(mock_engine):
+    mock_conn = MagicMock()
+    mock_engine.begin.return_value.__enter__.return_value = mock_conn
+
+    DatabaseClient(mock_engine).execute("DROP TABLE t PURGE")
+
+    statement, params = mock_conn.execute.call_args.args
+    assert str(statement) == "DROP TABLE t PURGE"
+    assert params == {}
+
+
+def test_execute_error(mock_engine):
+    mock_engine.begin.return_value.__enter__.return_value.execute.side_effect = (
+        Exception("ORA-00942")
+    )
+    with pytest.raises(QueryExecutionError, match="Statement execution failed"):
+        DatabaseClient(mock_engine).execute("DROP TABLE t PURGE")
+
+
+def test_stream_batches_binds_lists_as_collections(mock_engine):
+    mock_result = MagicMock()
+    mock_result.keys.return_value = ["id"]
+    mock_result.fetchmany.side_effect = [[(1,)], []]
+    mock_conn = MagicMock()
+    mock_conn.info = {}
+    mock_conn.execution_options.return_value.execute.return_value = mock_result
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+    number_list = mock_conn.connection.driver_connection.gettype.return_value
+
+    db_client = DatabaseClient(mock_engine)
+    list(db_client.stream_batches("SELECT ...", {"all_studies": 0, "study_ids": [1, 2]}))
+    mock_result.fetchmany.side_effect = [[]]
+    list(db_client.stream_batches("SELECT ...", {"all_studies": 0, "study_ids": [3]}))
+
+    mock_conn.connection.driver_connection.gettype.assert_called_once_with(
+        "SYS.ODCINUMBERLIST"
+    )
+    number_list.newobject.assert_called_with([3])
+    statement, params = mock_conn.execution_options.return_value.execute.call_args.args
+    assert params == {"all_studies": 0, "study_ids": number_list.newobject.return_value}
+    first_statement = (
+        mock_conn.execution_options.return_value.execute.call_args_list[0].args[0]
+    )
+    assert statement is first_statement
+
+
+def test_explain_returns_plan_lines(mock_engine):
+    mock_conn = MagicMock()
+    mock_conn.execute.return_value = [("Plan hash value: 1",), ("| 0 | SELECT |",)]
+    mock_engine.begin.return_value.__enter__.return_value = mock_conn
+
+    plan = DatabaseClient(mock_engine).explain("SELECT * FROM t WHERE id = :id")
+
+    assert plan == ["Plan hash value: 1", "| 0 | SELECT |"]
+    explain_sql = mock_conn.exec_driver_sql.call_args.args[0]
+    assert explain_sql.startswith("EXPLAIN PLAN SET STATEMENT_ID")
+    assert explain_sql.endswith("FOR SELECT * FROM t WHERE id = :id")
+
+
+def profiled_conn(statistics_level="TYPICAL", plan=()):
+    """A connection whose session reports `statistics_level` and returns `plan`."""
+    mock_conn = MagicMock()
+
+    def exec_driver_sql(statement):
+        result = MagicMock()
+        result.scalar.return_value = statistics_level
+        result.__iter__.return_value = iter(plan)
+        return result
+
+    mock_conn.exec_driver_sql.side_effect = exec_driver_sql
+    return mock_conn
+
+
+def test_stream_batches_profile_captures_executed_plan(mock_engine):
+    mock_result = MagicMock()
+    mock_result.keys.return_value = ["id"]
+    mock_result.fetchmany.side_effect = [[(1,)], []]
+    mock_conn = profiled_conn(plan=[("| 1 | HASH JOIN |",)])
+    mock_conn.execution_options.return_value.execute.return_value = mock_result
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+
+    db_client = DatabaseClient(mock_engine)
+    list(db_client.stream_batches("SELECT ...", {}, profile=True))
+
+    statements = [call.args[0] for call in mock_conn.exec_driver_sql.call_args_list]
+    assert "v$parameter WHERE name = 'statistics_level'" in statements[0]
+    assert statements[1] == "ALTER SESSION SET statistics_level = ALL"
+    assert "DISPLAY_CURSOR(NULL, NULL, 'ALLSTATS LAST')" in statements[2]
+    assert statements[3] == "ALTER SESSION SET statistics_level = TYPICAL"
+    assert db_client.last_fetch_stats.plan == ["| 1 | HASH JOIN |"]
+
+
+def test_stream_batches_profile_restores_session_when_closed_early(mock_engine):
+    mock_result = MagicMock()
+    mock_result.keys.return_value = ["id"]
+    mock_result.fetchmany.side_effect = [[(1,)], [(2,)], []]
+    mock_conn = profiled_conn("BASIC")
+    mock_conn.execution_options.return_value.execute.return_value = mock_result
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+
+    batches = DatabaseClient(mock_engine).stream_batches("SELECT ...", {}, 1, profile=True)
+    next(batches)
+    batches.close()
+
+    statements = [call.args[0] for call in mock_conn.exec_driver_sql.call_args_list]
+    assert statements[1:] == [
+        "ALTER SESSION SET statistics_level = ALL",
+        "ALTER SESSION SET statistics_level = BASIC",
+    ]
+
+
+def test_stream_batches_profile_restores_session_on_error(mock_engine):
+    mock_conn = profiled_conn("BASIC")
+    mock_conn.execution_options.return_value.execute.side_effect = Exception("ORA-00942")
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+
+    with pytest.raises(QueryExecutionError):
+        list(DatabaseClient(mock_engine).stream_batches("SELECT ...", {}, profile=True))
+
+    statements = [call.args[0] for call in mock_conn.exec_driver_sql.call_args_list]
+    assert statements[-1] == "ALTER SESSION SET statistics_level = BASIC"
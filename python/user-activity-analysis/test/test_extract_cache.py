@@ -0,0 +1,86 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from src.batch import RowBatch
+from src.extract_cache import ExtractCache
+
+COLUMNS = ["USER_ID", "INTEREST_SOURCE_ADDRESS", "AVG_TIME_TO_ACTIVATE_MINS", "CREATED_DATE"]
+# python-oracledb returns integral NUMBERs as int, so one column mixes int and float
+BATCHES = [
+    RowBatch(COLUMNS, [(1, None, 45, None), (2, None, None, datetime(2024, 1, 1, 9, 30))]),
+    RowBatch(COLUMNS, [(3, "3.3.3.3", 1.5, None), (4, "4.4.4.4", 0, None)]),
+]
+
+
+def typed_rows(batches):
+    return [
+        [tuple((type(value), value) for value in row) for row in batch.rows]
+        for batch in batches
+    ]
+
+
+@pytest.mark.parametrize("compression", ["zstd", None])
+def test_write_then_read_round_trips_batches(tmp_path, compression):
+    cache = ExtractCache(str(tmp_path), compression)
+    key = cache.key("SELECT 1", "backup", {"study_ids": [1]})
+
+    assert list(cache.write(key, iter(BATCHES))) == BATCHES
+    assert cache.exists(key)
+
+    read = list(cache.read(key))
+    assert [batch.columns for batch in read] == [batch.columns for batch in BATCHES]
+    # Values come back with the types they were extracted with: 45 and 0 stay ints
+    assert typed_rows(read) == typed_rows(BATCHES)
+
+
+def test_values_that_cannot_be_stored_are_passed_through_uncached(tmp_path):
+    cache = ExtractCache(str(tmp_path))
+    key = cache.key("SELECT 1", "backup", {})
+    batches = BATCHES + [RowBatch(COLUMNS, [(5, None, Decimal("1.5"), None)])]
+
+    assert list(cache.write(key, iter(batches))) == batches
+    assert not cache.exists(key)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_key_depends_on_query_schema_and_params():
+    key = ExtractCache.key("SELECT 1", "backup", {"since": datetime(2024, 1, 1)})
+    assert key == ExtractCache.key("SELECT 1", "backup", {"since": datetime(2024, 1, 1)})
+    assert key != ExtractCache.key("SELECT 2", "backup", {"since": datetime(2024, 1, 1)})
+    assert key != ExtractCache.key("SELECT 1", "other", {"since": datetime(2024, 1, 1)})
+    assert key != ExtractCache.key("SELECT 1", "backup", {"since": datetime(2024, 1, 2)})
+    assert key != ExtractCache.key(
+        "SELECT 1", "backup", {"since": datetime(2024, 1, 1)}, "LA_BACKUP_SNAP"
+    )
+
+
+def test_interrupted_write_is_not_cached(tmp_path):
+    cache = ExtractCache(str(tmp_path))
+    key = cache.key("SELECT 1", "backup", {})
+
+    def failing():
+        yield BATCHES[0]
+        raise RuntimeError("connection lost")
+
+    with pytest.raises(RuntimeError):
+        list(cache.write(key, failing()))
+    assert not cache.exists(key)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_empty_result_is_not_cached(tmp_path):
+    cache = ExtractCache(str(tmp_path))
+    key = cache.key("SELECT 1", "backup", {})
+    assert list(cache.write(key, iter([]))) == []
+    assert not cache.exists(key)
+
+
+def test_from_config(tmp_path):
+    assert ExtractCache.from_config({}) is None
+    cache = ExtractCache.from_config(
+        {"extract_cache_dir": str(tmp_path), "extract_cache_compression": "none"}
+    )
+    assert cache.compression is None
+    assert ExtractCache.from_config({}, str(tmp_path)).compression == "zstd"
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+from src.batch import RowBatch
+from src.incremental import (IncrementalState, merge_rows, read_snapshot,
+                             write_snapshot)
+
+COLUMNS = [
+    "USER_ID",
+    "STUDY_ID",
+    "INTEREST_SOURCE_ADDRESS",
+    "SUSPICIOUS_INTERESTED_COUNT",
+    "CITY",
+]
+
+
+def test_state_round_trip(tmp_path):
+    path = str(tmp_path / "state.json")
+    state = IncrementalState.load(path)
+    assert state.watermark is None
+    assert state.snapshot_path == str(tmp_path / "state.csv")
+
+    state.save(datetime(2024, 5, 1, 2, 30))
+
+    loaded = IncrementalState.load(path)
+    assert loaded.watermark == datetime(2024, 5, 1, 2, 30)
+    assert loaded.snapshot_path == state.snapshot_path
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.csv")
+    assert read_snapshot(path) is None
+
+    write_snapshot(path, RowBatch(COLUMNS, [("1", "10", "1.1.1.1", "2", "")]))
+
+    snapshot = read_snapshot(path)
+    assert snapshot.columns == COLUMNS
+    assert snapshot.rows == [("1", "10", "1.1.1.1", "2", "")]
+
+
+def test_merge_rows_replaces_and_sorts():
+    previous = RowBatch(
+        COLUMNS,
+        [
+            ("1", "10", "1.1.1.1", "2", "Old"),
+            ("2", "10", "1.1.1.1", "2", "Kept"),
+        ],
+    )
+    new = RowBatch(
+        COLUMNS,
+        [
+            (1, 10, "1.1.1.1", 3, "New"),
+            (3, 10, "1.1.1.1", 3, None),
+            (12, 10, "2.2.2.2", 12, "Big"),
+        ],
+    )
+
+    merged = merge_rows(previous, [new])
+
+    assert merged.rows == [
+        ("12", "10", "2.2.2.2", "12", "Big"),
+        ("1", "10", "1.1.1.1", "3", "New"),
+        ("3", "10", "1.1.1.1", "3", ""),
+        ("2", "10", "1.1.1.1", "2", "Kept"),
+    ]
+
+
+def test_merge_rows_without_new_rows_keeps_previous():
+    previous = RowBatch(COLUMNS, [("1", "10", "1.1.1.1", "2", "Old")])
+    assert merge_rows(previous, []) is previous
+    assert merge_rows(None, []).columns == []
+
+
+def test_merge_rows_rejects_changed_columns():
+    previous = RowBatch(COLUMNS[:-1], [("1", "10", "1.1.1.1", "2")])
+    with pytest.raises(ValueError, match="full-refresh"):
+        merge_rows(previous, [RowBatch(COLUMNS, [(1, 10, "1.1.1.1", 2, "X")])])
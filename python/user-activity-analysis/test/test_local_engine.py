@@ -0,0 +1,143 @@
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from src.batch import RowBatch
+from src.local_engine import (ACTIVATION_COLUMNS, VOLUNTEER_COLUMNS,
+                              LocalAnalyticsEngine)
+
+
+def volunteer(user_id, study_id, address, minute, after_login=Decimal("1.5")):
+    return (
+        user_id,
+        "First",
+        "Last",
+        f"user{user_id}@example.com",
+        study_id,
+        "Yes",
+        address,
+        datetime(2024, 1, 1, 10, minute),
+        after_login,
+    )
+
+
+def activation(user_id, address, minute):
+    return (
+        user_id,
+        address,
+        Decimal("2"),
+        datetime(2024, 1, 1, 9, minute),
+        datetime(2024, 1, 1, 9, minute + 2),
+    )
+
+
+@pytest.fixture
+def engine(tmp_path):
+    local_engine = LocalAnalyticsEngine(str(tmp_path / "local.sqlite3"))
+    local_engine.load(
+        [
+            RowBatch(
+                VOLUNTEER_COLUMNS,
+                [
+                    volunteer(1, 10, "1.1.1.1", 0),
+                    volunteer(2, 10, "1.1.1.1", 30, Decimal("2.5")),
+                    volunteer(3, 10, "1.1.1.1", 45),
+                    volunteer(4, 20, "2.2.2.2", 0),
+                    volunteer(5, 20, "2.2.2.2", 5),
+                    volunteer(6, 20, "3.3.3.3", 5),
+                ],
+            )
+        ],
+        [
+            RowBatch(
+                ACTIVATION_COLUMNS,
+                [
+                    activation(1, "9.9.9.9", 0),
+                    activation(2, "9.9.9.9", 10),
+                    activation(4, "8.8.8.8", 0),
+                ],
+            )
+        ],
+    )
+    yield local_engine
+    local_engine.close()
+
+
+def rows(engine, **kwargs):
+    return [row for batch in engine.suspicious_activity(**kwargs) for row in batch.rows]
+
+
+def test_load_marks_engine_as_loaded(tmp_path):
+    local_engine = LocalAnalyticsEngine(str(tmp_path / "local.sqlite3"))
+    assert local_engine.is_loaded() is False
+    assert local_engine.loaded_from() is None
+    source = {"backup_schema": "backup", "login_audit_snapshot_prefix": None}
+    assert local_engine.load([], [], source) == {"volunteers": 0, "activations": 0}
+    assert local_engine.is_loaded() is True
+    assert local_engine.loaded_from() == source
+    local_engine.close()
+
+
+def test_file_loaded_without_source_is_not_loaded(tmp_path):
+    path = str(tmp_path / "local.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE load_info (loaded_at REAL, volunteers INTEGER, activations INTEGER)")
+    conn.execute("INSERT INTO load_info VALUES (0, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    local_engine = LocalAnalyticsEngine(path)
+    assert local_engine.is_loaded() is False
+    local_engine.close()
+
+
+def test_suspicious_activity_matches_query_columns(engine):
+    batch = next(engine.suspicious_activity())
+    assert batch.columns == [
+        "USER_ID",
+        "FIRST_NAME",
+        "LAST_NAME",
+        "USER_NAME",
+        "STUDY_ID",
+        "OFFERS_COMPENSATION",
+        "INTEREST_SOURCE_ADDRESS",
+        "SUSPICIOUS_INTERESTED_COUNT",
+        "INTEREST_PERIOD_MINS",
+        "AVG_TIME_TO_SHOW_INTEREST_MINS",
+        "ACTIVATION_SOURCE_ADDRESS",
+        "SUSPICIOUS_SIGNUP_COUNT",
+        "CREATION_PERIOD_MINS",
+        "ACTIVATION_PERIOD_MINS",
+        "AVG_TIME_TO_ACTIVATE_MINS",
+    ]
+
+
+def test_suspicious_activity_aggregates(engine):
+    result = rows(engine)
+    assert [(row[0], row[4], row[6]) for row in result] == [
+        (1, 10, "1.1.1.1"),
+        (2, 10, "1.1.1.1"),
+        (3, 10, "1.1.1.1"),
+        (4, 20, "2.2.2.2"),
+        (5, 20, "2.2.2.2"),
+    ]
+    # Three users within 45 minutes, averaging 1.83 minutes after login
+    assert result[0][7:10] == (3, 45, 1.83)
+    # Users 1 and 2 activated from the same IP ten minutes apart
+    assert result[0][10:] == ("9.9.9.9", 2, 10, 10, 2)
+    # Integral numbers come back as int and the others as float, as from Oracle
+    assert [type(value) for value in result[0][7:10]] == [int, int, float]
+    assert all(type(value) is int for value in result[0][11:])
+    assert result[2][10:] == (None, 0, 0, 0, 0)
+    assert result[3][10:] == ("8.8.8.8", 0, 0, 0, 0)
+
+
+def test_suspicious_activity_thresholds_and_study_filter(engine):
+    assert [row[0] for row in rows(engine, min_interested_users=3)] == [1, 2, 3]
+    assert [row[0] for row in rows(engine, study_ids=[20])] == [4, 5]
+    assert rows(engine, study_ids=[]) == []
+    result = rows(engine, min_interested_users=1, min_signup_users=1)
+    assert len(result) == 6
+    assert result[3][10:12] == ("8.8.8.8", 1)
@@ -0,0 +1,104 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.batch import RowBatch
+from src.login_audit_snapshot import LoginAuditSnapshot
+
+BACKUP = (120, datetime(2023, 12, 31, 23, 59))
+
+
+@pytest.fixture
+def queries_dir(tmp_path):
+    (tmp_path / "login_audit_fingerprint.sql").write_text(
+        "SELECT COUNT(*), MAX(SUCCESSFUL_LOGIN_TIME) FROM {backup_schema}.login_audit"
+    )
+    (tmp_path / "login_audit_snapshot.sql").write_text(
+        "CREATE TABLE {logins_table} AS SELECT * FROM {backup_schema}.login_audit;\n"
+        "CREATE TABLE {first_login_table} AS SELECT 1 FROM dual;\n"
+        "CREATE TABLE {meta_table} (ROW_COUNT NUMBER)\n"
+    )
+    return str(tmp_path)
+
+
+SNAPSHOT_TABLES = ("SNAP_LOGINS", "SNAP_FIRST_LOGIN", "SNAP_META")
+
+
+def make_db(snapshot_row, existing=SNAPSHOT_TABLES):
+    db = MagicMock()
+
+    def stream_batches(query, params, batch_size=1000):
+        if "USER_TABLES" in query:
+            rows = [(name,) for name in existing if name in params.values()]
+            return iter([RowBatch(["TABLE_NAME"], rows)])
+        if "_META" in query:
+            assert "SNAP_META" in existing
+            rows = [snapshot_row] if snapshot_row else []
+            return iter([RowBatch(["ROW_COUNT", "MAX_LOGIN_TIME"], rows)])
+        return iter([RowBatch(["ROW_COUNT", "MAX_LOGIN_TIME"], [BACKUP])])
+
+    db.stream_batches.side_effect = stream_batches
+    return db
+
+
+def executed(db):
+    return [call.args[0] for call in db.execute.call_args_list]
+
+
+def test_table_names_use_prefix(queries_dir):
+    snapshot = LoginAuditSnapshot(MagicMock(), "backup", queries_dir, "la_snap")
+    assert snapshot.tables == {
+        "logins": "LA_SNAP_LOGINS",
+        "first_login": "LA_SNAP_FIRST_LOGIN",
+        "meta": "LA_SNAP_META",
+    }
+
+
+def test_invalid_prefix_raises(queries_dir):
+    with pytest.raises(ValueError, match="Invalid login audit snapshot prefix"):
+        LoginAuditSnapshot(MagicMock(), "backup", queries_dir, "x; DROP TABLE y")
+
+
+def test_from_config_without_prefix_returns_none(queries_dir):
+    assert LoginAuditSnapshot.from_config(MagicMock(), {}, queries_dir) is None
+
+
+def test_refresh_skips_when_up_to_date(queries_dir):
+    db = make_db(BACKUP)
+    snapshot = LoginAuditSnapshot(db, "backup", queries_dir, "SNAP")
+
+    assert snapshot.refresh() is False
+    db.execute.assert_not_called()
+
+
+def test_refresh_builds_when_missing(queries_dir):
+    db = make_db(None, existing=())
+    snapshot = LoginAuditSnapshot(db, "backup", queries_dir, "SNAP")
+
+    assert snapshot.is_built() is False
+    assert snapshot.refresh() is True
+
+    # Missing tables are looked up, never queried or dropped
+    statements = executed(db)
+    assert statements[0] == "CREATE TABLE SNAP_LOGINS AS SELECT * FROM backup.login_audit"
+    assert statements[2] == "CREATE TABLE SNAP_META (ROW_COUNT NUMBER)"
+    assert statements[3].startswith("INSERT INTO SNAP_META")
+    assert db.execute.call_args_list[-1].args[1] == {
+        "backup_schema": "backup",
+        "row_count": 120,
+        "max_login_time": BACKUP[1],
+    }
+
+
+def test_refresh_rebuilds_when_backup_changed(queries_dir):
+    db = make_db((100, datetime(2023, 6, 1)))
+    snapshot = LoginAuditSnapshot(db, "backup", queries_dir, "SNAP")
+
+    assert snapshot.refresh() is True
+    assert executed(db)[:3] == [
+        "DROP TABLE SNAP_META PURGE",
+        "DROP TABLE SNAP_LOGINS PURGE",
+        "DROP TABLE SNAP_FIRST_LOGIN PURGE",
+    ]
+    assert "CREATE TABLE SNAP_FIRST_LOGIN AS SELECT 1 FROM dual" in executed(db)
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from src.batch import RowBatch
+from src.pipeline import StagedPipeline
+
+
+def make_batches(count):
+    return [RowBatch(["ID"], [(i,)]) for i in range(count)]
+
+
+def add_double(batch):
+    return batch.with_columns({"DOUBLE": [row[0] * 2 for row in batch.rows]})
+
+
+def test_run_keeps_source_order():
+    def enrich(batch):
+        # Later batches finish first
+        time.sleep(0.01 * (5 - batch.rows[0][0]))
+        return add_double(batch)
+
+    result = list(StagedPipeline(enrich, workers=4).run(make_batches(5)))
+    assert [batch.rows for batch in result] == [[(i, i * 2)] for i in range(5)]
+
+
+def test_stages_overlap():
+    # Fetching the second batch and enriching the first wait for each other, which
+    # only completes if the two stages run at the same time
+    both_running = threading.Barrier(2, timeout=5)
+
+    def source():
+        first, second = make_batches(2)
+        yield first
+        both_running.wait()
+        yield second
+
+    def enrich(batch):
+        if batch.rows == [(0,)]:
+            both_running.wait()
+        return batch
+
+    result = list(StagedPipeline(enrich, workers=1).run(source()))
+    assert [batch.rows for batch in result] == [[(0,)], [(1,)]]
+
+
+def test_fetch_error_is_raised():
+    def failing_source():
+        yield make_batches(1)[0]
+        raise RuntimeError("cursor closed")
+
+    with pytest.raises(RuntimeError, match="cursor closed"):
+        list(StagedPipeline(add_double).run(failing_source()))
+
+
+def test_enrich_error_is_raised():
+    def failing_enrich(batch):
+        raise ValueError("bad row")
+
+    with pytest.raises(ValueError, match="bad row"):
+        list(StagedPipeline(failing_enrich).run(make_batches(2)))
+
+
+def test_fetches_at_most_queue_size_ahead():
+    fetched = []
+
+    def source():
+        for batch in make_batches(20):
+            fetched.append(batch)
+            yield batch
+
+    run = StagedPipeline(add_double, workers=1, queue_size=2).run(source())
+    next(run)
+    time.sleep(0.1)
+    # One batch written, two queued and one waiting to be queued
+    assert len(fetched) <= 4
+    run.close()
+
+
+def test_close_stops_the_fetch_thread():
+    closed = threading.Event()
+
+    def source():
+        try:
+            for batch in make_batches(100):
+                yield batch
+        finally:
+            closed.set()
+
+    run = StagedPipeline(add_double, queue_size=1).run(source())
+    next(run)
+    run.close()
+    assert closed.is_set()
+
+
+def test_needs_a_worker():
+    with pytest.raises(ValueError):
+        StagedPipeline(add_double, workers=0)
@@ -1,8 +1,10 @@
 import pytest
 
-from src.query_builder import (_add_study_id_filter,
+from src.query_builder import (STUDY_ID_FILTER, _add_study_id_filter,
                                _build_suspicious_activity_query, _load_query,
-                               build_database_query)
+                               build_database_query, build_local_queries,
+                               build_login_audit_snapshot_statements,
+                               build_study_ids_query, study_filter_params)
 
 
 @pytest.fixture
@@ -63,8 +65,8 @@ def test_add_study_id_filter_with_marker(sql_file):
     result = _add_study_id_filter(query)
 
     assert "-- APPEND STUDY_ID_FILTER_HERE" not in result
-    assert "AND v.study_id = :study_id" in result
-    assert result.index("AND v.study_id = :study_id") < result.lower().index("order by")
+    assert STUDY_ID_FILTER in result
+    assert result.index(STUDY_ID_FILTER) < result.lower().index("order by")
 
 
 def test_add_study_id_filter_with_order_by(sql_file):
@@ -73,8 +75,8 @@ def test_add_study_id_filter_with_order_by(sql_file):
 
     result = _add_study_id_filter(query)
 
-    assert "AND v.study_id = :study_id" in result
-    assert result.index("AND v.study_id = :study_id") < result.lower().index("order by")
+    assert STUDY_ID_FILTER in result
+    assert result.index(STUDY_ID_FILTER) < result.lower().index("order by")
 
 
 def test_add_study_id_filter_no_marker_no_order_by(sql_file):
@@ -83,7 +85,7 @@ def test_add_study_id_filter_no_marker_no_order_by(sql_file):
 
     result = _add_study_id_filter(query)
 
-    assert result.strip().endswith("AND v.study_id = :study_id")
+    assert result.strip().endswith(STUDY_ID_FILTER)
 
 
 def test_build_database_query(tmp_path):
@@ -103,8 +105,232 @@ def test_build_database_query(tmp_path):
     query = build_database_query(backup_schema, queries_dir)
 
     assert "test_schema" in query
-    assert "AND v.study_id = :study_id" in query
+    assert STUDY_ID_FILTER in query
     assert "WITH" in query
     assert "v_study_volunteer_ip AS" in query
     assert "v_user_activation_time AS" in query
     assert "JOIN v_user_activation_time" in query
+
+
+def test_build_database_query_is_cached(tmp_path):
+    for name in (
+        "v_study_volunteer_ip.sql",
+        "v_user_activation_time.sql",
+        "suspicious_activity_query.sql",
+    ):
+        (tmp_path / name).write_text("SELECT 1 FROM dual")
+
+    first = build_database_query("test_schema", str(tmp_path))
+    (tmp_path / "suspicious_activity_query.sql").write_text("SELECT 2 FROM dual")
+
+    assert build_database_query("test_schema", str(tmp_path)) is first
+
+
+def test_study_filter_params():
+    assert study_filter_params() == {"all_studies": 1, "study_ids": []}
+    assert study_filter_params([4739, 12]) == {
+        "all_studies": 0,
+        "study_ids": [4739, 12],
+    }
+
+
+def test_build_study_ids_query(tmp_path):
+    (tmp_path / "study_ids.sql").write_text("SELECT DISTINCT study_id FROM study_volunteer")
+    query = build_study_ids_query("test_schema", str(tmp_path))
+    assert query == "SELECT DISTINCT study_id FROM study_volunteer"
+
+
+def write_view_queries(tmp_path):
+    (tmp_path / "v_study_volunteer_ip.sql").write_text(
+        "SELECT * FROM (SELECT * FROM login_audit\n-- APPEND LOGIN_FILTER_HERE\n"
+        "UNION ALL SELECT * FROM {backup_schema}.login_audit\n-- APPEND LOGIN_FILTER_HERE\n"
+        ") l RIGHT JOIN study_volunteer v ON l.USER_ID = v.USER_ID\n"
+        "WHERE 1=1\n-- APPEND ENTITY_FILTER_HERE\n"
+    )
+    (tmp_path / "v_user_activation_time.sql").write_text(
+        "SELECT * FROM db_user_auth_detail d JOIN (SELECT * FROM login_audit\n"
+        "-- APPEND LOGIN_FILTER_HERE\n"
+        "UNION ALL SELECT * FROM {backup_schema}.login_audit\n-- APPEND LOGIN_FILTER_HERE\n"
+        ") la ON d.USER_ID = la.USER_ID\nWHERE 1=1\n-- APPEND ENTITY_FILTER_HERE\n"
+    )
+    (tmp_path / "suspicious_activity_query.sql").write_text(
+        "signup_suspicious AS (SELECT * FROM v_user_activation_time),\n"
+        "interested_suspicious AS (SELECT * FROM v_study_volunteer_ip)\n"
+        "SELECT * FROM v_study_volunteer_ip v WHERE 1=1\n"
+        "-- APPEND STUDY_ID_FILTER_HERE\n-- APPEND CHANGED_GROUPS_FILTER_HERE"
+    )
+
+
+def split_views(query):
+    """Split a built query into its changed group CTEs and its two views."""
+    changed, views = query.split("v_study_volunteer_ip AS (", 1)
+    volunteers, activations = views.split("v_user_activation_time AS (", 1)
+    activations = activations.split("signup_suspicious AS", 1)[0]
+    return changed, volunteers, activations
+
+
+def test_build_database_query_incremental_restricts_to_changed_groups(tmp_path):
+    write_view_queries(tmp_path)
+
+    full = build_database_query("test_schema", str(tmp_path))
+    incremental = build_database_query("test_schema", str(tmp_path), incremental=True)
+
+    assert ":since" not in full
+    assert "changed_interest" not in full
+    assert "group_studies" not in full
+    changed, volunteers, activations = split_views(incremental)
+    assert "SUCCESSFUL_LOGIN_TIME >= :since - INTERVAL '3' HOUR" in changed
+    assert "SUCCESSFUL_LOGIN_TIME >= :since - INTERVAL '7' DAY" in changed
+    assert "AND v.SHOWED_INTEREST_DATE >= :since" in changed
+    assert "AND d.CREATED_DATE >= :since - INTERVAL '7' DAY" in changed
+    for cte in ("changed_interest", "changed_signup", "group_studies",
+                "group_volunteers", "group_signups"):
+        assert f"{cte} AS (" in changed
+    assert "-- APPEND CHANGED_GROUPS_FILTER_HERE" not in incremental
+    assert "(SELECT study_id, source_address FROM changed_interest)" in incremental
+    assert "u.source_address IN (SELECT source_address FROM changed_signup)" in incremental
+
+
+def test_build_database_query_incremental_filters_aggregation_inputs(tmp_path):
+    write_view_queries(tmp_path)
+
+    incremental = build_database_query("test_schema", str(tmp_path), incremental=True)
+
+    _, volunteers, activations = split_views(incremental)
+    # Both login_audit selects and the entity rows of each view, which feed the
+    # aggregates, only read the changed groups' studies and users
+    assert ":since" not in volunteers + activations
+    assert volunteers.count(
+        " AND USER_ID IN (SELECT user_id FROM group_volunteers)\n"
+    ) == 2
+    assert "AND v.STUDY_ID IN (SELECT study_id FROM group_studies)" in volunteers
+    assert activations.count(
+        " AND USER_ID IN (SELECT user_id FROM group_signups)\n"
+    ) == 2
+    assert "AND d.USER_ID IN (SELECT user_id FROM group_signups)" in activations
+
+
+def test_build_database_query_filters_aggregation_inputs_by_study(tmp_path):
+    write_view_queries(tmp_path)
+
+    query = build_database_query("test_schema", str(tmp_path))
+
+    changed, volunteers, activations = split_views(query)
+    assert "study_volunteers AS (" in changed
+    assert "study_signups AS (" in changed
+    # A run for some studies only joins their volunteers, and the users who may
+    # share an activation IP with them, to the logins
+    assert volunteers.count(
+        "WHERE (:all_studies = 1 OR USER_ID IN (SELECT user_id FROM study_volunteers))\n"
+    ) == 2
+    assert (
+        "AND (:all_studies = 1 OR v.STUDY_ID IN (SELECT column_value FROM "
+        "TABLE(CAST(:study_ids AS SYS.ODCINUMBERLIST))))"
+    ) in volunteers
+    assert activations.count(
+        "WHERE (:all_studies = 1 OR USER_ID IN (SELECT user_id FROM study_signups))"
+    ) == 2
+    assert "AND (:all_studies = 1 OR d.USER_ID IN (SELECT user_id FROM study_signups))" in activations
+
+
+def test_build_database_query_incremental_with_snapshot_tables(tmp_path):
+    write_view_queries(tmp_path)
+
+    incremental = build_database_query(
+        "test_schema",
+        str(tmp_path),
+        incremental=True,
+        snapshot_tables={"logins": "SNAP_LOGINS", "first_login": "SNAP_FIRST_LOGIN"},
+    )
+
+    changed, _, _ = split_views(incremental)
+    assert "test_schema.login_audit" not in incremental
+    # Activation IPs are looked up in the logins v_user_activation_time reads
+    assert "SELECT USER_ID, SOURCE_ADDRESS FROM SNAP_FIRST_LOGIN" in changed
+
+
+def test_build_database_query_with_snapshot_tables(tmp_path):
+    (tmp_path / "v_study_volunteer_ip.sql").write_text(
+        "SELECT * FROM login_audit UNION ALL SELECT * FROM {backup_schema}.login_audit"
+    )
+    (tmp_path / "v_user_activation_time.sql").write_text(
+        "SELECT * FROM login_audit UNION ALL SELECT * FROM {backup_schema}.login_audit"
+    )
+    (tmp_path / "suspicious_activity_query.sql").write_text(
+        "SELECT * FROM v_study_volunteer_ip -- APPEND STUDY_ID_FILTER_HERE"
+    )
+
+    query = build_database_query(
+        "test_schema",
+        str(tmp_path),
+        snapshot_tables={"logins": "SNAP_LOGINS", "first_login": "SNAP_FIRST_LOGIN"},
+    )
+
+    assert "test_schema.login_audit" not in query
+    assert "SELECT * FROM login_audit UNION ALL SELECT * FROM SNAP_LOGINS" in query
+    assert "SELECT * FROM login_audit UNION ALL SELECT * FROM SNAP_FIRST_LOGIN" in query
+
+
+def test_build_login_audit_snapshot_statements(tmp_path):
+    (tmp_path / "login_audit_snapshot.sql").write_text(
+        "CREATE TABLE {logins_table} AS SELECT * FROM {backup_schema}.login_audit;\n\n"
+        "CREATE INDEX {logins_table}_IX ON {logins_table} (USER_ID)\n"
+    )
+
+    statements = build_login_audit_snapshot_statements(
+        "test_schema", str(tmp_path), {"logins": "SNAP_LOGINS"}
+    )
+
+    assert statements == [
+        "CREATE TABLE SNAP_LOGINS AS SELECT * FROM test_schema.login_audit",
+        "CREATE INDEX SNAP_LOGINS_IX ON SNAP_LOGINS (USER_ID)",
+    ]
+
+
+def test_build_database_query_name_pattern_modes(tmp_path):
+    (tmp_path / "v_study_volunteer_ip.sql").write_text("SELECT 1 FROM dual")
+    (tmp_path / "v_user_activation_time.sql").write_text("SELECT 2 FROM dual")
+    (tmp_path / "suspicious_activity_query.sql").write_text(
+        "SELECT\n  v.USER_ID,\n  {name_pattern_columns},\n  v.STUDY_ID"
+    )
+    (tmp_path / "matches_name_pattern.sql").write_text(
+        "CASE\n  WHEN 1=1 THEN 'True'\nEND AS matches_name_pattern\n"
+    )
+
+    python_query = build_database_query("test_schema", str(tmp_path))
+    sql_query = build_database_query("test_schema", str(tmp_path), name_pattern="sql")
+
+    assert "au.first_name,\n  au.last_name,\n  au.user_name,\n  v.STUDY_ID" in python_query
+    assert "matches_name_pattern" not in python_query
+    assert "  CASE\n    WHEN 1=1 THEN 'True'\n  END AS matches_name_pattern," in sql_query
+    with pytest.raises(ValueError, match="Unknown name pattern mode"):
+        build_database_query("test_schema", str(tmp_path), name_pattern="java")
+
+
+def test_build_local_queries(tmp_path):
+    (tmp_path / "v_study_volunteer_ip.sql").write_text(
+        "SELECT * FROM {backup_schema}.login_audit"
+    )
+    (tmp_path / "v_user_activation_time.sql").write_text(
+        "SELECT * FROM {backup_schema}.login_audit"
+    )
+    (tmp_path / "local_volunteers.sql").write_text("SELECT * FROM v_study_volunteer_ip")
+    (tmp_path / "local_activations.sql").write_text("SELECT * FROM v_user_activation_time")
+
+    volunteers, activations = build_local_queries(
+        "test_schema",
+        str(tmp_path),
+        {"logins": "SNAP_LOGINS", "first_login": "SNAP_FIRST_LOGIN"},
+    )
+
+    assert "v_study_volunteer_ip AS" in volunteers
+    assert "SELECT * FROM SNAP_LOGINS" in volunteers
+    assert volunteers.strip().endswith("SELECT * FROM v_study_volunteer_ip")
+    assert "v_user_activation_time AS" in activations
+    assert "SELECT * FROM SNAP_FIRST_LOGIN" in activations
+
+
+def test_study_id_filter_types_the_collection_bind():
+    # EXPLAIN PLAN binds no values, so an untyped TABLE(:study_ids) fails with ORA-22905
+    assert "TABLE(:study_ids)" not in STUDY_ID_FILTER
+    assert "TABLE(CAST(:study_ids AS SYS.ODCINUMBERLIST))" in STUDY_ID_FILTER
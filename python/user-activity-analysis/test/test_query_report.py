@@ -0,0 +1,53 @@
+import json
+import logging
+from unittest.mock import patch
+
+from src.database import FetchStats
+from src.query_report import QueryReport, default_report_path
+
+
+def test_default_report_path_is_next_to_log_file(tmp_path):
+    handler = logging.FileHandler(str(tmp_path / "app.log"))
+    try:
+        with patch.object(logging.getLogger(), "handlers", [handler]):
+            assert default_report_path() == str(tmp_path / "query_reports.jsonl")
+    finally:
+        handler.close()
+
+
+def test_default_report_path_without_log_file():
+    with patch.object(logging.getLogger(), "handlers", []):
+        assert default_report_path() == "query_reports.jsonl"
+
+
+def test_report_is_appended_as_json_lines(tmp_path):
+    queries_dir = tmp_path / "queries"
+    queries_dir.mkdir()
+    (queries_dir / "a.sql").write_text("SELECT 1 FROM dual")
+    path = str(tmp_path / "reports.jsonl")
+
+    stats = FetchStats(arraysize=100, prefetchrows=2)
+    stats.record_fetch(10, 0.5)
+    stats.plan = ["| Id | Operation |", "| 0 | SELECT STATEMENT |"]
+
+    report = QueryReport(
+        "profile",
+        "SELECT 1 FROM dual",
+        {"study_ids": [1, 2], "since": object()},
+        str(queries_dir),
+    )
+    report.add_fetch_stats(stats)
+    report.write(path)
+    QueryReport("explain", "SELECT 1 FROM dual", None, str(queries_dir)).write(path)
+
+    with open(path) as f:
+        first, second = [json.loads(line) for line in f]
+    assert first["mode"] == "profile"
+    assert first["params"]["study_ids"] == [1, 2]
+    assert isinstance(first["params"]["since"], str)
+    assert first["fetch"]["rows"] == 10
+    assert first["plan"] == stats.plan
+    assert first["query_files"].keys() == {"a.sql"}
+    assert first["query_sha256"] == second["query_sha256"]
+    assert second["mode"] == "explain"
+    assert second["fetch"] is None
@@ -0,0 +1,20 @@
+from src.spool import RowSpool
+
+
+def test_spool_replays_rows_in_order():
+    spool = RowSpool()
+    rows = [{"ID": 1, "VALUE": "foo"}, {"ID": 2, "VALUE": None}]
+    for row in rows:
+        spool.append(row)
+
+    assert spool.count == 2
+    assert list(spool) == rows
+    # Replaying again starts from the beginning
+    assert list(spool) == rows
+    spool.close()
+
+
+def test_empty_spool():
+    spool = RowSpool()
+    assert list(spool) == []
+    spool.close()